@@ -1,8 +1,36 @@
+import asyncio
+import bisect
+import cProfile
+import csv
 import datetime
+import gc
+import glob
+import heapq
+import inspect
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import pstats
 import random
+import socket
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
 import time
+import tracemalloc
+import zlib
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
 
 class VehicleType(Enum):
     CAR = "car"
@@ -17,6 +45,44 @@ class ParkingSpotType(Enum):
     HANDICAPPED = "handicapped"
     MOTORCYCLE = "motorcycle"
 
+class SystemClock:
+    """Wall-clock time source"""
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+class SimulatedClock:
+    """Manually driven time source, used to run the model faster than real time"""
+    def __init__(self, start: Optional[datetime.datetime] = None):
+        self.current = start or datetime.datetime.now().replace(microsecond=0)
+
+    def now(self) -> datetime.datetime:
+        return self.current
+
+    def set(self, when: datetime.datetime):
+        self.current = when
+
+    def advance(self, delta: datetime.timedelta):
+        self.current += delta
+
+SYSTEM_CLOCK = SystemClock()
+
+# Day names in datetime.weekday() order
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Fallback busy hours used until enough real traffic has been observed for a day
+DEFAULT_BUSY_HOURS = {
+    day: [8, 9, 12, 13, 17, 18] if day not in ("Saturday", "Sunday") else [11, 12, 13, 14, 15, 16]
+    for day in DAYS_OF_WEEK
+}
+
+# Spot types each vehicle type may park in; the first entry is the exact (optimal) match
+SUITABLE_SPOT_TYPES = {
+    VehicleType.CAR: [ParkingSpotType.REGULAR, ParkingSpotType.LARGE],
+    VehicleType.MOTORCYCLE: [ParkingSpotType.MOTORCYCLE, ParkingSpotType.REGULAR, ParkingSpotType.LARGE],
+    VehicleType.TRUCK: [ParkingSpotType.LARGE],
+    VehicleType.HANDICAPPED: [ParkingSpotType.HANDICAPPED, ParkingSpotType.LARGE]
+}
+
 class ParkingSpot:
     def __init__(self, spot_id: str, spot_type: ParkingSpotType, level: int, section: str):
         self.spot_id = spot_id
@@ -26,12 +92,16 @@ class ParkingSpot:
         self.is_occupied = False
         self.vehicle_id = None
         self.occupied_since = None
+        self.lot = None  # Owning ParkingAI, notified whenever the spot changes state
+        self.seq = None  # Creation order within the lot, assigned when the spot is registered
 
-    def occupy(self, vehicle_id: str) -> bool:
+    def occupy(self, vehicle_id: str, at: Optional[datetime.datetime] = None) -> bool:
         if not self.is_occupied:
             self.is_occupied = True
             self.vehicle_id = vehicle_id
-            self.occupied_since = datetime.datetime.now()
+            self.occupied_since = at or (self.lot.clock if self.lot is not None else SYSTEM_CLOCK).now()
+            if self.lot is not None:
+                self.lot._spot_occupied(self)
             return True
         return False
 
@@ -42,6 +112,8 @@ class ParkingSpot:
             self.is_occupied = False
             self.vehicle_id = None
             self.occupied_since = None
+            if self.lot is not None:
+                self.lot._spot_vacated(self, vehicle_id)
             return (vehicle_id, occupied_since)
         return None
 
@@ -62,13 +134,135 @@ class Vehicle:
         return f"{self.vehicle_type.value.title()} (Plate: {self.license_plate})"
 
 class ParkingRate:
+    revision = 0  # Bumped by every rate created or edited, so cached rate tables can tell they are stale
+
+    def __setattr__(self, name, value):
+        ParkingRate.revision += 1
+        super().__setattr__(name, value)
+
     def __init__(self, vehicle_type: VehicleType, hourly_rate: float, daily_max: float):
         self.vehicle_type = vehicle_type
         self.hourly_rate = hourly_rate
         self.daily_max = daily_max
 
+# Demand tiers as (minimum occupancy of the spot type, 0-1, rate multiplier), lowest first
+DEFAULT_DEMAND_TIERS = ((0.0, 1.0), (0.75, 1.25), (0.9, 1.5))
+
+class PricingPolicy:
+    """Base rates per vehicle type, an hour-of-week multiplier and occupancy-based demand tiers.
+    
+    A stay is billed for its weighted hours (an hour at multiplier 1.5 counts as 1.5 hours)
+    at the hourly rate, capped pro rata by the daily maximum. Both are scaled by the demand
+    tier of the occupied spot's type when the fee is computed. Without multipliers or
+    tiers, this prices exactly like the plain ParkingRate table.
+    """
+    def __init__(self, rates: Dict[VehicleType, ParkingRate], hourly_multipliers: Optional[List[float]] = None,
+                 demand_tiers: Tuple[Tuple[float, float], ...] = ((0.0, 1.0),)):
+        if hourly_multipliers is not None and len(hourly_multipliers) != 7 * 24:
+            raise ValueError("hourly_multipliers needs one entry per hour of the week, Monday 00:00 first")
+        demand_tiers = tuple(sorted(demand_tiers))
+        if not demand_tiers or demand_tiers[0][0] != 0.0:
+            raise ValueError("The lowest demand tier must start at occupancy 0.0")
+        self.rates = rates
+        self.hourly_multipliers = list(hourly_multipliers) if hourly_multipliers is not None else [1.0] * (7 * 24)
+        self.demand_tiers = demand_tiers
+
+    @classmethod
+    def peak_hours(cls, rates: Dict[VehicleType, ParkingRate], busy_times: Dict[str, List[int]] = DEFAULT_BUSY_HOURS,
+                   peak_multiplier: float = 1.5, demand_tiers=DEFAULT_DEMAND_TIERS) -> "PricingPolicy":
+        """Charge peak_multiplier during each day's busy hours (e.g. ParkingAI.get_busy_times())"""
+        multipliers = [1.0] * (7 * 24)
+        for day_index, day in enumerate(DAYS_OF_WEEK):
+            for hour in busy_times.get(day, ()):
+                multipliers[day_index * 24 + hour] = peak_multiplier
+        return cls(rates, multipliers, demand_tiers)
+
+class PricingEngine:
+    """Rate tables precomputed from a PricingPolicy, so that pricing never steps through time.
+    
+    The week is cut into segments of constant multiplier (equal neighbouring hours are
+    merged), with the weighted hours accumulated up to each segment start. Weighted hours
+    between two times are whole weeks plus two bisections over the segments, so a month
+    long stay costs no more to price than a short one. Hourly rates and daily maximums are
+    precomputed per vehicle type and demand tier; a flat policy skips the weighting.
+    """
+    WEEK_HOURS = 7 * 24
+
+    def __init__(self, policy: PricingPolicy):
+        self.policy = policy
+        self.revision = ParkingRate.revision  # Read first, so an edit made while building is caught later
+        self.flat = all(multiplier == 1.0 for multiplier in policy.hourly_multipliers)
+        self.starts: List[int] = []  # Segment starts, in hours from Monday 00:00
+        self.multipliers: List[float] = []
+        self.cumulative: List[float] = []  # Weighted hours from Monday 00:00 to each segment start
+        total = 0.0
+        for hour, multiplier in enumerate(policy.hourly_multipliers):
+            if not self.multipliers or multiplier != self.multipliers[-1]:
+                self.starts.append(hour)
+                self.multipliers.append(multiplier)
+                self.cumulative.append(total)
+            total += multiplier
+        self.week_total = total
+        self.thresholds = [threshold for threshold, _ in policy.demand_tiers]
+        # (hourly_rate, daily_max) per vehicle type, one pair per demand tier
+        self.rates = {vehicle_type: [(rate.hourly_rate * multiplier, rate.daily_max * multiplier)
+                                     for _, multiplier in policy.demand_tiers]
+                      for vehicle_type, rate in policy.rates.items()}
+
+    @staticmethod
+    def fee_for_hours(hours: float, hourly_rate: float, daily_max: float) -> float:
+        # Calculate fee
+        fee = hours * hourly_rate
+        
+        # Apply daily maximum if applicable
+        days = hours / 24
+        daily_max_fee = days * daily_max
+        
+        return min(fee, daily_max_fee)
+
+    @staticmethod
+    def _week_position(when: datetime.datetime) -> float:
+        # Hours since the Monday 00:00 that starts when's week
+        return (when.weekday() * 24 + when.hour
+                + (when.minute * 60 + when.second + when.microsecond / 10**6) / 3600)
+
+    def _weighted_until(self, position: float) -> float:
+        # Weighted hours from a Monday 00:00 to position hours later
+        weeks, offset = divmod(position, self.WEEK_HOURS)
+        segment = bisect.bisect_right(self.starts, offset) - 1
+        return (weeks * self.week_total + self.cumulative[segment]
+                + (offset - self.starts[segment]) * self.multipliers[segment])
+
+    def billable_hours(self, entry_time: datetime.datetime, hours: float) -> float:
+        """Weighted hours of a stay of the given length starting at entry_time"""
+        if self.flat:
+            return hours
+        start = self._week_position(entry_time)
+        return self._weighted_until(start + hours) - self._weighted_until(start)
+
+    def multiplier_at(self, when: datetime.datetime) -> float:
+        return self.policy.hourly_multipliers[when.weekday() * 24 + when.hour]
+
+    def rates_at(self, vehicle_type: VehicleType, when: datetime.datetime, tier: int = 0) -> Tuple[float, float]:
+        """Effective (hourly_rate, daily_max) during the hour containing when.
+        
+        fee() weights hours by the time multiplier before applying either limit, so both
+        scale together.
+        """
+        hourly_rate, daily_max = self.rates[vehicle_type][tier]
+        multiplier = self.multiplier_at(when)
+        return hourly_rate * multiplier, daily_max * multiplier
+
+    def tier(self, occupancy_rate: float) -> int:
+        """Demand tier for an occupancy rate between 0 and 1"""
+        return bisect.bisect_right(self.thresholds, occupancy_rate) - 1
+
+    def fee(self, vehicle_type: VehicleType, entry_time: datetime.datetime, hours: float, tier: int = 0) -> float:
+        hourly_rate, daily_max = self.rates[vehicle_type][tier]
+        return self.fee_for_hours(self.billable_hours(entry_time, hours), hourly_rate, daily_max)
+
 class ParkingTicket:
-    def __init__(self, ticket_id: str, vehicle_id: str, entry_time: datetime.datetime):
+    def __init__(self, ticket_id: str, vehicle_id: str, entry_time: datetime.datetime, lot=None):
         self.ticket_id = ticket_id
         self.vehicle_id = vehicle_id
         self.entry_time = entry_time
@@ -76,32 +270,1996 @@ class ParkingTicket:
         self.amount_paid = 0.0
         self.is_paid = False
         self.exit_time = None
+        # Owning ParkingAI; its current clock and EventBus are looked up on use, so a lot
+        # switched to a simulated clock stamps its older tickets with simulated time too
+        self.lot = lot
 
-    def pay(self, amount: float) -> bool:
+    def _now(self) -> datetime.datetime:
+        return (self.lot.clock if self.lot is not None else SYSTEM_CLOCK).now()
+
+    def _publish(self, event: "TicketEvent"):
+        if self.lot is not None and self.lot.events.subscriptions:
+            self.lot.events.publish(event)
+
+    def pay(self, amount: float, at: Optional[datetime.datetime] = None) -> bool:
         if not self.is_paid:
             self.amount_paid = amount
-            self.payment_time = datetime.datetime.now()
+            self.payment_time = at or self._now()
             self.is_paid = True
+            self._publish(TicketEvent(self.payment_time, "paid", self.ticket_id, self.vehicle_id, amount))
             return True
         return False
 
-    def complete_exit(self) -> bool:
+    def complete_exit(self, at: Optional[datetime.datetime] = None) -> bool:
         if self.is_paid:
-            self.exit_time = datetime.datetime.now()
+            self.exit_time = at or self._now()
+            self._publish(TicketEvent(self.exit_time, "exited", self.ticket_id, self.vehicle_id, self.amount_paid))
             return True
         return False
 
-class ParkingAI:
+class SpotEvent(NamedTuple):
+    """A spot changed state (kind "occupied" or "vacated")"""
+    time: datetime.datetime
+    kind: str
+    spot_id: str
+    spot_type: ParkingSpotType
+    level: int
+    section: str
+    vehicle_id: str
+
+class TicketEvent(NamedTuple):
+    """A ticket changed state (kind "paid" or "exited")"""
+    time: datetime.datetime
+    kind: str
+    ticket_id: str
+    vehicle_id: str
+    amount: float
+
+class Subscription:
+    """One subscriber to an EventBus: a handler plus its queue of undelivered events.
+    
+    The handler is called with lists of events, in publish order. A synchronous
+    subscription delivers on the publishing thread whenever batch_size events are pending
+    (batch_size=1 delivers immediately). An asynchronous one delivers from its own worker
+    thread, waiting up to max_delay seconds for a batch to fill. Once max_pending events
+    are queued, new events are discarded and counted in dropped. Publishers never wait for
+    the worker, since they publish while holding the lot's spot and ticket locks.
+    
+    Handlers run while the lot is mid-update, so they must not call back into ParkingAI
+    operations; read the event, counters or status instead.
+    """
+    def __init__(self, handler, kinds: Optional[tuple] = None, batch_size: int = 1, max_pending: int = 10000,
+                 asynchronous: bool = False, max_delay: float = 0.05):
+        self.handler = handler
+        self.kinds = kinds  # Event classes to deliver, or None for all
+        self.batch_size = batch_size
+        self.max_pending = max(max_pending, batch_size)
+        self.max_delay = max_delay
+        self.pending: deque = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+        self.closed = False
+        self.busy = False  # The worker is running the handler
+        self.flushing = False
+        self.condition = threading.Condition(threading.RLock())
+        self.worker = None
+        if asynchronous:
+            self.worker = threading.Thread(target=self._run, name="event-subscriber", daemon=True)
+            self.worker.start()
+
+    def offer(self, event):
+        if self.kinds is not None and not isinstance(event, self.kinds):
+            return
+        with self.condition:
+            if self.closed:
+                return
+            if self.worker is None:
+                self.pending.append(event)
+                if len(self.pending) >= self.batch_size:
+                    self._deliver_pending()
+                return
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending.append(event)
+            # Only wake the worker when it may be idle or a full batch is ready
+            if len(self.pending) == 1 or len(self.pending) == self.batch_size:
+                self.condition.notify_all()
+
+    def _deliver_pending(self):
+        batch = list(self.pending)
+        self.pending.clear()
+        self._deliver(batch)
+
+    def _deliver(self, batch: list):
+        try:
+            self.handler(batch)
+        except Exception as exc:
+            # A failing subscriber must not break parking operations
+            self.errors += 1
+            self.last_error = exc
+        self.delivered += len(batch)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                deadline = time.monotonic() + self.max_delay
+                while 0 < len(self.pending) < self.batch_size and not (self.closed or self.flushing):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.pending:
+                    return  # Closed and drained
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                self.busy = True
+            self._deliver(batch)
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self):
+        """Deliver every pending event before returning"""
+        with self.condition:
+            if self.worker is None:
+                if self.pending:
+                    self._deliver_pending()
+                return
+            self.flushing = True
+            self.condition.notify_all()
+            while self.pending or self.busy:
+                self.condition.wait()
+            self.flushing = False
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.worker is not None:
+            self.worker.join()
+
+class EventBus:
+    """In-process publish/subscribe stream of SpotEvents and TicketEvents.
+    
+    Publishing costs nothing while there are no subscribers. The subscription list is
+    replaced rather than mutated, so publish() reads it without taking a lock.
+    """
     def __init__(self):
-        self.spots: Dict[str, ParkingSpot] = {}
+        self.subscriptions: List[Subscription] = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, handler, kinds: Optional[tuple] = None, batch_size: int = 1, max_pending: int = 10000,
+                  asynchronous: bool = False, max_delay: float = 0.05) -> Subscription:
+        """Register a handler called with lists of events; see Subscription for the delivery options"""
+        subscription = Subscription(handler, kinds, batch_size, max_pending, asynchronous, max_delay)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop delivering to a subscription after handing it everything already published"""
+        with self.lock:
+            self.subscriptions = [other for other in self.subscriptions if other is not subscription]
+        subscription.close()
+
+    def publish(self, event):
+        for subscription in self.subscriptions:
+            subscription.offer(event)
+
+    def flush(self):
+        for subscription in self.subscriptions:
+            subscription.flush()
+
+class RevenueView:
+    """Payments per day, kept current from "paid" TicketEvents instead of rescanning tickets"""
+    def __init__(self):
+        self.total = 0.0
+        self.payments = 0
+        self.by_day: Dict[datetime.date, List] = defaultdict(lambda: [0, 0.0])  # date -> [payments, revenue]
+
+    def attach(self, events: "EventBus", **options) -> Subscription:
+        return events.subscribe(self, kinds=(TicketEvent,), **options)
+
+    def __call__(self, events: List[TicketEvent]):
+        for event in events:
+            if event.kind == "paid":
+                self.total += event.amount
+                self.payments += 1
+                day = self.by_day[event.time.date()]
+                day[0] += 1
+                day[1] += event.amount
+
+    def daily(self, days: int = 7) -> List[Tuple[str, int, float]]:
+        """(date, payments, revenue) for the most recent days that saw payments"""
+        return [(day.isoformat(), *self.by_day[day]) for day in sorted(self.by_day)[-days:]]
+
+class SectionLayout(NamedTuple):
+    """Spot counts by type for one section of one level"""
+    level: int
+    section: str
+    counts: Dict[ParkingSpotType, int]
+
+# Type mix used by LotLayout.uniform(); whatever the shares leave over becomes motorcycle spots
+DEFAULT_SPOT_MIX = {ParkingSpotType.REGULAR: 0.6, ParkingSpotType.COMPACT: 0.2, ParkingSpotType.LARGE: 0.1,
+                    ParkingSpotType.HANDICAPPED: 0.05}
+
+class LotLayout:
+    """A garage layout given as spot counts per section, so files stay small for any lot size.
+    
+    CSV files have a header "level,section" followed by one column per spot type ("regular",
+    "compact", "large", "handicapped", "motorcycle"; missing columns count as zero) and one
+    row per section. JSON files hold a list of {"level": 1, "section": "A", "spots":
+    {"regular": 60, ...}} objects, either bare or under a "sections" key.
+    
+    Spots are numbered section by section in file order, and by spot type within a section.
+    """
+    def __init__(self, sections: List[SectionLayout]):
+        seen = set()
+        for entry in sections:
+            if (entry.level, entry.section) in seen:
+                raise ValueError(f"Section {entry.section} of level {entry.level} is listed more than once")
+            seen.add((entry.level, entry.section))
+            if any(count < 0 for count in entry.counts.values()):
+                raise ValueError(f"Negative spot count in section {entry.section} of level {entry.level}")
+        self.sections = sections
+
+    @property
+    def total_spots(self) -> int:
+        return sum(sum(entry.counts.values()) for entry in self.sections)
+
+    @classmethod
+    def uniform(cls, levels: int, spots_per_level: int, sections: Tuple[str, ...] = ("A", "B", "C", "D"),
+                mix: Optional[Dict[ParkingSpotType, float]] = None) -> "LotLayout":
+        """Identical levels split into sections; leftover spots go to the first sections rather than being dropped"""
+        mix = mix or DEFAULT_SPOT_MIX
+        per_section, leftover = divmod(spots_per_level, len(sections))
+        entries = []
+        for level in range(1, levels + 1):
+            for index, section in enumerate(sections):
+                spots_in_section = per_section + (1 if index < leftover else 0)
+                counts = {spot_type: int(spots_in_section * share) for spot_type, share in mix.items()}
+                counts[ParkingSpotType.MOTORCYCLE] = (counts.get(ParkingSpotType.MOTORCYCLE, 0)
+                                                      + spots_in_section - sum(counts.values()))
+                entries.append(SectionLayout(level, section, counts))
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path: str) -> "LotLayout":
+        """Read a .csv or .json layout file"""
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            return cls.from_csv(path)
+        if extension == ".json":
+            return cls.from_json(path)
+        raise ValueError(f"Unsupported layout file type {extension!r}; use .csv or .json")
+
+    @classmethod
+    def from_csv(cls, path: str) -> "LotLayout":
+        with open(path, newline="") as handle:
+            reader = csv.DictReader(handle)
+            for column in ("level", "section"):
+                if column not in (reader.fieldnames or ()):
+                    raise ValueError(f"Layout file {path} has no {column!r} column")
+            type_columns = [name for name in reader.fieldnames or () if name not in ("level", "section")]
+            spot_types = [ParkingSpotType(name.strip().lower()) for name in type_columns]
+            entries = [SectionLayout(int(row["level"]), row["section"].strip(),
+                                     {spot_type: int(row[name] or 0) for spot_type, name in zip(spot_types, type_columns)})
+                       for row in reader]
+        return cls(entries)
+
+    @classmethod
+    def from_json(cls, path: str) -> "LotLayout":
+        with open(path) as handle:
+            data = json.load(handle)
+        if isinstance(data, dict):
+            data = data["sections"]
+        return cls([SectionLayout(int(entry["level"]), str(entry["section"]),
+                                  {ParkingSpotType(name): int(count) for name, count in entry["spots"].items()})
+                    for entry in data])
+
+    def to_csv(self, path: str):
+        with open(path, "w", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["level", "section"] + [spot_type.value for spot_type in ParkingSpotType])
+            for entry in self.sections:
+                writer.writerow([entry.level, entry.section] +
+                                [entry.counts.get(spot_type, 0) for spot_type in ParkingSpotType])
+
+class SpotStore(dict):
+    """Spot objects keyed by spot ID, also addressable by creation order"""
+    def __init__(self):
+        super().__init__()
+        self.ordered: List[ParkingSpot] = []
+
+    def add(self, spot: ParkingSpot) -> ParkingSpot:
+        spot.seq = len(self.ordered)
+        self.ordered.append(spot)
+        self[spot.spot_id] = spot
+        return spot
+
+    def add_run(self, lot, spot_type: ParkingSpotType, level: int, section: str, count: int):
+        """Create count consecutive spots numbered after the existing ones"""
+        ordered = self.ordered
+        for seq in range(len(ordered), len(ordered) + count):
+            spot = ParkingSpot(f"{level}-{section}-{seq + 1}", spot_type, level, section)
+            spot.lot = lot
+            spot.seq = seq
+            ordered.append(spot)
+            self[spot.spot_id] = spot
+
+    def by_seq(self, seq: int) -> ParkingSpot:
+        return self.ordered[seq]
+
+# Column codes used by the columnar spot store
+SPOT_TYPE_CODES = list(ParkingSpotType)
+SPOT_TYPE_CODE = {spot_type: code for code, spot_type in enumerate(SPOT_TYPE_CODES)}
+# Occupied-since times are stored as seconds from this naive epoch; going through POSIX
+# timestamps would shift naive local times that fall in a DST gap
+OCCUPIED_EPOCH = datetime.datetime(2000, 1, 1)
+SECOND = datetime.timedelta(seconds=1)
+
+class SpotView:
+    """Lightweight stand-in for ParkingSpot that reads and writes one row of a ColumnarSpotStore"""
+    __slots__ = ("store", "seq")
+
+    def __init__(self, store: "ColumnarSpotStore", seq: int):
+        self.store = store
+        self.seq = seq
+
+    @property
+    def spot_id(self) -> str:
+        return self.store.spot_id(self.seq)
+
+    @property
+    def spot_type(self) -> ParkingSpotType:
+        return SPOT_TYPE_CODES[self.store.spot_types[self.seq]]
+
+    @property
+    def level(self) -> int:
+        return self.store.levels[self.seq]
+
+    @property
+    def section(self) -> str:
+        return self.store.section_names[self.store.sections[self.seq]]
+
+    @property
+    def is_occupied(self) -> bool:
+        return bool(self.store.occupied[self.seq])
+
+    @property
+    def vehicle_id(self) -> Optional[str]:
+        return self.store.vehicle_id(self.seq)
+
+    @property
+    def occupied_since(self) -> Optional[datetime.datetime]:
+        if not self.store.occupied[self.seq]:
+            return None
+        return OCCUPIED_EPOCH + datetime.timedelta(seconds=self.store.occupied_since[self.seq])
+
+    @property
+    def lot(self):
+        return self.store.lot
+
+    def occupy(self, vehicle_id: str, at: Optional[datetime.datetime] = None) -> bool:
+        store = self.store
+        if not store.occupied[self.seq]:
+            store.occupied[self.seq] = 1
+            store.set_vehicle(self.seq, vehicle_id)
+            at = at or (store.lot.clock if store.lot is not None else SYSTEM_CLOCK).now()
+            store.occupied_since[self.seq] = (at - OCCUPIED_EPOCH) / SECOND
+            if store.lot is not None:
+                store.lot._spot_occupied(self)
+            return True
+        return False
+
+    def vacate(self) -> Optional[Tuple[str, datetime.datetime]]:
+        store = self.store
+        if store.occupied[self.seq]:
+            vehicle_id = self.vehicle_id
+            occupied_since = self.occupied_since
+            store.occupied[self.seq] = 0
+            store.set_vehicle(self.seq, None)
+            store.occupied_since[self.seq] = 0.0
+            if store.lot is not None:
+                store.lot._spot_vacated(self, vehicle_id)
+            return (vehicle_id, occupied_since)
+        return None
+
+    def __str__(self) -> str:
+        status = "Occupied" if self.is_occupied else "Available"
+        return f"Spot {self.spot_id} ({self.spot_type.value}) - {status}"
+
+class ColumnarSpotStore:
+    """Compact spot storage for very large lots, one parallel array per spot attribute.
+
+    Spots are not kept as objects; lookups return SpotView objects created on demand.
+    Spot IDs are derived from the row as "{level}-{section}-{row + 1}", matching the
+    numbering used by ParkingAI.initialize_parking_lot.
+    """
+    def __init__(self):
+        self.spot_types = array("b")
+        self.levels = array("h")
+        self.sections = array("H")  # Index into section_names
+        self.occupied = array("b")
+        self.vehicles = array("q")  # Numeric part of "V-<n>" vehicle IDs, -1 when free
+        self.occupied_since = array("d")  # Seconds from OCCUPIED_EPOCH, 0.0 when free
+        self.section_names: List[str] = []
+        self.section_codes: Dict[str, int] = {}
+        self.other_vehicle_ids: Dict[int, str] = {}  # Rows holding IDs that don't fit the column
+        self.lot = None
+
+    def add(self, spot_id: str, spot_type: ParkingSpotType, level: int, section: str) -> SpotView:
+        seq = len(self.spot_types)
+        expected_id = f"{level}-{section}-{seq + 1}"
+        if spot_id != expected_id:
+            raise ValueError(f"Columnar spot IDs must be sequential: expected {expected_id}, got {spot_id}")
+        self.spot_types.append(SPOT_TYPE_CODE[spot_type])
+        self.levels.append(level)
+        self.sections.append(self._section_code(section))
+        self.occupied.append(0)
+        self.vehicles.append(-1)
+        self.occupied_since.append(0.0)
+        return SpotView(self, seq)
+
+    def add_run(self, lot, spot_type: ParkingSpotType, level: int, section: str, count: int):
+        """Append count free spots of one type and section, filling each column in one call"""
+        self.spot_types.extend(array("b", [SPOT_TYPE_CODE[spot_type]]) * count)
+        self.levels.extend(array("h", [level]) * count)
+        self.sections.extend(array("H", [self._section_code(section)]) * count)
+        self.occupied.frombytes(bytes(count))
+        self.vehicles.extend(array("q", [-1]) * count)
+        self.occupied_since.frombytes(bytes(8 * count))  # All-zero bytes are 0.0
+
+    def _section_code(self, section: str) -> int:
+        section_code = self.section_codes.get(section)
+        if section_code is None:
+            section_code = self.section_codes[section] = len(self.section_names)
+            self.section_names.append(section)
+        return section_code
+
+    def spot_id(self, seq: int) -> str:
+        return f"{self.levels[seq]}-{self.section_names[self.sections[seq]]}-{seq + 1}"
+
+    def vehicle_id(self, seq: int) -> Optional[str]:
+        number = self.vehicles[seq]
+        if number >= 0:
+            return f"V-{number}"
+        return self.other_vehicle_ids.get(seq)
+
+    def set_vehicle(self, seq: int, vehicle_id: Optional[str]):
+        self.other_vehicle_ids.pop(seq, None)
+        self.vehicles[seq] = -1
+        if vehicle_id is None:
+            return
+        prefix, _, number = vehicle_id.partition("-")
+        if prefix == "V" and number.isdigit() and str(int(number)) == number:
+            self.vehicles[seq] = int(number)
+        else:
+            self.other_vehicle_ids[seq] = vehicle_id
+
+    def _seq_for(self, spot_id) -> Optional[int]:
+        if not isinstance(spot_id, str):
+            return None
+        level, _, rest = spot_id.partition("-")
+        section, _, number = rest.rpartition("-")
+        if not number.isdigit() or not level.lstrip("-").isdigit():
+            return None
+        seq = int(number) - 1
+        if 0 <= seq < len(self.spot_types) and self.levels[seq] == int(level) \
+                and self.section_names[self.sections[seq]] == section:
+            return seq
+        return None
+
+    def by_seq(self, seq: int) -> SpotView:
+        return SpotView(self, seq)
+
+    def __getitem__(self, spot_id: str) -> SpotView:
+        seq = self._seq_for(spot_id)
+        if seq is None:
+            raise KeyError(spot_id)
+        return SpotView(self, seq)
+
+    def get(self, spot_id: str, default=None):
+        seq = self._seq_for(spot_id)
+        return SpotView(self, seq) if seq is not None else default
+
+    def __contains__(self, spot_id) -> bool:
+        return self._seq_for(spot_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.spot_types)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def keys(self) -> Iterator[str]:
+        return (self.spot_id(seq) for seq in range(len(self.spot_types)))
+
+    def values(self) -> Iterator[SpotView]:
+        return (SpotView(self, seq) for seq in range(len(self.spot_types)))
+
+    def items(self) -> Iterator[Tuple[str, SpotView]]:
+        return ((self.spot_id(seq), SpotView(self, seq)) for seq in range(len(self.spot_types)))
+
+class FreeSpotIndex:
+    """Per-type priority queues of free spots, ordered closest to the entrance first.
+
+    Closest means lower level, then section, then creation order. Each type keeps a heap of
+    (level, section) buckets that may hold free spots, and each bucket a heap of spot
+    sequence numbers, so the index costs a few bytes per spot regardless of the spot store.
+    """
+    def __init__(self):
+        self.buckets: Dict[ParkingSpotType, List[Tuple[int, str]]] = {spot_type: [] for spot_type in ParkingSpotType}
+        self.free: Dict[Tuple[ParkingSpotType, int, str], List[int]] = {}
+        self.queued_buckets = set()
+        # Per spot sequence number: occupancy, and whether it sits in a bucket heap
+        # (queued entries may be stale until they reach the top of the heap)
+        self.occupied = bytearray()
+        self.queued = bytearray()
+
+    def add(self, spot: ParkingSpot):
+        self.occupied.append(1 if spot.is_occupied else 0)
+        self.queued.append(0)
+        if not spot.is_occupied:
+            self.release(spot)
+
+    def add_run(self, spot_type: ParkingSpotType, level: int, section: str, first_seq: int, count: int):
+        """Register count consecutive free spots of one type and section"""
+        self.occupied.extend(bytes(count))
+        self.queued.extend(b"\x01" * count)
+        bucket_key = (spot_type, level, section)
+        heap = self.free.get(bucket_key)
+        if heap is None:
+            heap = self.free[bucket_key] = []
+        # The new sequence numbers exceed every queued one, so appending keeps the heap valid
+        heap.extend(range(first_seq, first_seq + count))
+        if bucket_key not in self.queued_buckets:
+            self.queued_buckets.add(bucket_key)
+            heapq.heappush(self.buckets[spot_type], (level, section))
+
+    def release(self, spot: ParkingSpot):
+        seq = spot.seq
+        self.occupied[seq] = 0
+        if self.queued[seq]:
+            return
+        self.queued[seq] = 1
+        spot_type, level, section = spot.spot_type, spot.level, spot.section
+        bucket_key = (spot_type, level, section)
+        heap = self.free.get(bucket_key)
+        if heap is None:
+            heap = self.free[bucket_key] = []
+        heapq.heappush(heap, seq)
+        if bucket_key not in self.queued_buckets:
+            self.queued_buckets.add(bucket_key)
+            heapq.heappush(self.buckets[spot_type], (level, section))
+
+    def claim(self, spot: ParkingSpot):
+        seq = spot.seq
+        self.occupied[seq] = 1
+        # Allocation always takes the head of a bucket, so drop it eagerly; other
+        # occupied entries are discarded lazily when they surface in peek()
+        heap = self.free.get((spot.spot_type, spot.level, spot.section))
+        if heap and heap[0] == seq:
+            heapq.heappop(heap)
+            self.queued[seq] = 0
+
+    def peek(self, spot_type: ParkingSpotType) -> Optional[Tuple[int, str, int]]:
+        """Return (level, section, seq) of the closest free spot of the given type, if any"""
+        buckets = self.buckets[spot_type]
+        while buckets:
+            level, section = buckets[0]
+            bucket_key = (spot_type, level, section)
+            heap = self.free[bucket_key]
+            while heap and self.occupied[heap[0]]:
+                self.queued[heapq.heappop(heap)] = 0
+            if heap:
+                return (level, section, heap[0])
+            heapq.heappop(buckets)
+            self.queued_buckets.discard(bucket_key)
+        return None
+
+class OccupancyCounters:
+    """Running spot totals per type, level and section, updated on every occupy/vacate"""
+    def __init__(self):
+        self.total = 0
+        self.occupied = 0
+        # Each entry is a [total, occupied] pair
+        self.by_type: Dict[ParkingSpotType, List[int]] = {spot_type: [0, 0] for spot_type in ParkingSpotType}
+        self.by_level: Dict[int, List[int]] = {}
+        self.by_section: Dict[Tuple[int, str], List[int]] = {}
+        self.lock = threading.Lock()  # Level and section totals are shared across spot types
+
+    @classmethod
+    def from_spots(cls, spots) -> "OccupancyCounters":
+        """Recompute the counters from scratch (used for consistency checks)"""
+        counters = cls()
+        for spot in spots:
+            counters.add(spot)
+        return counters
+
+    def add(self, spot: ParkingSpot):
+        occupied = 1 if spot.is_occupied else 0
+        self.total += 1
+        self.occupied += occupied
+        for counts in self._buckets(spot):
+            counts[0] += 1
+            counts[1] += occupied
+
+    def add_run(self, spot_type: ParkingSpotType, level: int, section: str, count: int):
+        """Count count free spots of one type and section"""
+        self.total += count
+        for counts in self._buckets_for(spot_type, level, section):
+            counts[0] += count
+
+    def update(self, spot: ParkingSpot, delta: int):
+        """Apply an occupancy change of +1 (occupied) or -1 (vacated)"""
+        with self.lock:
+            self.occupied += delta
+            for counts in self._buckets(spot):
+                counts[1] += delta
+
+    def _buckets(self, spot: ParkingSpot) -> Tuple[List[int], List[int], List[int]]:
+        return self._buckets_for(spot.spot_type, spot.level, spot.section)
+
+    def _buckets_for(self, spot_type: ParkingSpotType, level: int,
+                     section: str) -> Tuple[List[int], List[int], List[int]]:
+        level_counts = self.by_level.get(level)
+        if level_counts is None:
+            level_counts = self.by_level[level] = [0, 0]
+        section_key = (level, section)
+        section_counts = self.by_section.get(section_key)
+        if section_counts is None:
+            section_counts = self.by_section[section_key] = [0, 0]
+        return (self.by_type[spot_type], level_counts, section_counts)
+
+    def mismatches(self, other: "OccupancyCounters") -> List[str]:
+        """Describe every counter that differs from another set of counters"""
+        problems = []
+        for name in ("total", "occupied", "by_type", "by_level", "by_section"):
+            if getattr(self, name) != getattr(other, name):
+                problems.append(f"{name}: {getattr(self, name)} != {getattr(other, name)}")
+        return problems
+
+class SessionIndex:
+    """Open parking sessions, keyed by ticket, license plate and spot.
+    
+    Sessions are also kept in arrival order, so the longest-parked vehicles come first.
+    Ended sessions stay in that order until they outnumber the open ones, and are then
+    compacted away in one pass.
+    """
+    def __init__(self):
+        self.open: Dict[str, ParkingTicket] = {}
+        self.by_plate: Dict[str, List[str]] = {}  # A plate may be parked more than once
+        self.by_spot: Dict[str, str] = {}
+        self.arrivals: List[int] = []  # Ascending arrival numbers, parallel to arrived
+        self.arrived: List[ParkingTicket] = []
+        self.next_arrival = 0
+        self.ended = 0  # Ended sessions still in arrival order
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.open)
+
+    def start(self, ticket: ParkingTicket, license_plate: str, spot_id: str):
+        with self.lock:
+            self.open[ticket.ticket_id] = ticket
+            self.by_plate.setdefault(license_plate, []).append(ticket.ticket_id)
+            self.by_spot[spot_id] = ticket.ticket_id
+            self.arrivals.append(self.next_arrival)
+            self.arrived.append(ticket)
+            self.next_arrival += 1
+
+    def end(self, ticket_id: str, license_plate: str, spot_id: str):
+        with self.lock:
+            if self.open.pop(ticket_id, None) is None:
+                return
+            plate_tickets = self.by_plate.get(license_plate, [])
+            if ticket_id in plate_tickets:
+                plate_tickets.remove(ticket_id)
+                if not plate_tickets:
+                    del self.by_plate[license_plate]
+            # The spot may already belong to a newer session
+            if self.by_spot.get(spot_id) == ticket_id:
+                del self.by_spot[spot_id]
+            self.ended += 1
+            if self.ended > max(64, len(self.open)):
+                kept = [index for index, ticket in enumerate(self.arrived) if ticket.ticket_id in self.open]
+                self.arrivals = [self.arrivals[index] for index in kept]
+                self.arrived = [self.arrived[index] for index in kept]
+                self.ended = 0
+
+    def latest_for_plate(self, license_plate: str) -> Optional[str]:
+        """Ticket of the most recent open session for a plate"""
+        with self.lock:
+            plate_tickets = self.by_plate.get(license_plate)
+            return plate_tickets[-1] if plate_tickets else None
+
+    def oldest(self) -> Iterator[ParkingTicket]:
+        """Open tickets from the earliest entry onwards.
+        
+        Tickets are fetched one at a time under the lock, so sessions may start and end
+        while the caller iterates; sessions ended by then are skipped.
+        """
+        last = -1
+        while True:
+            with self.lock:
+                index = bisect.bisect_right(self.arrivals, last)
+                while index < len(self.arrived) and self.open.get(self.arrived[index].ticket_id) is not self.arrived[index]:
+                    index += 1
+                if index == len(self.arrived):
+                    return
+                last = self.arrivals[index]
+                ticket = self.arrived[index]
+            yield ticket
+
+class Reservation(NamedTuple):
+    """An advance booking of one spot for [start, end)"""
+    reservation_id: str
+    license_plate: str
+    vehicle_type: VehicleType
+    spot_id: str
+    start: datetime.datetime
+    end: datetime.datetime
+
+class ReservationBook:
+    """Advance bookings, indexed by a time-bucketed availability bitmap per spot type.
+    
+    Time is cut into buckets of bucket_minutes. Per spot type, each booked bucket maps to an
+    int whose bit b is set when the b-th spot of that type (in creation order) is booked
+    during it. Bookings are held to whole buckets, so two bookings never share a bucket of
+    the same spot. Checking a window is one OR per bucket plus a bit count, however many
+    bookings the lot holds.
+    
+    From hold_ahead before it starts until it is claimed or ends, a booking holds its spot:
+    the spot is marked taken in the free spot index, so walk-in allocation and
+    recommendations pass over it. A customer whose spot is still blocked by an earlier
+    vehicle gets the best free spot instead.
+    """
+    def __init__(self, lot, hold_ahead: datetime.timedelta = datetime.timedelta(hours=2), bucket_minutes: int = 15):
+        self.lot = lot
+        self.hold_ahead = hold_ahead
+        self.bucket = datetime.timedelta(minutes=bucket_minutes)
+        self.buckets: Dict[ParkingSpotType, Dict[int, int]] = {spot_type: {} for spot_type in ParkingSpotType}
+        self.seqs: Dict[ParkingSpotType, array] = {spot_type: array("i") for spot_type in ParkingSpotType}
+        self.bit_of = array("i")  # Spot sequence number -> bit within its type
+        self.held = bytearray()  # Spot sequence number -> holds in force
+        self.active: Dict[str, Reservation] = {}
+        self.by_plate: Dict[str, List[str]] = {}
+        self.holding = set()  # Reservations whose hold is in force
+        # (time, 0 to start the hold / 1 to expire, reservation ID); stale entries are skipped
+        self.timeline: List[Tuple[datetime.datetime, int, str]] = []
+        self.pruned_bucket: Optional[int] = None
+        self.next_number = 1
+        self.lock = threading.Lock()
+
+    def _bucket_of(self, when: datetime.datetime) -> int:
+        return (when - datetime.datetime.min) // self.bucket
+
+    def _span(self, start: datetime.datetime, end: datetime.datetime) -> Tuple[int, int]:
+        # Buckets touched by [start, end), rounded outwards
+        return self._bucket_of(start), -((datetime.datetime.min - end) // self.bucket)
+
+    def _index(self):
+        """Give spots added since the last call a bit within their type"""
+        spots = self.lot.spots
+        first = len(self.bit_of)
+        if first == len(spots):
+            return
+        if isinstance(spots, ColumnarSpotStore):
+            spot_types = [SPOT_TYPE_CODES[code] for code in spots.spot_types[first:]]
+        else:
+            spot_types = [spots.by_seq(seq).spot_type for seq in range(first, len(spots))]
+        for seq, spot_type in enumerate(spot_types, first):
+            seqs = self.seqs[spot_type]
+            self.bit_of.append(len(seqs))
+            seqs.append(seq)
+        self.held.extend(bytes(len(spot_types)))
+
+    def _booked_mask(self, spot_type: ParkingSpotType, first: int, last: int) -> int:
+        buckets = self.buckets[spot_type]
+        if last - first > len(buckets):
+            masks = [mask for bucket, mask in buckets.items() if first <= bucket < last]
+        else:
+            masks = [buckets.get(bucket, 0) for bucket in range(first, last)]
+        booked = 0
+        for mask in masks:
+            booked |= mask
+        return booked
+
+    def available(self, spot_type: ParkingSpotType, start: datetime.datetime, end: datetime.datetime) -> int:
+        """Number of spots of a type with no booking during [start, end)"""
+        if end <= start:
+            raise ValueError("The window must end after it starts")
+        with self.lock:
+            self._index()
+            booked = self._booked_mask(spot_type, *self._span(start, end))
+            return len(self.seqs[spot_type]) - booked.bit_count()
+
+    def book(self, license_plate: str, vehicle_type: VehicleType, start: datetime.datetime,
+             end: datetime.datetime, now: datetime.datetime, on_booked=None) -> Optional[Reservation]:
+        """Book the first suitable spot free for all of [start, end), preferring exact matches.
+        
+        on_booked is called with the new reservation before the book's lock is released, so
+        it can be journaled before any arrival claims it.
+        """
+        if end <= start:
+            raise ValueError("A reservation must end after it starts")
+        if end <= now:
+            raise ValueError("A reservation must end in the future")
+        with self.lock:
+            self._index()
+            first, last = self._span(start, end)
+            # A hold that starts at once needs a spot nobody is parked in (or holding) right now
+            taken = self.lot.free_spots.occupied if start - self.hold_ahead <= now else None
+            for spot_type in SUITABLE_SPOT_TYPES[vehicle_type]:
+                seqs = self.seqs[spot_type]
+                free = ~self._booked_mask(spot_type, first, last) & ((1 << len(seqs)) - 1)
+                while free:
+                    seq = seqs[(free & -free).bit_length() - 1]
+                    if taken is None or not taken[seq]:
+                        reservation = Reservation(f"R-{self.next_number}", license_plate, vehicle_type,
+                                                  self.lot.spots.by_seq(seq).spot_id, start, end)
+                        self.next_number += 1
+                        self._add(reservation)
+                        if on_booked is not None:
+                            on_booked(reservation)
+                        self._advance(now)
+                        return reservation
+                    free &= free - 1
+            return None
+
+    def add(self, reservation: Reservation):
+        """Record an existing booking (on recovery) without re-running spot selection"""
+        with self.lock:
+            self._index()
+            self._add(reservation)
+            self.next_number = max(self.next_number, int(reservation.reservation_id.rpartition("-")[2]) + 1)
+
+    def _add(self, reservation: Reservation):
+        spot = self.lot.spots[reservation.spot_id]
+        bit = 1 << self.bit_of[spot.seq]
+        buckets = self.buckets[spot.spot_type]
+        for bucket in range(*self._span(reservation.start, reservation.end)):
+            buckets[bucket] = buckets.get(bucket, 0) | bit
+        self.active[reservation.reservation_id] = reservation
+        self.by_plate.setdefault(reservation.license_plate, []).append(reservation.reservation_id)
+        heapq.heappush(self.timeline, (reservation.start - self.hold_ahead, 0, reservation.reservation_id))
+        heapq.heappush(self.timeline, (reservation.end, 1, reservation.reservation_id))
+
+    def cancel(self, reservation_id: str, on_cancelled=None) -> bool:
+        """Cancel a booking, freeing its spot for the rest of the window.
+        
+        on_cancelled is called with the reservation while the book's lock is held.
+        """
+        with self.lock:
+            reservation = self.active.get(reservation_id)
+            if reservation is None:
+                return False
+            spot = self.lot.spots[reservation.spot_id]
+            bit = 1 << self.bit_of[spot.seq]
+            buckets = self.buckets[spot.spot_type]
+            for bucket in range(*self._span(reservation.start, reservation.end)):
+                mask = buckets.get(bucket, 0) & ~bit
+                if mask:
+                    buckets[bucket] = mask
+                else:
+                    buckets.pop(bucket, None)
+            self._release(reservation)
+            if on_cancelled is not None:
+                on_cancelled(reservation)
+            return True
+
+    def advance(self, now: datetime.datetime):
+        """Start and expire the holds that have come due"""
+        try:
+            due = self.timeline[0][0] <= now  # Unlocked peek; _advance checks again under the lock
+        except IndexError:
+            return  # Nothing scheduled, or another thread emptied the timeline
+        if due:
+            with self.lock:
+                self._advance(now)
+
+    def _advance(self, now: datetime.datetime):
+        timeline = self.timeline
+        while timeline and timeline[0][0] <= now:
+            _, action, reservation_id = heapq.heappop(timeline)
+            reservation = self.active.get(reservation_id)
+            if reservation is None:
+                continue  # Cancelled or claimed
+            if action == 0:
+                self._hold(reservation)
+            else:
+                self._release(reservation)  # No-show
+        
+        # Bookings never move into the past, so drop the bitmap rows behind us
+        current = self._bucket_of(now)
+        if current != self.pruned_bucket:
+            self.pruned_bucket = current
+            for buckets in self.buckets.values():
+                for bucket in [bucket for bucket in buckets if bucket < current]:
+                    del buckets[bucket]
+
+    def _hold(self, reservation: Reservation):
+        spot = self.lot.spots[reservation.spot_id]
+        with self.lot.type_locks[spot.spot_type]:
+            self.held[spot.seq] += 1
+            self.holding.add(reservation.reservation_id)
+            self.lot.free_spots.claim(spot)
+
+    def _release(self, reservation: Reservation):
+        """Forget a booking, ending its hold"""
+        reservation_id = reservation.reservation_id
+        if reservation_id in self.holding:
+            self.holding.discard(reservation_id)
+            spot = self.lot.spots[reservation.spot_id]
+            with self.lot.type_locks[spot.spot_type]:
+                self.held[spot.seq] -= 1
+                if not self.held[spot.seq] and not spot.is_occupied:
+                    self.lot.free_spots.release(spot)
+                    self.lot.recommender.release(spot)
+        del self.active[reservation_id]
+        plate_bookings = self.by_plate[reservation.license_plate]
+        plate_bookings.remove(reservation_id)
+        if not plate_bookings:
+            del self.by_plate[reservation.license_plate]
+
+    def _match(self, license_plate: str, at: datetime.datetime) -> Optional[Reservation]:
+        # The booking an arrival at this time redeems, if any
+        for reservation_id in self.by_plate.get(license_plate, ()):
+            reservation = self.active[reservation_id]
+            if reservation.start - self.hold_ahead <= at < reservation.end:
+                return reservation
+        return None
+
+    def claim(self, license_plate: str, vehicle_type: VehicleType, vehicle_id: str,
+              at: datetime.datetime) -> Tuple[Optional[Reservation], Optional[ParkingSpot]]:
+        """Redeem the plate's booking on arrival: park in the booked spot if it is clear and
+        suits the arriving vehicle.
+        
+        Returns (booking, spot). A booking redeemed by parking in its spot is used up here.
+        With no spot, the booking and its hold stay in force: the caller allocates another
+        spot and calls redeem() once the vehicle is parked.
+        """
+        self.advance(at)
+        with self.lock:
+            reservation = self._match(license_plate, at)
+            if reservation is None:
+                return None, None
+            spot = self.lot.spots[reservation.spot_id]
+            with self.lot.type_locks[spot.spot_type]:
+                parked = spot.spot_type in SUITABLE_SPOT_TYPES[vehicle_type] and not spot.is_occupied
+                if parked:
+                    if reservation.reservation_id in self.holding:
+                        self.holding.discard(reservation.reservation_id)
+                        self.held[spot.seq] -= 1
+                    spot.occupy(vehicle_id, at=at)
+            if not parked:
+                return reservation, None
+            self._release(reservation)
+            return reservation, spot
+
+    def redeem(self, reservation: Reservation):
+        """Use up a booking whose holder was parked elsewhere, ending its hold"""
+        with self.lock:
+            if reservation.reservation_id in self.active:  # Not cancelled or expired meanwhile
+                self._release(reservation)
+
+    def forget_claim(self, license_plate: str, at: datetime.datetime):
+        """Drop the booking a replayed arrival redeemed"""
+        with self.lock:
+            reservation = self._match(license_plate, at)
+            if reservation is not None:
+                self._release(reservation)
+
+    def is_held(self, seq: int) -> bool:
+        return seq < len(self.held) and self.held[seq] > 0
+
+class SpotRanking:
+    """All spots ordered by one recommendation score, with lazily built free-spot pools.
+    
+    order[rank] is the spot sequence number at each rank and rank_of[seq] its inverse.
+    Each pool holds the negated ranks of one group of spots (e.g. one spot type on one
+    level) as a sorted array("i"), so the best ranked spot is always at the end; occupied
+    entries are discarded when they reach the end of a pool.
+    """
+    def __init__(self, keys: List, group_of):
+        self.order = array("i", sorted(range(len(keys)), key=keys.__getitem__))
+        self.rank_of = array("i", bytes(4 * len(keys)))
+        for rank, seq in enumerate(self.order):
+            self.rank_of[seq] = rank
+        self.group_of = group_of  # Maps a spot sequence number to its pool key
+        self.pools: Optional[Dict[tuple, array]] = None
+        self.queued = bytearray(len(keys))
+
+    def build_pools(self, occupied: bytearray):
+        self.pools = defaultdict(lambda: array("i"))
+        for rank in range(len(self.order) - 1, -1, -1):
+            seq = self.order[rank]
+            if not occupied[seq]:
+                # Ranks are visited in descending order, so every pool comes out sorted
+                self.pools[self.group_of(seq)].append(-rank)
+                self.queued[seq] = 1
+
+    def release(self, seq: int):
+        if self.pools is not None and not self.queued[seq]:
+            self.queued[seq] = 1
+            bisect.insort(self.pools[self.group_of(seq)], -self.rank_of[seq])
+
+    def take(self, groups: List[tuple], k: int, occupied: bytearray, exclude=()) -> List[int]:
+        """Sequence numbers of up to k free spots across the given pools, best ranked first"""
+        pools = [self.pools[group] for group in groups if group in self.pools]
+        for pool in pools:
+            while pool and occupied[self.order[-pool[-1]]]:
+                self.queued[self.order[-pool.pop()]] = 0
+        # Peeking must not consume free spots, so walk each pool with a cursor instead of popping
+        cursors = [len(pool) - 1 for pool in pools]
+        taken = []
+        while len(taken) < k:
+            best = -1
+            for index, pool in enumerate(pools):
+                cursor = cursors[index]
+                while cursor >= 0 and occupied[self.order[-pool[cursor]]]:
+                    cursor -= 1
+                cursors[index] = cursor
+                if cursor >= 0 and (best < 0 or pool[cursor] > pools[best][cursors[best]]):
+                    best = index
+            if best < 0:
+                break
+            seq = self.order[-pools[best][cursors[best]]]
+            cursors[best] -= 1
+            if seq not in exclude:
+                taken.append(seq)
+        return taken
+
+class RecommendationEngine:
+    """Precomputed spot rankings behind ParkingAI.recommend_spot.
+    
+    Each level is modelled as one aisle running through its sections in order. The entrance
+    is at the start of the level 1 aisle, the exit at its end, and an elevator stands at the
+    middle of every aisle. Every preference mode is ranked once when a layout is loaded (or
+    on the next query after spots are added one at a time), and answers come from per-type
+    pools of that ranking, so a query costs O(k) per pool it draws from.
+    
+    Preferences: "closest" (to the entrance), "exit", "elevator", "level-<n>" (that level
+    first, then the nearest levels) and "section-<name>" (that section on any level first,
+    then the closest spots elsewhere). Anything else, such as a bare "level", is treated as
+    "closest", as recommend_spot always has.
+    """
+    MODES = ("closest", "exit", "elevator", "level", "section")
+
+    def __init__(self, lot: "ParkingAI"):
+        self.lot = lot
+        self.rankings: Dict[str, SpotRanking] = {}
+        self.geometry = None
+        self.spot_count = 0
+        self.lock = threading.Lock()
+
+    def build(self):
+        """Capture the spot geometry and rank the lot for every preference mode"""
+        spots = self.lot.spots
+        if isinstance(spots, ColumnarSpotStore):
+            types, levels = spots.spot_types, spots.levels
+            sections = [spots.section_names[code] for code in spots.sections]
+        else:
+            types = array("b", [SPOT_TYPE_CODE[spot.spot_type] for spot in spots.ordered])
+            levels = array("h", [spot.level for spot in spots.ordered])
+            sections = [spot.section for spot in spots.ordered]
+        count = len(types)
+        
+        # Position along the level's aisle: sections in name order, spots in creation order
+        section_sizes: Dict[Tuple[int, str], int] = defaultdict(int)
+        for seq in range(count):
+            section_sizes[(levels[seq], sections[seq])] += 1
+        next_position = {}
+        aisle_lengths: Dict[int, int] = defaultdict(int)
+        for level, section in sorted(section_sizes):
+            next_position[(level, section)] = aisle_lengths[level]
+            aisle_lengths[level] += section_sizes[(level, section)]
+        positions = array("i", bytes(4 * count))
+        for seq in range(count):
+            key = (levels[seq], sections[seq])
+            positions[seq] = next_position[key]
+            next_position[key] += 1
+        
+        self.geometry = (types, levels, sections, positions, aisle_lengths)
+        self.spot_count = count
+        self.rankings = {mode: self._rank(mode) for mode in self.MODES}
+
+    def _rank(self, mode: str) -> SpotRanking:
+        types, levels, sections, positions, aisle_lengths = self.geometry
+        count = self.spot_count
+        if mode == "exit":
+            keys = [(levels[seq], aisle_lengths[levels[seq]] - 1 - positions[seq], seq) for seq in range(count)]
+        elif mode == "elevator":
+            keys = [(abs(2 * positions[seq] - (aisle_lengths[levels[seq]] - 1)), levels[seq], seq)
+                    for seq in range(count)]
+        else:
+            keys = [(levels[seq], sections[seq], seq) for seq in range(count)]
+        
+        if mode == "level":
+            return SpotRanking(keys, lambda seq: (types[seq], levels[seq]))
+        if mode == "section":
+            return SpotRanking(keys, lambda seq: (types[seq], sections[seq]))
+        return SpotRanking(keys, lambda seq: (types[seq],))
+
+    def release(self, spot: ParkingSpot):
+        with self.lock:
+            if spot.seq < self.spot_count:
+                for ranking in self.rankings.values():
+                    ranking.release(spot.seq)
+
+    def _ranking(self, mode: str) -> SpotRanking:
+        if self.spot_count != len(self.lot.spots):
+            self.build()  # Spots were added since the last build
+        ranking = self.rankings[mode]
+        if ranking.pools is None:
+            ranking.build_pools(self.lot.free_spots.occupied)
+        return ranking
+
+    def recommend(self, vehicle_type: VehicleType, preference: str = "closest", k: int = 1) -> List[str]:
+        mode, _, argument = preference.partition("-")
+        if mode == "level":
+            try:
+                preferred_level = int(argument)
+            except ValueError:
+                mode = "closest"  # A bare or malformed level preference used to fall back to closest
+        if mode not in self.MODES or (mode == "section" and not argument):
+            mode = "closest"
+        type_codes = [SPOT_TYPE_CODE[spot_type] for spot_type in ParkingSpotType
+                      if self.lot.is_spot_suitable(spot_type, vehicle_type)]
+        occupied = self.lot.free_spots.occupied
+        
+        with self.lock:
+            if mode == "level":
+                ranking = self._ranking("level")
+                taken: List[int] = []
+                for level in sorted(self.lot.counters.by_level, key=lambda level: (abs(level - preferred_level), level)):
+                    taken += ranking.take([(code, level) for code in type_codes], k - len(taken), occupied)
+                    if len(taken) >= k:
+                        break
+            elif mode == "section":
+                taken = self._ranking("section").take([(code, argument) for code in type_codes], k, occupied)
+                if len(taken) < k:
+                    taken += self._ranking("closest").take([(code,) for code in type_codes], k - len(taken),
+                                                           occupied, exclude=set(taken))
+            else:
+                taken = self._ranking(mode).take([(code,) for code in type_codes], k, occupied)
+        
+        return [self.lot.spots.by_seq(seq).spot_id for seq in taken]
+
+class OccupancyRollup:
+    """Bounded series of aggregated occupancy buckets at one resolution"""
+    def __init__(self, truncate, capacity: int):
+        self.truncate = truncate  # Maps a timestamp to the start of its bucket
+        # Each bucket is [start, count, sum, min, max]
+        self.buckets = deque(maxlen=capacity)
+
+    def add(self, when: datetime.datetime, rate: float):
+        start = self.truncate(when)
+        if self.buckets and self.buckets[-1][0] == start:
+            bucket = self.buckets[-1]
+            bucket[1] += 1
+            bucket[2] += rate
+            bucket[3] = min(bucket[3], rate)
+            bucket[4] = max(bucket[4], rate)
+        else:
+            self.buckets.append([start, 1, rate, rate, rate])
+
+    def series(self, start: Optional[datetime.datetime] = None) -> List[Tuple[datetime.datetime, float, float, float]]:
+        """(bucket start, mean, min, max) for every bucket that starts at or after start"""
+        return [(bucket_start, total / count, low, high) for bucket_start, count, total, low, high in self.buckets
+                if start is None or bucket_start >= start]
+
+class OccupancyHistory:
+    """Fixed-memory occupancy time series.
+    
+    Keeps a ring buffer of the most recent raw (time, rate) samples plus minute, hour and
+    day rollups, which series() reads back.
+    """
+    RESOLUTIONS = ("minute", "hour", "day")
+
+    def __init__(self, capacity: int = 10_000, minutes: int = 24 * 60, hours: int = 24 * 90, days: int = 2 * 366):
+        self.samples = deque(maxlen=capacity)
+        self.minutes = OccupancyRollup(lambda when: when.replace(second=0, microsecond=0), minutes)
+        self.hours = OccupancyRollup(lambda when: when.replace(minute=0, second=0, microsecond=0), hours)
+        self.days = OccupancyRollup(lambda when: when.replace(hour=0, minute=0, second=0, microsecond=0), days)
+
+    def append(self, when: datetime.datetime, rate: float):
+        self.samples.append((when, rate))
+        for rollup in (self.minutes, self.hours, self.days):
+            rollup.add(when, rate)
+
+    def series(self, resolution: str = "hour",
+               start: Optional[datetime.datetime] = None) -> List[Tuple[datetime.datetime, float, float, float]]:
+        """(bucket start, mean, min, max) occupancy per minute, hour or day, oldest first"""
+        if resolution not in self.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}; use minute, hour or day")
+        return {"minute": self.minutes, "hour": self.hours, "day": self.days}[resolution].series(start)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def __getitem__(self, index):
+        return self.samples[index]
+
+# Forecast horizons, in minutes, reported by ParkingAI.forecast_occupancy()
+DEFAULT_FORECAST_HORIZONS = (15, 30, 60, 120, 240, 480, 720, 1440)
+
+# Slot numbering origin; a Monday, so slot numbers line up with the week
+FORECAST_EPOCH = datetime.datetime(2000, 1, 3)
+
+class OccupancyForecaster:
+    """Seasonal occupancy forecaster for many series at once (e.g. the lot, each spot type, each level).
+    
+    Observations are averaged into slots of slot_minutes. A series is forecast as its
+    hour-of-week baseline plus a damped Holt level and trend fitted to the residual:
+    
+        forecast(h) = baseline[slot + h] + level * damping**h + trend * (damping + ... + damping**h)
+    
+    The baseline for each slot of the week is exponentially smoothed with gamma; until a
+    slot of the week has been seen, the same time of day from other days stands in for
+    it. Closing a slot costs O(series), and forecasting any number of horizons costs
+    O(series x horizons), independent of how much history has been observed. State is
+    kept in flat arrays with one row of series per slot.
+    """
+    def __init__(self, series: List[str], slot_minutes: int = 15, alpha: float = 0.8, beta: float = 0.02,
+                 gamma: float = 0.4, damping: float = 0.9):
+        self.series = series
+        self.slot_seconds = slot_minutes * 60
+        self.week_slots = 7 * 24 * 60 // slot_minutes
+        self.day_slots = 24 * 60 // slot_minutes
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.damping = damping
+        count = len(series)
+        self.week = array("d", bytes(8 * count * self.week_slots))
+        self.day = array("d", bytes(8 * count * self.day_slots))
+        self.week_seen = bytearray(self.week_slots)
+        self.day_seen = bytearray(self.day_slots)
+        self.level = array("d", bytes(8 * count))
+        self.trend = array("d", bytes(8 * count))
+        self.last = array("d", bytes(8 * count))  # Mean of the last closed slot
+        self.pending_sum = array("d", bytes(8 * count))
+        self.pending_count = 0
+        self.pending_slot: Optional[int] = None
+        self.last_slot: Optional[int] = None
+        self.observations = 0
+
+    def slot_of(self, when: datetime.datetime) -> int:
+        """Absolute slot number of a time"""
+        return int((when - FORECAST_EPOCH).total_seconds() // self.slot_seconds)
+
+    def observe(self, when: datetime.datetime, values: List[float]):
+        """Add one sample of every series"""
+        slot = self.slot_of(when)
+        if self.pending_slot is not None and slot > self.pending_slot:
+            self._close_slot()
+        if self.pending_slot is None:
+            # Late samples from an already closed slot count towards the next one
+            self.pending_slot = slot if self.last_slot is None else max(slot, self.last_slot + 1)
+        pending_sum = self.pending_sum
+        for index, value in enumerate(values):
+            pending_sum[index] += value
+        self.pending_count += 1
+        self.observations += 1
+
+    def _baseline(self, slot: int, index: int) -> float:
+        count = len(self.series)
+        week_slot = slot % self.week_slots
+        if self.week_seen[week_slot]:
+            return self.week[week_slot * count + index]
+        day_slot = slot % self.day_slots
+        if self.day_seen[day_slot]:
+            return self.day[day_slot * count + index]
+        return self.last[index]
+
+    def _damped(self, steps: int) -> Tuple[float, float]:
+        # Level decay and cumulative trend gain over the given number of slots
+        decay = self.damping ** steps
+        if self.damping == 1:
+            return decay, float(steps)
+        return decay, self.damping * (1 - decay) / (1 - self.damping)
+
+    def _smooth(self, slot: int, means: List[float]) -> Tuple[array, array]:
+        """Level and trend after taking in one slot's means, without changing the model"""
+        steps = slot - self.last_slot if self.last_slot is not None else 1
+        decay, gain = self._damped(steps)
+        alpha, beta = self.alpha, self.beta
+        level = array("d", self.level)
+        trend = array("d", self.trend)
+        if self.last_slot is None:
+            return level, trend  # The first slot only seeds the baselines
+        for index, mean in enumerate(means):
+            residual = mean - self._baseline(slot, index)
+            new_level = alpha * residual + (1 - alpha) * (level[index] * decay + trend[index] * gain)
+            trend[index] = beta * (new_level - level[index]) / steps + (1 - beta) * trend[index] * decay
+            level[index] = new_level
+        return level, trend
+
+    def _pending_means(self) -> List[float]:
+        return [total / self.pending_count for total in self.pending_sum]
+
+    def _close_slot(self):
+        slot = self.pending_slot
+        means = self._pending_means()
+        self.level, self.trend = self._smooth(slot, means)
+        
+        # Learn the seasonal shape from the observed means
+        count = len(self.series)
+        gamma = self.gamma
+        for table, seen, table_slot in ((self.week, self.week_seen, slot % self.week_slots),
+                                        (self.day, self.day_seen, slot % self.day_slots)):
+            row = table_slot * count
+            if seen[table_slot]:
+                for index, mean in enumerate(means):
+                    table[row + index] += gamma * (mean - table[row + index])
+            else:
+                table[row:row + count] = array("d", means)
+                seen[table_slot] = 1
+        self.last = array("d", means)
+        self.pending_sum = array("d", bytes(8 * count))
+        self.pending_count = 0
+        self.last_slot = slot
+        self.pending_slot = None
+
+    def forecast(self, now: datetime.datetime, horizons_minutes,
+                 series: Optional[List[int]] = None) -> Optional[List[List[float]]]:
+        """Forecast rates (0-100) for each horizon: one list per horizon, holding the requested series.
+        
+        Samples already taken in the current slot are included. Returns None before any
+        observation.
+        """
+        indices = range(len(self.series)) if series is None else series
+        if self.last_slot is None:
+            if not self.pending_count:
+                return None
+            # Too little history for anything but persistence
+            means = self._pending_means()
+            return [[means[index] for index in indices] for _ in horizons_minutes]
+        if self.pending_count:
+            origin = self.pending_slot
+            level, trend = self._smooth(origin, self._pending_means())
+        else:
+            origin, level, trend = self.last_slot, self.level, self.trend
+        
+        forecasts = []
+        for minutes in horizons_minutes:
+            target = self.slot_of(now + datetime.timedelta(minutes=minutes))
+            decay, gain = self._damped(max(0, target - origin))
+            forecasts.append([max(0.0, min(100.0, self._baseline(target, index) + level[index] * decay
+                                           + trend[index] * gain))
+                              for index in indices])
+        return forecasts
+
+class BusyTimeModel:
+    """Hour-of-week (7x24) arrival and departure histograms built from ticket entry and exit times.
+    
+    Counts are updated as tickets open and close. An hour is busy when it sees more than
+    busy_factor times the average hourly arrivals for that weekday. Days with fewer than
+    min_arrivals observed arrivals fall back to DEFAULT_BUSY_HOURS. The histograms can be
+    saved to and loaded from a compact binary file, so a restarted process starts warm.
+    """
+    MAGIC = b"PKBT"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHH")  # magic, version, slots
+
+    def __init__(self, busy_factor: float = 1.25, min_arrivals: int = 48):
+        self.busy_factor = busy_factor
+        self.min_arrivals = min_arrivals
+        self.arrivals = array("Q", bytes(8 * 7 * 24))
+        self.departures = array("Q", bytes(8 * 7 * 24))
+        self.daily_arrivals = array("Q", bytes(8 * 7))
+        self.lock = threading.Lock()
+
+    def record_arrival(self, when: datetime.datetime):
+        day = when.weekday()
+        with self.lock:
+            self.arrivals[day * 24 + when.hour] += 1
+            self.daily_arrivals[day] += 1
+
+    def record_departure(self, when: datetime.datetime):
+        with self.lock:
+            self.departures[when.weekday() * 24 + when.hour] += 1
+
+    def rebuild(self, tickets):
+        """Recount the histograms from scratch from an iterable of tickets"""
+        for counts in (self.arrivals, self.departures, self.daily_arrivals):
+            counts[:] = array("Q", bytes(8 * len(counts)))
+        for ticket in tickets:
+            self.record_arrival(ticket.entry_time)
+            if ticket.exit_time is not None:
+                self.record_departure(ticket.exit_time)
+
+    def is_busy(self, when: datetime.datetime) -> bool:
+        day = when.weekday()
+        day_total = self.daily_arrivals[day]
+        if day_total < self.min_arrivals:
+            return when.hour in DEFAULT_BUSY_HOURS[DAYS_OF_WEEK[day]]
+        return self.arrivals[day * 24 + when.hour] * 24 > day_total * self.busy_factor
+
+    def busy_times(self) -> Dict[str, List[int]]:
+        busy_times = {}
+        for day_index, day in enumerate(DAYS_OF_WEEK):
+            when = datetime.datetime(2024, 1, 1 + day_index)  # 2024-01-01 was a Monday
+            busy_times[day] = [hour for hour in range(24) if self.is_busy(when.replace(hour=hour))]
+        return busy_times
+
+    def save(self, path: str):
+        """Write the histograms to a binary file, replacing it atomically"""
+        arrivals, departures = array("Q", self.arrivals), array("Q", self.departures)
+        if sys.byteorder != "little":
+            arrivals.byteswap()
+            departures.byteswap()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(arrivals)))
+            f.write(arrivals.tobytes())
+            f.write(departures.tobytes())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "BusyTimeModel":
+        model = cls(**kwargs)
+        with open(path, "rb") as f:
+            header = f.read(cls.HEADER.size)
+            if len(header) != cls.HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            magic, version, slots = cls.HEADER.unpack(header)
+            if magic != cls.MAGIC or version != cls.VERSION or slots != len(model.arrivals):
+                raise ValueError(f"{path} is not a version {cls.VERSION} busy-time model")
+            arrivals, departures = f.read(8 * slots), f.read(8 * slots)
+        if len(arrivals) != 8 * slots or len(departures) != 8 * slots:
+            raise ValueError(f"{path} is truncated")
+        model.arrivals = array("Q", arrivals)
+        model.departures = array("Q", departures)
+        if sys.byteorder != "little":
+            model.arrivals.byteswap()
+            model.departures.byteswap()
+        for day in range(7):
+            model.daily_arrivals[day] = sum(model.arrivals[day * 24:(day + 1) * 24])
+        return model
+
+def _encode_time(when: Optional[datetime.datetime]) -> Optional[str]:
+    return when.isoformat() if when is not None else None
+
+def _decode_time(text: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(text) if text is not None else None
+
+class StateJournal:
+    """Append-only log of entry, payment and exit events plus periodic state snapshots.
+    
+    Records are JSON arrays, one per line, starting with a sequence number. They are
+    buffered and written with a single write and fsync per batch (group commit). append()
+    returns the record's sequence number as a commit ticket, and wait_for() blocks until the
+    batch holding it is on disk: the first waiter commits everything pending, and records
+    appended while its fsync runs go out together in the next batch. Callers acknowledge an
+    operation only after wait_for(), so an acknowledged record survives a crash.
+    
+    With durable=False, wait_for() returns at once and a batch is committed once batch_size
+    records are pending, when the oldest pending record is older than flush_interval seconds
+    (a background thread covers quiet periods), or on flush()/close(). A crash then loses up
+    to flush_interval seconds of acknowledged operations. The same triggers also apply in
+    durable mode, for records nobody waits for.
+    
+    On load, a line without its trailing newline counts as torn. Snapshots
+    are zlib-compressed JSON named after the last sequence number they contain; writing one
+    starts a new log segment and deletes the segments and snapshots it supersedes.
+    """
+    def __init__(self, directory: str, batch_size: int = 512, flush_interval: float = 0.05,
+                 fsync: bool = True, snapshot_every: int = 1_000_000, durable: bool = True):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.durable = durable
+        self.sequence = 0  # Last assigned sequence number
+        self.committed = 0  # Last sequence number known to be on disk
+        self.commits = 0  # Batches written
+        self.flushing = False  # A batch is being written outside the lock
+        self.failure: Optional[Exception] = None  # Set when a batch could not be written
+        self.events_since_snapshot = 0
+        self.pending: List[str] = []
+        self.pending_since = 0.0
+        self.lock = threading.RLock()
+        self.wakeup = threading.Condition(self.lock)
+        self.flusher: Optional[threading.Thread] = None
+        self.closed = False
+        self.log_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, prefix: str, sequence: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{prefix}-{sequence:012d}{suffix}")
+
+    def _sorted_files(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        files = []
+        for path in glob.glob(os.path.join(self.directory, f"{prefix}-*{suffix}")):
+            name = os.path.basename(path)[len(prefix) + 1:-len(suffix)]
+            if name.isdigit():
+                files.append((int(name), path))
+        return sorted(files)
+
+    def load(self) -> Tuple[Optional[Dict], List[list]]:
+        """Read the latest snapshot and the log records written after it, then open the log for appends"""
+        with self.lock:
+            snapshot = None
+            snapshots = self._sorted_files("snapshot", ".json.z")
+            if snapshots:
+                with open(snapshots[-1][1], "rb") as f:
+                    snapshot = json.loads(zlib.decompress(f.read()))
+            self.sequence = snapshot["sequence"] if snapshot else 0
+            
+            records = []
+            for _, path in self._sorted_files("log", ".jsonl"):
+                with open(path, "r+b") as f:
+                    offset = 0
+                    for line in f:
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError("record has no trailing newline")
+                            record = json.loads(line)
+                        except ValueError:
+                            # Torn final write from a crash; nothing after it was committed.
+                            # A complete-looking record that lost its newline is torn too,
+                            # or the next append would be glued onto its line.
+                            f.truncate(offset)
+                            break
+                        offset += len(line)
+                        if record[0] > self.sequence:
+                            records.append(record)
+                            self.sequence = record[0]
+            
+            self.events_since_snapshot = len(records)
+            self.committed = self.sequence
+            self._open_segment()
+            return snapshot, records
+
+    def _open_segment(self):
+        if self.log_file is not None:
+            self.log_file.close()
+        self.log_file = open(self._path("log", self.sequence + 1, ".jsonl"), "ab")
+
+    def append(self, kind: str, *fields) -> int:
+        """Queue a record and return its sequence number, the ticket to pass to wait_for()"""
+        with self.lock:
+            self.sequence += 1
+            self.events_since_snapshot += 1
+            if not self.pending:
+                self.pending_since = time.monotonic()
+                self._start_flusher()
+                self.wakeup.notify()
+            self.pending.append(json.dumps([self.sequence, kind, *fields], separators=(",", ":")))
+            if len(self.pending) >= self.batch_size or time.monotonic() - self.pending_since >= self.flush_interval:
+                self.flush()
+            return self.sequence
+
+    def wait_for(self, sequence: int):
+        """Block until the record with this sequence number is on disk (a no-op unless durable)"""
+        if not self.durable:
+            return
+        while True:
+            with self.lock:
+                if self.committed >= sequence:
+                    return
+                self._check_failure()
+                if self.flushing:
+                    self.wakeup.wait()  # Our record is in the next batch, or in this one
+                    continue
+            self.flush()
+
+    def _check_failure(self):
+        if self.failure is not None:
+            raise OSError(f"Journal commit failed: {self.failure}") from self.failure
+
+    def _start_flusher(self):
+        if self.flusher is None and not self.closed:
+            self.flusher = threading.Thread(target=self._flush_loop, name="journal-flush", daemon=True)
+            self.flusher.start()
+
+    def _flush_loop(self):
+        # Commits batches that go quiet before reaching batch_size or another append
+        while True:
+            with self.lock:
+                if self.closed:
+                    return
+                if not self.pending or self.flushing:
+                    self.wakeup.wait()
+                    continue
+                remaining = self.pending_since + self.flush_interval - time.monotonic()
+                if remaining > 0:
+                    self.wakeup.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception:
+                return  # Recorded in failure, which waiters report
+
+    def flush(self):
+        """Commit every pending record with one write and one fsync.
+        
+        The write and fsync run outside the lock, so appends can queue the next batch
+        meanwhile; only one batch is in flight at a time.
+        """
+        with self.lock:
+            while self.flushing:
+                self.wakeup.wait()
+            self._check_failure()
+            if not self.pending:
+                return
+            if self.log_file is None:
+                self._open_segment()
+            batch, self.pending = self.pending, []
+            last = self.sequence
+            log_file = self.log_file
+            self.flushing = True
+        try:
+            log_file.write(("\n".join(batch) + "\n").encode())
+            log_file.flush()
+            if self.fsync:
+                os.fsync(log_file.fileno())
+        except Exception as error:
+            # The log may now end in a partial batch, so nothing more can be committed after it
+            with self.lock:
+                self.failure = error
+                self.flushing = False
+                self.wakeup.notify_all()
+            raise
+        with self.lock:
+            self.committed = last
+            self.commits += 1
+            self.flushing = False
+            self.wakeup.notify_all()
+
+    def snapshot_due(self) -> bool:
+        return self.events_since_snapshot >= self.snapshot_every
+
+    def write_snapshot(self, state: Dict):
+        """Persist a full state snapshot and drop the log segments it makes redundant"""
+        with self.lock:
+            self.flush()
+            state["sequence"] = self.sequence
+            path = self._path("snapshot", self.sequence, ".json.z")
+            with open(path + ".tmp", "wb") as f:
+                f.write(zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 1))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self.events_since_snapshot = 0
+            
+            self._open_segment()
+            current_log = self.log_file.name
+            for _, old_path in self._sorted_files("log", ".jsonl"):
+                if old_path != current_log:
+                    os.remove(old_path)
+            for _, old_path in self._sorted_files("snapshot", ".json.z"):
+                if old_path != path:
+                    os.remove(old_path)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify_all()
+        if self.flusher is not None:
+            self.flusher.join()
+            self.flusher = None
+        with self.lock:
+            self.flush()
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+
+class ArchivedSession(NamedTuple):
+    """A completed parking session as stored in the TicketArchive"""
+    ticket_id: str
+    vehicle_id: str
+    license_plate: str
+    vehicle_type: VehicleType
+    spot_id: str
+    entry_time: datetime.datetime
+    payment_time: Optional[datetime.datetime]
+    exit_time: datetime.datetime
+    amount_paid: float
+
+class TicketArchive:
+    """SQLite store for completed sessions, so that memory only holds recent history.
+    
+    A ParkingAI with an archive keeps each completed session in memory for retain_for
+    after its exit, then moves expired sessions out in batches of at least batch_size,
+    one transaction per batch. Times are stored as ISO strings, which sort correctly.
+    """
+    def __init__(self, path: str, batch_size: int = 1000,
+                 retain_for: datetime.timedelta = datetime.timedelta(hours=1)):
+        self.path = path
+        self.batch_size = batch_size
+        self.retain_for = retain_for
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (ticket_id TEXT PRIMARY KEY, vehicle_id TEXT, "
+            "license_plate TEXT, vehicle_type TEXT, spot_id TEXT, entry_time TEXT, payment_time TEXT, "
+            "exit_time TEXT, amount_paid REAL) WITHOUT ROWID")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_by_entry ON sessions (entry_time)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_by_payment ON sessions (payment_time)")
+        self.connection.commit()
+        self.lock = threading.Lock()  # One batch at a time; sqlite3 connections are not thread-safe
+
+    def store(self, rows: List[tuple]):
+        with self.lock:
+            # Re-archiving a session replayed from the journal after a crash is harmless
+            self.connection.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.connection.commit()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def archived(self, ticket_ids) -> set:
+        """The subset of ticket_ids that is already in the archive"""
+        ticket_ids = list(ticket_ids)
+        found = set()
+        with self.lock:
+            for start in range(0, len(ticket_ids), 500):
+                chunk = ticket_ids[start:start + 500]
+                query = f"SELECT ticket_id FROM sessions WHERE ticket_id IN ({', '.join('?' * len(chunk))})"
+                found.update(row[0] for row in self.connection.execute(query, chunk))
+        return found
+
+    def sessions(self, start: Optional[datetime.datetime] = None,
+                 end: Optional[datetime.datetime] = None) -> Iterator[ArchivedSession]:
+        """Archived sessions that entered in [start, end), oldest first"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM sessions WHERE entry_time >= ? AND entry_time < ? ORDER BY entry_time",
+                (_encode_time(start) if start else "", _encode_time(end) if end else "~")).fetchall()
+        for row in rows:
+            yield ArchivedSession(row[0], row[1], row[2], VehicleType(row[3]), row[4], _decode_time(row[5]),
+                                  _decode_time(row[6]), _decode_time(row[7]), row[8])
+
+    def revenue_by_type(self, start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None) -> Dict[VehicleType, Tuple[int, float]]:
+        """(paid sessions, revenue) per vehicle type for payments made in [start, end)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT vehicle_type, COUNT(*), SUM(amount_paid) FROM sessions "
+                "WHERE payment_time >= ? AND payment_time < ? GROUP BY vehicle_type",
+                (_encode_time(start) if start else "", _encode_time(end) if end else "~")).fetchall()
+        return {VehicleType(vehicle_type): (count, revenue) for vehicle_type, count, revenue in rows}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class SharedExclusiveLock:
+    """Lock held by many threads at once in shared mode, or by one thread in exclusive mode.
+    
+    Waiting exclusive holders block new shared holders so they cannot be starved.
+    Not reentrant.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.shared_holders = 0
+        self.exclusive_held = False
+        self.exclusive_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self.condition:
+            while self.exclusive_held or self.exclusive_waiting:
+                self.condition.wait()
+            self.shared_holders += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.shared_holders -= 1
+                if not self.shared_holders:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self.condition:
+            self.exclusive_waiting += 1
+            while self.exclusive_held or self.shared_holders:
+                self.condition.wait()
+            self.exclusive_waiting -= 1
+            self.exclusive_held = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.exclusive_held = False
+                self.condition.notify_all()
+
+# Hot-path methods wrapped by ParkingAI.instrument()
+INSTRUMENTED_METHODS = ("vehicle_entry", "reserve_spot", "find_available_spot", "pay_ticket", "vehicle_exit",
+                        "calculate_parking_fee", "get_parking_status", "recommend_spot", "recommend_spots",
+                        "record_occupancy", "predict_occupancy")
+
+def _latency_bucket(nanoseconds: int) -> int:
+    # Four buckets per power of two: the bit length plus the two bits below the leading one
+    bits = nanoseconds.bit_length()
+    if bits <= 3:
+        return nanoseconds
+    return 4 * (bits - 2) + ((nanoseconds >> (bits - 3)) & 3)
+
+def _bucket_midpoint(bucket: int) -> float:
+    if bucket < 8:
+        return float(bucket)
+    bits = bucket // 4 + 2
+    lower = (4 + bucket % 4) << (bits - 3)
+    return lower + (1 << (bits - 3)) / 2
+
+class OperationStats:
+    """Call counts and latency histograms for instrumented ParkingAI methods.
+    
+    Each call costs two clock reads and a few integer operations. Latencies fall into
+    log-scale buckets, four per power of two nanoseconds, so percentiles are accurate to
+    within about 12%. Updates are not locked, so counts from many concurrent lanes may
+    come out slightly low.
+    """
+    BUCKETS = 4 * 64
+
+    def __init__(self):
+        self.histograms: Dict[str, array] = {}
+        self.total_ns: Dict[str, array] = {}
+
+    def wrap(self, name: str, method):
+        histogram = self.histograms[name] = array("Q", bytes(8 * self.BUCKETS))
+        total = self.total_ns[name] = array("Q", [0])
+        clock = time.perf_counter_ns
+        
+        def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                histogram[_latency_bucket(elapsed)] += 1
+                total[0] += elapsed
+        
+        timed.__wrapped__ = method
+        return timed
+
+    def reset(self):
+        # Zero in place: the wrappers hold on to these arrays
+        for name, histogram in self.histograms.items():
+            histogram[:] = array("Q", bytes(8 * self.BUCKETS))
+            self.total_ns[name][0] = 0
+
+    def calls(self, name: str) -> int:
+        return sum(self.histograms[name])
+
+    def latency_percentile(self, name: str, q: float) -> float:
+        """Approximate latency percentile (q in 0-100) in microseconds"""
+        histogram = self.histograms[name]
+        calls = sum(histogram)
+        if calls == 0:
+            return 0.0
+        target = max(1, math.ceil(calls * q / 100))
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if seen >= target:
+                return _bucket_midpoint(bucket) / 1000
+        return 0.0
+
+    def report(self) -> Dict[str, Dict]:
+        """Calls and latency summary (microseconds) for every method that was called"""
+        report = {}
+        for name, histogram in self.histograms.items():
+            calls = sum(histogram)
+            if calls:
+                report[name] = {
+                    "calls": calls,
+                    "mean_us": self.total_ns[name][0] / calls / 1000,
+                    "p50_us": self.latency_percentile(name, 50),
+                    "p90_us": self.latency_percentile(name, 90),
+                    "p99_us": self.latency_percentile(name, 99),
+                    "max_us": self.latency_percentile(name, 100)
+                }
+        return report
+
+class ProfileCapture:
+    """Switchable cProfile and/or tracemalloc capture around a block of work.
+    
+        with ProfileCapture(cpu=True, memory=True) as capture:
+            parking_ai.simulate_activity(hours=24, headless=True)
+        print(capture.report())
+    """
+    def __init__(self, cpu: bool = True, memory: bool = False, limit: int = 15):
+        self.cpu = cpu
+        self.memory = memory
+        self.limit = limit
+        self.profiler: Optional[cProfile.Profile] = None
+        self.cpu_report = ""
+        self.memory_top: List[tracemalloc.Statistic] = []
+        self.memory_peak = 0
+        self._started_tracing = False
+
+    def __enter__(self) -> "ProfileCapture":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.cpu:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(self.limit)
+            self.cpu_report = stream.getvalue()
+        if self.memory:
+            self.memory_top = tracemalloc.take_snapshot().statistics("lineno")[:self.limit]
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def report(self) -> str:
+        sections = []
+        if self.cpu:
+            sections.append(self.cpu_report)
+        if self.memory:
+            lines = [f"Peak traced memory: {self.memory_peak / 2**20:.1f} MiB"]
+            lines += [str(statistic) for statistic in self.memory_top]
+            sections.append("\n".join(lines))
+        return "\n".join(sections)
+
+class ParkingAI:
+    def __init__(self, check_consistency: bool = False, columnar_spots: bool = False, clock=None,
+                 archive: Optional[TicketArchive] = None):
+        # Very large lots can keep spots in parallel arrays instead of one object per spot
+        self.spots: Union[SpotStore, ColumnarSpotStore] = SpotStore()
+        if columnar_spots:
+            self.spots = ColumnarSpotStore()
+            self.spots.lot = self
         self.vehicles: Dict[str, Vehicle] = {}
         self.tickets: Dict[str, ParkingTicket] = {}
         self.parking_rates: Dict[VehicleType, ParkingRate] = {}
         self.total_revenue = 0.0
-        self.occupancy_history = []  # Store occupancy snapshots
+        self.clock = clock or SYSTEM_CLOCK  # Time source for spots, tickets and fees
+        self.occupancy_history = OccupancyHistory()  # Bounded occupancy snapshots
+        self.forecaster: Optional[OccupancyForecaster] = None  # Created on the first recorded sample
+        self.busy_model = BusyTimeModel()  # Replace with BusyTimeModel.load(path) to start warm
+        self.journal: Optional[StateJournal] = None  # Set by ParkingAI.recover()
+        self.logged = threading.local()  # sequence: the calling thread's last journal record
+        self.free_spots = FreeSpotIndex()
+        self.counters = OccupancyCounters()
+        self.recommender = RecommendationEngine(self)
+        self.sessions = SessionIndex()
+        self.reservations = ReservationBook(self)
+        self.events = EventBus()
+        self.archive = archive
+        self.completed: deque = deque()  # Completed ticket IDs in exit order, awaiting the archive
+        self.archive_lock = threading.Lock()
+        self.stats: Optional[OperationStats] = None
+        # When enabled, every status call recomputes the counters from scratch and compares
+        self.check_consistency = check_consistency
+        
+        # Concurrency: spot allocation is serialized per spot type, ticket updates per ticket
+        # stripe. Single-ticket operations share state_lock; bulk settlement and snapshots
+        # take it exclusively so they see a consistent lot.
+        self.type_locks = {spot_type: threading.Lock() for spot_type in ParkingSpotType}
+        self.ticket_locks = [threading.Lock() for _ in range(64)]
+        self.revenue_lock = threading.Lock()
+        self.id_lock = threading.Lock()
+        self.state_lock = SharedExclusiveLock()
+        self.next_entry_number = 1  # Vehicle and ticket IDs share the number: V-<n> / T-<n>
         
         # Initialize rates
         self._initialize_rates()
+        self._pricing = PricingEngine(PricingPolicy(self.parking_rates))
 
     def _initialize_rates(self):
         self.parking_rates[VehicleType.CAR] = ParkingRate(VehicleType.CAR, 2.0, 24.0)
@@ -109,206 +2267,747 @@ class ParkingAI:
         self.parking_rates[VehicleType.TRUCK] = ParkingRate(VehicleType.TRUCK, 4.0, 48.0)
         self.parking_rates[VehicleType.HANDICAPPED] = ParkingRate(VehicleType.HANDICAPPED, 1.0, 12.0)
 
-    def initialize_parking_lot(self, levels: int, spots_per_level: int):
-        """Initialize the parking lot with a given number of levels and spots per level"""
-        spot_id_counter = 1
-        for level in range(1, levels + 1):
-            # Define sections A, B, C, D for each level
-            sections = ["A", "B", "C", "D"]
-            
-            for section in sections:
-                # Allocate different types of spots in each section
-                spots_in_section = spots_per_level // len(sections)
-                
-                # Define distribution of spot types (can be customized)
-                regular_spots = int(spots_in_section * 0.6)
-                compact_spots = int(spots_in_section * 0.2)
-                large_spots = int(spots_in_section * 0.1)
-                handicapped_spots = int(spots_in_section * 0.05)
-                motorcycle_spots = spots_in_section - regular_spots - compact_spots - large_spots - handicapped_spots
-                
-                # Create regular spots
-                for i in range(regular_spots):
-                    spot_id = f"{level}-{section}-{spot_id_counter}"
-                    self.spots[spot_id] = ParkingSpot(spot_id, ParkingSpotType.REGULAR, level, section)
-                    spot_id_counter += 1
-                
-                # Create compact spots
-                for i in range(compact_spots):
-                    spot_id = f"{level}-{section}-{spot_id_counter}"
-                    self.spots[spot_id] = ParkingSpot(spot_id, ParkingSpotType.COMPACT, level, section)
-                    spot_id_counter += 1
-                
-                # Create large spots
-                for i in range(large_spots):
-                    spot_id = f"{level}-{section}-{spot_id_counter}"
-                    self.spots[spot_id] = ParkingSpot(spot_id, ParkingSpotType.LARGE, level, section)
-                    spot_id_counter += 1
-                
-                # Create handicapped spots
-                for i in range(handicapped_spots):
-                    spot_id = f"{level}-{section}-{spot_id_counter}"
-                    self.spots[spot_id] = ParkingSpot(spot_id, ParkingSpotType.HANDICAPPED, level, section)
-                    spot_id_counter += 1
-                
-                # Create motorcycle spots
-                for i in range(motorcycle_spots):
-                    spot_id = f"{level}-{section}-{spot_id_counter}"
-                    self.spots[spot_id] = ParkingSpot(spot_id, ParkingSpotType.MOTORCYCLE, level, section)
-                    spot_id_counter += 1
+    def set_pricing(self, policy: PricingPolicy):
+        """Switch to a new pricing policy, rebuilding the cached rate tables"""
+        self._pricing = PricingEngine(policy)
+        self.parking_rates = policy.rates
+
+    @property
+    def pricing(self) -> PricingEngine:
+        """The rate tables, rebuilt first if parking_rates was edited or replaced since they were built"""
+        engine = self._pricing
+        if (engine.revision != ParkingRate.revision or engine.policy.rates is not self.parking_rates
+                or len(engine.rates) != len(self.parking_rates)):
+            policy = engine.policy
+            engine = self._pricing = PricingEngine(PricingPolicy(self.parking_rates, policy.hourly_multipliers,
+                                                                 policy.demand_tiers))
+        return engine
+
+    def _demand_tier(self, spot_type: ParkingSpotType) -> int:
+        if len(self.pricing.thresholds) == 1:
+            return 0
+        total, occupied = self.counters.by_type[spot_type]
+        return self.pricing.tier(occupied / total if total else 0.0)
+
+    def _ticket_tier(self, vehicle: Vehicle) -> int:
+        if len(self.pricing.thresholds) == 1:
+            return 0
+        spot = self.spots.get(vehicle.parked_spot_id)
+        return self._demand_tier(spot.spot_type) if spot is not None else 0
+
+    def initialize_parking_lot(self, levels: int, spots_per_level: int, verbose: bool = True):
+        """Initialize the parking lot with a given number of levels and spots per level.
+        
+        Each level is split into sections A-D with the default spot mix (see LotLayout.uniform).
+        """
+        self.load_layout(LotLayout.uniform(levels, spots_per_level))
+        
+        if verbose:
+            print(f"Parking lot initialized with {len(self.spots)} spots across {levels} levels")
+
+    def load_layout(self, layout: LotLayout):
+        """Add every spot of a layout in bulk, numbered after any spots already in the lot.
+        
+        Spots are registered a run (one type in one section) at a time rather than one by
+        one; with columnar_spots=True no per-spot objects are created at all.
+        """
+        for level, section, counts in layout.sections:
+            for spot_type in ParkingSpotType:
+                count = counts.get(spot_type, 0)
+                if count:
+                    first_seq = len(self.spots)
+                    self.spots.add_run(self, spot_type, level, section, count)
+                    self.free_spots.add_run(spot_type, level, section, first_seq, count)
+                    self.counters.add_run(spot_type, level, section, count)
         
-        print(f"Parking lot initialized with {len(self.spots)} spots across {levels} levels")
+        # Rank the new layout once for recommendations
+        with self.recommender.lock:
+            self.recommender.build()
+
+    def create_spot(self, spot_id: str, spot_type: ParkingSpotType, level: int, section: str):
+        """Create a free spot in the lot's spot store and register it"""
+        if isinstance(self.spots, ColumnarSpotStore):
+            spot = self.spots.add(spot_id, spot_type, level, section)
+            self._register_spot(spot)
+            return spot
+        return self.add_spot(ParkingSpot(spot_id, spot_type, level, section))
+
+    def add_spot(self, spot: ParkingSpot):
+        """Register a spot object with the lot, its free-spot index and counters"""
+        if isinstance(self.spots, ColumnarSpotStore):
+            # Columnar lots only hold free spots created from the spot's attributes
+            return self.create_spot(spot.spot_id, spot.spot_type, spot.level, spot.section)
+        spot.lot = self
+        self.spots.add(spot)
+        self._register_spot(spot)
+        return spot
+
+    def _register_spot(self, spot: ParkingSpot):
+        self.free_spots.add(spot)
+        self.counters.add(spot)
+
+    def instrument(self, methods: Tuple[str, ...] = INSTRUMENTED_METHODS) -> OperationStats:
+        """Count calls and record latency histograms for the given methods until uninstrument()"""
+        self.uninstrument()
+        self.stats = OperationStats()
+        for name in methods:
+            # Instance attributes shadow the methods, so internal calls are measured too
+            setattr(self, name, self.stats.wrap(name, getattr(self, name)))
+        return self.stats
+
+    def uninstrument(self):
+        if self.stats is not None:
+            for name in self.stats.histograms:
+                delattr(self, name)
+            self.stats = None
+
+    def _spot_occupied(self, spot: ParkingSpot):
+        self.free_spots.claim(spot)
+        self.counters.update(spot, 1)
+        if self.events.subscriptions:
+            self.events.publish(SpotEvent(spot.occupied_since, "occupied", spot.spot_id, spot.spot_type,
+                                          spot.level, spot.section, spot.vehicle_id))
+
+    def _spot_vacated(self, spot: ParkingSpot, vehicle_id: Optional[str] = None):
+        if not self.reservations.is_held(spot.seq):  # A held spot stays off the free list until claimed
+            self.free_spots.release(spot)
+            self.recommender.release(spot)
+        self.counters.update(spot, -1)
+        if self.events.subscriptions:
+            self.events.publish(SpotEvent(self.clock.now(), "vacated", spot.spot_id, spot.spot_type,
+                                          spot.level, spot.section, vehicle_id))
+
+    def verify_counters(self):
+        """Recompute occupancy counters from the spots and raise if the running totals drifted"""
+        problems = self.counters.mismatches(OccupancyCounters.from_spots(self.spots.values()))
+        if problems:
+            raise RuntimeError("Occupancy counters out of sync: " + "; ".join(problems))
 
     def find_available_spot(self, vehicle_type: VehicleType) -> Optional[str]:
-        """Find an available parking spot suitable for the given vehicle type"""
-        available_spots = []
-        
-        # Define which spot types are suitable for each vehicle type
-        suitable_spot_types = {
-            VehicleType.CAR: [ParkingSpotType.REGULAR, ParkingSpotType.LARGE],
-            VehicleType.MOTORCYCLE: [ParkingSpotType.MOTORCYCLE, ParkingSpotType.REGULAR, ParkingSpotType.LARGE],
-            VehicleType.TRUCK: [ParkingSpotType.LARGE],
-            VehicleType.HANDICAPPED: [ParkingSpotType.HANDICAPPED, ParkingSpotType.LARGE]
-        }
+        """Find an available parking spot suitable for the given vehicle type, skipping held spots"""
+        primary_type, *secondary_types = SUITABLE_SPOT_TYPES[vehicle_type]
+        self.reservations.advance(self.clock.now())
         
-        # First check for exact type match - optimal allocation
-        primary_spots = []
-        secondary_spots = []
-        
-        for spot_id, spot in self.spots.items():
-            if not spot.is_occupied:
-                # Primary match (exact type match)
-                if (vehicle_type == VehicleType.CAR and spot.spot_type == ParkingSpotType.REGULAR) or \
-                   (vehicle_type == VehicleType.MOTORCYCLE and spot.spot_type == ParkingSpotType.MOTORCYCLE) or \
-                   (vehicle_type == VehicleType.TRUCK and spot.spot_type == ParkingSpotType.LARGE) or \
-                   (vehicle_type == VehicleType.HANDICAPPED and spot.spot_type == ParkingSpotType.HANDICAPPED):
-                    primary_spots.append(spot_id)
-                # Secondary match (suitable but not optimal)
-                elif spot.spot_type in suitable_spot_types[vehicle_type]:
-                    secondary_spots.append(spot_id)
-        
-        # Prefer exact matches, then suitable spots
-        if primary_spots:
-            # Find closest to entrance (for simplicity, we'll use lower level and section A as closest)
-            primary_spots.sort(key=lambda x: (int(x.split('-')[0]), x.split('-')[1]))
-            return primary_spots[0]
-        elif secondary_spots:
-            secondary_spots.sort(key=lambda x: (int(x.split('-')[0]), x.split('-')[1]))
-            return secondary_spots[0]
+        # Prefer exact matches (optimal allocation), then the closest suitable spot.
+        # Closest to entrance is lower level and section A first.
+        with self.type_locks[primary_type]:
+            best = self.free_spots.peek(primary_type)
+        if best is None:
+            for spot_type in secondary_types:
+                with self.type_locks[spot_type]:
+                    candidate = self.free_spots.peek(spot_type)
+                if candidate is not None and (best is None or candidate < best):
+                    best = candidate
         
-        return None
+        return self.spots.by_seq(best[2]).spot_id if best is not None else None
+
+    def reserve_spot(self, vehicle_type: VehicleType, vehicle_id: str,
+                     at: Optional[datetime.datetime] = None) -> Optional[ParkingSpot]:
+        """Atomically pick the best free spot for a vehicle and occupy it, skipping held spots"""
+        primary_type, *secondary_types = SUITABLE_SPOT_TYPES[vehicle_type]
+        self.reservations.advance(at or self.clock.now())
+        
+        with self.type_locks[primary_type]:
+            best = self.free_spots.peek(primary_type)
+            if best is not None:
+                spot = self.spots.by_seq(best[2])
+                spot.occupy(vehicle_id, at=at)
+                return spot
+        
+        if not secondary_types:
+            return None
+        # Take the secondary type locks in one global order so concurrent lanes cannot deadlock
+        locks = [self.type_locks[spot_type] for spot_type in sorted(secondary_types, key=SPOT_TYPE_CODE.get)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            best = None
+            for spot_type in secondary_types:
+                candidate = self.free_spots.peek(spot_type)
+                if candidate is not None and (best is None or candidate < best):
+                    best = candidate
+            if best is None:
+                return None
+            spot = self.spots.by_seq(best[2])
+            spot.occupy(vehicle_id, at=at)
+            return spot
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _next_entry_number(self) -> int:
+        with self.id_lock:
+            number = self.next_entry_number
+            self.next_entry_number += 1
+            return number
+
+    def _ticket_lock(self, ticket_id: str) -> threading.Lock:
+        return self.ticket_locks[hash(ticket_id) % len(self.ticket_locks)]
 
     def vehicle_entry(self, license_plate: str, vehicle_type: VehicleType) -> Optional[Tuple[str, str]]:
-        """Handle vehicle entry - find a spot, generate ticket, and return spot location and ticket"""
-        # Create a vehicle record
-        vehicle_id = f"V-{len(self.vehicles) + 1}"
-        vehicle = Vehicle(vehicle_id, vehicle_type, license_plate)
-        vehicle.entry_time = datetime.datetime.now()
-        
-        # Find a suitable parking spot
-        spot_id = self.find_available_spot(vehicle_type)
-        if not spot_id:
-            return None  # No available spots
-        
-        # Park the vehicle
-        spot = self.spots[spot_id]
-        spot.occupy(vehicle_id)
-        vehicle.parked_spot_id = spot_id
-        
-        # Create a ticket
-        ticket_id = f"T-{len(self.tickets) + 1}"
-        ticket = ParkingTicket(ticket_id, vehicle_id, vehicle.entry_time)
-        
-        # Save records
-        self.vehicles[vehicle_id] = vehicle
-        self.tickets[ticket_id] = ticket
+        """Handle vehicle entry - find a spot, generate ticket, and return spot location and ticket.
+        
+        Safe to call from many threads: IDs come from a shared sequence and the spot is
+        reserved atomically. IDs are unique but may skip numbers after a rejected entry.
+        """
+        with self.state_lock.shared():
+            # Create a vehicle record
+            number = self._next_entry_number()
+            vehicle_id = f"V-{number}"
+            vehicle = Vehicle(vehicle_id, vehicle_type, license_plate)
+            vehicle.entry_time = self.clock.now()
+            
+            # Park in the plate's booked spot, or else find a suitable free one
+            reservation = spot = None
+            if license_plate in self.reservations.by_plate:
+                reservation, spot = self.reservations.claim(license_plate, vehicle_type, vehicle_id, vehicle.entry_time)
+            if spot is None:
+                spot = self.reserve_spot(vehicle_type, vehicle_id, at=vehicle.entry_time)
+                if spot is None:
+                    return None  # No available spots; any booking stays for a later arrival
+                if reservation is not None:
+                    self.reservations.redeem(reservation)  # Replay drops it again with the entry record
+            spot_id = spot.spot_id
+            vehicle.parked_spot_id = spot_id
+            
+            # Create a ticket
+            ticket_id = f"T-{number}"
+            ticket = ParkingTicket(ticket_id, vehicle_id, vehicle.entry_time, self)
+            
+            # Log before the ticket becomes visible, so its payment and exit are journaled after it
+            if self.journal is not None:
+                self._log("entry", vehicle_id, ticket_id, license_plate, vehicle_type.value, spot_id,
+                          _encode_time(ticket.entry_time))
+            
+            # Save records
+            self.vehicles[vehicle_id] = vehicle
+            self.tickets[ticket_id] = ticket
+            self.sessions.start(ticket, license_plate, spot_id)
+            self.busy_model.record_arrival(ticket.entry_time)
+        self._commit()
         
         # Return the spot location and ticket ID
-        location_info = f"Level {spot.level}, Section {spot.section}, Spot {spot.spot_id}"
+        location_info = f"Level {spot.level}, Section {spot.section}, Spot {spot_id}"
         return (location_info, ticket_id)
 
-    def calculate_parking_fee(self, ticket_id: str) -> float:
-        """Calculate the parking fee for a given ticket"""
+    def book_spot(self, license_plate: str, vehicle_type: VehicleType, start: datetime.datetime,
+                  end: datetime.datetime) -> Optional[Reservation]:
+        """Book a spot for [start, end); None when no suitable spot is free for the whole window"""
+        def log_booking(reservation: Reservation):
+            self._log("book", reservation.reservation_id, license_plate, vehicle_type.value, reservation.spot_id,
+                      _encode_time(start), _encode_time(end))
+        
+        with self.state_lock.shared():
+            # Journal inside the book's critical section, so the booking is logged before any claim of it
+            reservation = self.reservations.book(license_plate, vehicle_type, start, end, self.clock.now(),
+                                                 on_booked=log_booking if self.journal is not None else None)
+        self._commit()
+        return reservation
+
+    def cancel_reservation(self, reservation_id: str) -> bool:
+        """Cancel a booking that has not been claimed or expired"""
+        def log_cancellation(reservation: Reservation):
+            self._log("cancel", reservation.reservation_id)
+        
+        with self.state_lock.shared():
+            cancelled = self.reservations.cancel(reservation_id,
+                                                 on_cancelled=log_cancellation if self.journal is not None else None)
+        self._commit()
+        return cancelled
+
+    def spot_availability(self, start: datetime.datetime, end: datetime.datetime) -> Dict[str, int]:
+        """Spots of each type with no booking during [start, end).
+        
+        Only bookings are considered; vehicles parked now may still be there later.
+        """
+        return {spot_type.value: self.reservations.available(spot_type, start, end) for spot_type in ParkingSpotType}
+
+    def calculate_parking_fee(self, ticket_id: str, at: Optional[datetime.datetime] = None) -> float:
+        """Calculate the parking fee for a given ticket at the current demand for its spot type"""
         if ticket_id not in self.tickets:
             return 0.0
         
         ticket = self.tickets[ticket_id]
         vehicle = self.vehicles[ticket.vehicle_id]
-        rate = self.parking_rates[vehicle.vehicle_type]
         
-        current_time = datetime.datetime.now()
+        current_time = at or self.clock.now()
         duration = current_time - ticket.entry_time
         hours = duration.total_seconds() / 3600
         
-        # Calculate fee
-        fee = hours * rate.hourly_rate
+        return self.pricing.fee(vehicle.vehicle_type, ticket.entry_time, hours, self._ticket_tier(vehicle))
+
+    def calculate_fees(self, ticket_ids: Optional[List[str]] = None,
+                       at: Optional[datetime.datetime] = None) -> Dict[str, float]:
+        """Price many tickets in one pass against a single reference time.
         
-        # Apply daily maximum if applicable
-        days = hours / 24
-        daily_max_fee = days * rate.daily_max
+        Defaults to every unpaid ticket. Results match calculate_parking_fee exactly.
+        """
+        if ticket_ids is None:
+            ticket_ids = [ticket_id for ticket_id, ticket in self.tickets.items() if not ticket.is_paid]
+        current_time = at or self.clock.now()
         
-        return min(fee, daily_max_fee)
+        # Gather entry times and rates into parallel columns, then price them together.
+        # Elapsed time is kept in whole microseconds so hours match timedelta.total_seconds().
+        # Demand tiers are looked up once per spot type, as occupancy is fixed for the call.
+        pricing = self.pricing
+        tiers = {spot_type: self._demand_tier(spot_type) for spot_type in ParkingSpotType}
+        one_microsecond = datetime.timedelta(microseconds=1)
+        priced_ids = []
+        entry_times = []
+        elapsed_us = []
+        hourly_rates = []
+        daily_maxes = []
+        for ticket_id in ticket_ids:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None:
+                continue
+            vehicle = self.vehicles[ticket.vehicle_id]
+            tier = 0
+            if len(pricing.thresholds) > 1:
+                spot = self.spots.get(vehicle.parked_spot_id)
+                tier = tiers[spot.spot_type] if spot is not None else 0
+            hourly_rate, daily_max = pricing.rates[vehicle.vehicle_type][tier]
+            priced_ids.append(ticket_id)
+            entry_times.append(ticket.entry_time)
+            elapsed_us.append((current_time - ticket.entry_time) // one_microsecond)
+            hourly_rates.append(hourly_rate)
+            daily_maxes.append(daily_max)
+        
+        fee_for_hours = pricing.fee_for_hours
+        hours = [us / 10**6 / 3600 for us in elapsed_us]
+        if not pricing.flat:
+            billable_hours = pricing.billable_hours
+            hours = [billable_hours(entry_time, elapsed) for entry_time, elapsed in zip(entry_times, hours)]
+        fees = [fee_for_hours(elapsed, hourly_rate, daily_max)
+                for elapsed, hourly_rate, daily_max in zip(hours, hourly_rates, daily_maxes)]
+        
+        result = dict.fromkeys(ticket_ids, 0.0)
+        result.update(zip(priced_ids, fees))
+        return result
+
+    def settle_all(self, at: Optional[datetime.datetime] = None) -> Dict[str, float]:
+        """End-of-day settlement: pay every open ticket and release its spot.
+        
+        Returns the fee charged per newly paid ticket; total_revenue is updated once.
+        """
+        with self.state_lock.exclusive():
+            settle_time = at or self.clock.now()
+            open_tickets = list(self.sessions.oldest())
+            fees = self.calculate_fees([ticket.ticket_id for ticket in open_tickets if not ticket.is_paid],
+                                       at=settle_time)
+            
+            revenue = self.total_revenue
+            for ticket in open_tickets:
+                if not ticket.is_paid:
+                    fee = fees[ticket.ticket_id]
+                    ticket.pay(fee, at=settle_time)
+                    revenue += fee
+                    if self.journal is not None:
+                        self._log("pay", ticket.ticket_id, fee, _encode_time(settle_time))
+                
+                vehicle = self.vehicles.get(ticket.vehicle_id)
+                spot = self.spots.get(vehicle.parked_spot_id) if vehicle else None
+                if spot is not None and spot.vehicle_id == vehicle.vehicle_id and spot.vacate():
+                    ticket.complete_exit(at=settle_time)
+                    vehicle.exit_time = ticket.exit_time
+                    self._end_session(ticket.ticket_id, vehicle, spot.spot_id)
+                    self.busy_model.record_departure(settle_time)
+                    if self.journal is not None:
+                        self._log("exit", ticket.ticket_id, _encode_time(settle_time))
+            self.total_revenue = revenue
+        self._commit()
+        self._maybe_archive()
+        
+        return fees
 
     def pay_ticket(self, ticket_id: str) -> Tuple[bool, float]:
         """Process payment for a parking ticket"""
         if ticket_id not in self.tickets:
             return (False, 0.0)
         
-        ticket = self.tickets[ticket_id]
-        if ticket.is_paid:
-            return (False, 0.0)
-        
-        fee = self.calculate_parking_fee(ticket_id)
-        payment_success = ticket.pay(fee)
-        
-        if payment_success:
-            self.total_revenue += fee
-            return (True, fee)
+        with self.state_lock.shared(), self._ticket_lock(ticket_id):
+            ticket = self.tickets.get(ticket_id)  # May have been archived since the check above
+            if ticket is None or ticket.is_paid:
+                return (False, 0.0)
+            
+            fee = self.calculate_parking_fee(ticket_id)
+            payment_success = ticket.pay(fee)
+            
+            if not payment_success:
+                return (False, 0.0)
+            with self.revenue_lock:
+                self.total_revenue += fee
+            if self.journal is not None:
+                self._log("pay", ticket_id, fee, _encode_time(ticket.payment_time))
+        self._commit()
         
-        return (False, 0.0)
+        return (True, fee)
 
     def vehicle_exit(self, ticket_id: str) -> bool:
         """Handle vehicle exit"""
         if ticket_id not in self.tickets:
             return False
         
-        ticket = self.tickets[ticket_id]
-        if not ticket.is_paid:
-            return False
+        with self.state_lock.shared(), self._ticket_lock(ticket_id):
+            ticket = self.tickets.get(ticket_id)  # May have been archived since the check above
+            if ticket is None or not ticket.is_paid or ticket.exit_time is not None:
+                return False
+            
+            vehicle_id = ticket.vehicle_id
+            if vehicle_id not in self.vehicles:
+                return False
+            
+            vehicle = self.vehicles[vehicle_id]
+            spot_id = vehicle.parked_spot_id
+            
+            if spot_id not in self.spots:
+                return False
+            
+            # Vacate the spot and log the exit in one critical section, so an entry that
+            # reuses the spot can only be journaled after this exit
+            spot = self.spots[spot_id]
+            with self.type_locks[spot.spot_type]:
+                result = spot.vacate() if spot.vehicle_id == vehicle_id else None
+                if not result:
+                    return False
+                ticket.complete_exit()
+                if self.journal is not None:
+                    self._log("exit", ticket_id, _encode_time(ticket.exit_time))
+            
+            # Update exit time
+            vehicle.exit_time = ticket.exit_time
+            self._end_session(ticket_id, vehicle, spot_id)
+            self.busy_model.record_departure(ticket.exit_time)
+        self._commit()
+        self._maybe_archive()
+        
+        return True
+
+    def _end_session(self, ticket_id: str, vehicle: Vehicle, spot_id: str):
+        self.sessions.end(ticket_id, vehicle.license_plate, spot_id)
+        if self.archive is not None:
+            self.completed.append(ticket_id)
+
+    def _maybe_archive(self):
+        if self.archive is None or len(self.completed) < self.archive.batch_size:
+            return
+        oldest = self.tickets.get(self.completed[0])
+        if oldest is None or oldest.exit_time <= self.clock.now() - self.archive.retain_for:
+            self.archive_completed()
+
+    def archive_completed(self, at: Optional[datetime.datetime] = None) -> int:
+        """Move sessions that completed more than archive.retain_for ago to the archive.
         
-        vehicle_id = ticket.vehicle_id
-        if vehicle_id not in self.vehicles:
-            return False
+        Returns the number of sessions moved. Completed tickets never change again, so
+        rows are written without blocking the gates; only the removal from memory is
+        done under the exclusive state lock.
+        """
+        cutoff = (at or self.clock.now()) - self.archive.retain_for
+        batch = []
+        with self.archive_lock:
+            while self.completed:
+                ticket = self.tickets.get(self.completed[0])
+                if ticket is not None and ticket.exit_time > cutoff:
+                    break
+                self.completed.popleft()
+                if ticket is not None:
+                    batch.append(ticket)
+            if not batch:
+                return 0
+            
+            rows = []
+            for ticket in batch:
+                vehicle = self.vehicles[ticket.vehicle_id]
+                rows.append((ticket.ticket_id, vehicle.vehicle_id, vehicle.license_plate, vehicle.vehicle_type.value,
+                             vehicle.parked_spot_id, _encode_time(ticket.entry_time), _encode_time(ticket.payment_time),
+                             _encode_time(ticket.exit_time), ticket.amount_paid))
+            self.archive.store(rows)
+            with self.state_lock.exclusive():
+                for ticket in batch:
+                    self.tickets.pop(ticket.ticket_id, None)
+                    self.vehicles.pop(ticket.vehicle_id, None)
+            return len(batch)
+
+    def _forget_archived(self):
+        """Drop replayed sessions that had already reached the archive before a crash"""
+        archived = self.archive.archived(self.completed)
+        if not archived:
+            return
+        self.completed = deque(ticket_id for ticket_id in self.completed if ticket_id not in archived)
+        for ticket_id in archived:
+            ticket = self.tickets.pop(ticket_id)
+            self.vehicles.pop(ticket.vehicle_id, None)
+        self.busy_model.rebuild(self.ticket_history())
+
+    def ticket_history(self, start: Optional[datetime.datetime] = None,
+                       end: Optional[datetime.datetime] = None) -> Iterator:
+        """Every ticket that entered in [start, end), archived sessions first, then those in memory"""
+        if self.archive is not None:
+            yield from self.archive.sessions(start, end)
+        for ticket in list(self.tickets.values()):
+            if (start is None or ticket.entry_time >= start) and (end is None or ticket.entry_time < end):
+                yield ticket
+
+    def revenue_report(self, start: Optional[datetime.datetime] = None,
+                       end: Optional[datetime.datetime] = None) -> Dict:
+        """Revenue from payments made in [start, end), across memory and the archive"""
+        by_type = {vehicle_type: [0, 0.0] for vehicle_type in VehicleType}
+        if self.archive is not None:
+            for vehicle_type, (count, revenue) in self.archive.revenue_by_type(start, end).items():
+                by_type[vehicle_type][0] += count
+                by_type[vehicle_type][1] += revenue
+        for ticket in list(self.tickets.values()):
+            paid_at = ticket.payment_time
+            if paid_at is not None and (start is None or paid_at >= start) and (end is None or paid_at < end):
+                vehicle = self.vehicles.get(ticket.vehicle_id)
+                if vehicle is not None:
+                    by_type[vehicle.vehicle_type][0] += 1
+                    by_type[vehicle.vehicle_type][1] += ticket.amount_paid
         
-        vehicle = self.vehicles[vehicle_id]
-        spot_id = vehicle.parked_spot_id
+        return {
+            "paid_sessions": sum(count for count, _ in by_type.values()),
+            "revenue": sum(revenue for _, revenue in by_type.values()),
+            "by_vehicle_type": {vehicle_type.value: {"paid_sessions": count, "revenue": revenue}
+                                for vehicle_type, (count, revenue) in by_type.items()}
+        }
+
+    def what_if_revenue(self, policy: PricingPolicy, start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None, occupancy: Optional[float] = None) -> Dict:
+        """Re-price every paid session that entered in [start, end) under another policy.
         
-        if spot_id not in self.spots:
-            return False
+        Each session is billed from entry to payment, across memory and the archive.
+        occupancy (0-1) selects one demand tier for all sessions; by default the lowest
+        tier applies. Reports actual and projected revenue, overall and per vehicle type.
+        """
+        pricing = PricingEngine(policy)
+        tier = pricing.tier(occupancy) if occupancy is not None else 0
+        fee = pricing.fee
+        by_type = {vehicle_type: [0, 0.0, 0.0] for vehicle_type in VehicleType}  # sessions, actual, projected
+        for session in self.ticket_history(start, end):
+            if session.payment_time is None:
+                continue
+            if isinstance(session, ArchivedSession):
+                vehicle_type = session.vehicle_type
+            else:
+                vehicle = self.vehicles.get(session.vehicle_id)
+                if vehicle is None:
+                    continue
+                vehicle_type = vehicle.vehicle_type
+            hours = (session.payment_time - session.entry_time).total_seconds() / 3600
+            totals = by_type[vehicle_type]
+            totals[0] += 1
+            totals[1] += session.amount_paid
+            totals[2] += fee(vehicle_type, session.entry_time, hours, tier)
         
-        # Vacate the spot
-        spot = self.spots[spot_id]
-        result = spot.vacate()
+        return {
+            "paid_sessions": sum(count for count, _, _ in by_type.values()),
+            "actual_revenue": sum(actual for _, actual, _ in by_type.values()),
+            "projected_revenue": sum(projected for _, _, projected in by_type.values()),
+            "by_vehicle_type": {vehicle_type.value: {"paid_sessions": count, "actual_revenue": actual,
+                                                     "projected_revenue": projected}
+                                for vehicle_type, (count, actual, projected) in by_type.items()}
+        }
+
+    def current_rates(self, at: Optional[datetime.datetime] = None) -> Dict:
+        """Hourly rate and daily maximum per vehicle type right now, at the demand for its preferred spot type"""
+        current_time = at or self.clock.now()
+        rates = {}
+        for vehicle_type in self.pricing.rates:
+            tier = self._demand_tier(SUITABLE_SPOT_TYPES[vehicle_type][0])
+            hourly_rate, daily_max = self.pricing.rates_at(vehicle_type, current_time, tier)
+            rates[vehicle_type.value] = {"hourly_rate": hourly_rate, "daily_max": daily_max, "demand_tier": tier}
+        return rates
+
+    def _log(self, kind: str, *fields):
+        self.logged.sequence = self.journal.append(kind, *fields)
+
+    def _commit(self):
+        """Wait until this thread's journal records are on disk, then snapshot if one is due.
         
-        if result:
-            # Update exit time
-            ticket.complete_exit()
+        Called by every journaled operation after it releases its locks and before it
+        returns, so other lanes can join the same commit batch.
+        """
+        if self.journal is None:
+            return
+        self.journal.wait_for(getattr(self.logged, "sequence", 0))
+        self._maybe_snapshot()
+
+    def _maybe_snapshot(self):
+        if self.journal is not None and self.journal.snapshot_due():
+            with self.state_lock.exclusive():
+                # Another lane may have written the snapshot while this one waited
+                if self.journal.snapshot_due():
+                    self.journal.write_snapshot(self.snapshot_state())
+
+    def write_snapshot(self):
+        """Write a compact snapshot of the full lot state to the journal"""
+        with self.state_lock.exclusive():
+            self.journal.write_snapshot(self.snapshot_state())
+
+    def snapshot_state(self) -> Dict:
+        """Serializable copy of spots, vehicles, tickets and revenue"""
+        return {
+            "spots": [[spot.spot_id, spot.spot_type.value, spot.level, spot.section] for spot in self.spots.values()],
+            "occupied": [[spot.spot_id, spot.vehicle_id, _encode_time(spot.occupied_since)]
+                         for spot in self.spots.values() if spot.is_occupied],
+            "vehicles": [[vehicle.vehicle_id, vehicle.vehicle_type.value, vehicle.license_plate,
+                          _encode_time(vehicle.entry_time), _encode_time(vehicle.exit_time), vehicle.parked_spot_id]
+                         for vehicle in self.vehicles.values()],
+            "tickets": [[ticket.ticket_id, ticket.vehicle_id, _encode_time(ticket.entry_time),
+                         _encode_time(ticket.payment_time), ticket.amount_paid, ticket.is_paid,
+                         _encode_time(ticket.exit_time)]
+                        for ticket in self.tickets.values()],
+            "total_revenue": self.total_revenue,
+            "next_entry_number": self.next_entry_number,
+            "reservations": [[reservation.reservation_id, reservation.license_plate, reservation.vehicle_type.value,
+                              reservation.spot_id, _encode_time(reservation.start), _encode_time(reservation.end)]
+                             for reservation in self.reservations.active.values()],
+            "next_reservation_number": self.reservations.next_number
+        }
+
+    def restore_state(self, state: Dict):
+        """Load a snapshot produced by snapshot_state() into an empty lot"""
+        for spot_id, spot_type, level, section in state["spots"]:
+            self.create_spot(spot_id, ParkingSpotType(spot_type), level, section)
+        for spot_id, vehicle_id, since in state["occupied"]:
+            self.spots[spot_id].occupy(vehicle_id, at=_decode_time(since))
+        for vehicle_id, vehicle_type, plate, entry_time, exit_time, spot_id in state["vehicles"]:
+            vehicle = Vehicle(vehicle_id, VehicleType(vehicle_type), plate)
+            vehicle.entry_time = _decode_time(entry_time)
+            vehicle.exit_time = _decode_time(exit_time)
+            vehicle.parked_spot_id = spot_id
+            self.vehicles[vehicle_id] = vehicle
+        for ticket_id, vehicle_id, entry_time, payment_time, amount, is_paid, exit_time in state["tickets"]:
+            ticket = ParkingTicket(ticket_id, vehicle_id, _decode_time(entry_time), self)
+            ticket.payment_time = _decode_time(payment_time)
+            ticket.amount_paid = amount
+            ticket.is_paid = is_paid
+            ticket.exit_time = _decode_time(exit_time)
+            self.tickets[ticket_id] = ticket
+            if ticket.exit_time is None:
+                vehicle = self.vehicles[vehicle_id]
+                self.sessions.start(ticket, vehicle.license_plate, vehicle.parked_spot_id)
+            elif self.archive is not None:
+                self.completed.append(ticket_id)
+        self.total_revenue = state["total_revenue"]
+        self.next_entry_number = state["next_entry_number"]
+        for reservation_id, plate, vehicle_type, spot_id, start, end in state.get("reservations", ()):
+            self.reservations.add(Reservation(reservation_id, plate, VehicleType(vehicle_type), spot_id,
+                                              _decode_time(start), _decode_time(end)))
+        self.reservations.next_number = state.get("next_reservation_number", self.reservations.next_number)
+        self.busy_model.rebuild(self.ticket_history())
+
+    def apply_journal_record(self, record: list):
+        """Re-apply one logged event without re-running allocation or pricing"""
+        kind = record[1]
+        if kind == "entry":
+            _, _, vehicle_id, ticket_id, plate, vehicle_type, spot_id, entry_time = record
+            vehicle = Vehicle(vehicle_id, VehicleType(vehicle_type), plate)
+            vehicle.entry_time = _decode_time(entry_time)
+            vehicle.parked_spot_id = spot_id
+            if plate in self.reservations.by_plate:
+                self.reservations.forget_claim(plate, vehicle.entry_time)
+            if not self.spots[spot_id].occupy(vehicle_id, at=vehicle.entry_time):
+                raise ValueError(f"Journal replay diverged: entry {ticket_id} found spot {spot_id} occupied")
+            self.vehicles[vehicle_id] = vehicle
+            self.tickets[ticket_id] = ParkingTicket(ticket_id, vehicle_id, vehicle.entry_time, self)
+            self.sessions.start(self.tickets[ticket_id], plate, spot_id)
+            self.busy_model.record_arrival(vehicle.entry_time)
+            self.next_entry_number = max(self.next_entry_number, int(ticket_id.rpartition("-")[2]) + 1)
+        elif kind == "pay":
+            _, _, ticket_id, amount, payment_time = record
+            self.tickets[ticket_id].pay(amount, at=_decode_time(payment_time))
+            self.total_revenue += amount
+        elif kind == "exit":
+            _, _, ticket_id, exit_time = record
+            ticket = self.tickets[ticket_id]
+            vehicle = self.vehicles[ticket.vehicle_id]
+            spot = self.spots[vehicle.parked_spot_id]
+            if spot.vehicle_id != vehicle.vehicle_id:
+                raise ValueError(f"Journal replay diverged: exit {ticket_id} found spot {spot.spot_id} "
+                                 f"held by {spot.vehicle_id}")
+            spot.vacate()
+            ticket.complete_exit(at=_decode_time(exit_time))
             vehicle.exit_time = ticket.exit_time
-            return True
+            self._end_session(ticket_id, vehicle, vehicle.parked_spot_id)
+            self.busy_model.record_departure(ticket.exit_time)
+        elif kind == "book":
+            _, _, reservation_id, plate, vehicle_type, spot_id, start, end = record
+            self.reservations.add(Reservation(reservation_id, plate, VehicleType(vehicle_type), spot_id,
+                                              _decode_time(start), _decode_time(end)))
+        elif kind == "cancel":
+            self.reservations.cancel(record[2])
+        else:
+            raise ValueError(f"Unknown journal record type: {kind}")
+
+    @classmethod
+    def recover(cls, directory: str, journal_options: Optional[Dict] = None, **kwargs) -> "ParkingAI":
+        """Rebuild a lot from its latest snapshot plus the log tail, and keep journaling to it.
         
-        return False
+        A new directory yields an empty lot; initialize it and call write_snapshot() so the
+        layout is persisted before traffic is logged.
+        """
+        parking_ai = cls(**kwargs)
+        journal = StateJournal(directory, **(journal_options or {}))
+        snapshot, records = journal.load()
+        if snapshot is not None:
+            parking_ai.restore_state(snapshot)
+        for record in records:
+            parking_ai.apply_journal_record(record)
+        if parking_ai.archive is not None:
+            parking_ai._forget_archived()
+        parking_ai.journal = journal
+        return parking_ai
+
+    def find_vehicle(self, license_plate: str) -> Optional[Dict]:
+        """Find my car: where a parked vehicle is, by license plate (its latest visit if parked twice)"""
+        ticket_id = self.sessions.latest_for_plate(license_plate)
+        if ticket_id is None:
+            return None
+        return self._session_info(self.tickets[ticket_id])
+
+    def ticket_for_spot(self, spot_id: str) -> Optional[str]:
+        """Ticket of the vehicle currently parked in a spot"""
+        return self.sessions.by_spot.get(spot_id)
+
+    def overstaying_vehicles(self, max_hours: float = 24, at: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Vehicles parked for longer than max_hours, longest-parked first"""
+        current_time = at or self.clock.now()
+        cutoff = current_time - datetime.timedelta(hours=max_hours)
+        overstaying = []
+        for ticket in self.sessions.oldest():
+            if ticket.entry_time >= cutoff:
+                break  # Everything after this arrived later
+            overstaying.append(self._session_info(ticket, current_time))
+        return overstaying
+
+    def _session_info(self, ticket: ParkingTicket, at: Optional[datetime.datetime] = None) -> Dict:
+        vehicle = self.vehicles[ticket.vehicle_id]
+        spot = self.spots[vehicle.parked_spot_id]
+        return {
+            "ticket_id": ticket.ticket_id,
+            "license_plate": vehicle.license_plate,
+            "vehicle_type": vehicle.vehicle_type.value,
+            "spot_id": spot.spot_id,
+            "level": spot.level,
+            "section": spot.section,
+            "entry_time": ticket.entry_time.isoformat(),
+            "hours_parked": ((at or self.clock.now()) - ticket.entry_time).total_seconds() / 3600
+        }
 
     def get_parking_status(self) -> Dict:
         """Get the current status of the parking lot"""
-        total_spots = len(self.spots)
-        occupied_spots = sum(1 for spot in self.spots.values() if spot.is_occupied)
+        if self.check_consistency:
+            self.verify_counters()
+        
+        counters = self.counters
+        total_spots = counters.total
+        occupied_spots = counters.occupied
         available_spots = total_spots - occupied_spots
         
         # Count by type
         type_counts = {}
-        for spot_type in ParkingSpotType:
-            total = sum(1 for spot in self.spots.values() if spot.spot_type == spot_type)
-            occupied = sum(1 for spot in self.spots.values() if spot.spot_type == spot_type and spot.is_occupied)
+        for spot_type, (total, occupied) in counters.by_type.items():
             type_counts[spot_type.value] = {
                 "total": total,
                 "occupied": occupied,
@@ -317,21 +3016,10 @@ class ParkingAI:
         
         # Count by level
         level_counts = {}
-        for spot in self.spots.values():
-            if spot.level not in level_counts:
-                level_counts[spot.level] = {"total": 0, "occupied": 0}
-            
-            level_counts[spot.level]["total"] += 1
-            if spot.is_occupied:
-                level_counts[spot.level]["occupied"] += 1
-        
-        for level in level_counts:
-            level_counts[level]["available"] = level_counts[level]["total"] - level_counts[level]["occupied"]
+        for level, (total, occupied) in counters.by_level.items():
+            level_counts[level] = {"total": total, "occupied": occupied, "available": total - occupied}
         
-        # Record occupancy history
-        current_time = datetime.datetime.now()
         occupancy_rate = (occupied_spots / total_spots) * 100 if total_spots > 0 else 0
-        self.occupancy_history.append((current_time, occupancy_rate))
         
         return {
             "total_spots": total_spots,
@@ -343,67 +3031,100 @@ class ParkingAI:
             "total_revenue": self.total_revenue
         }
 
+    def get_section_status(self) -> Dict[str, Dict[str, int]]:
+        """Get spot counts for every section, keyed like "1-A" (level-section)"""
+        return {
+            f"{level}-{section}": {"total": total, "occupied": occupied, "available": total - occupied}
+            for (level, section), (total, occupied) in self.counters.by_section.items()
+        }
+
+    def availability_by_vehicle_type(self) -> Dict[VehicleType, int]:
+        """Free spots usable by each vehicle type, read from the occupancy counters"""
+        free = {spot_type: total - occupied for spot_type, (total, occupied) in self.counters.by_type.items()}
+        return {vehicle_type: sum(free[spot_type] for spot_type in spot_types)
+                for vehicle_type, spot_types in SUITABLE_SPOT_TYPES.items()}
+
+    def current_occupancy_rate(self) -> float:
+        """Current occupancy as a percentage of all spots"""
+        total_spots = self.counters.total
+        return (self.counters.occupied / total_spots) * 100 if total_spots > 0 else 0
+
+    def record_occupancy(self, at: Optional[datetime.datetime] = None) -> float:
+        """Add the current occupancy rate to the occupancy history and the forecaster"""
+        when = at or self.clock.now()
+        occupancy_rate = self.current_occupancy_rate()
+        self.occupancy_history.append(when, occupancy_rate)
+        rates = self.series_rates()
+        if self.forecaster is None or len(self.forecaster.series) != len(rates):
+            self.forecaster = OccupancyForecaster(self.forecast_series())  # New levels start a new model
+        self.forecaster.observe(when, rates)
+        return occupancy_rate
+
+    def occupancy_series(self, resolution: str = "hour", start: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Recorded occupancy (percent) per minute, hour or day since start: mean, min and max per bucket"""
+        return [{"start": bucket_start.isoformat(), "mean": mean, "min": low, "max": high}
+                for bucket_start, mean, low, high in self.occupancy_history.series(resolution, start)]
+
+    def forecast_series(self) -> List[str]:
+        """Names of the occupancy series the forecaster tracks, in series_rates() order"""
+        return (["all"] + [f"type:{spot_type.value}" for spot_type in ParkingSpotType]
+                + [f"level:{level}" for level in sorted(self.counters.by_level)])
+
+    def series_rates(self) -> List[float]:
+        """Current occupancy rate (0-100) of the whole lot, each spot type and each level"""
+        counters = self.counters
+        pairs = ([(counters.total, counters.occupied)] + [counters.by_type[spot_type] for spot_type in ParkingSpotType]
+                 + [counters.by_level[level] for level in sorted(counters.by_level)])
+        return [occupied / total * 100 if total > 0 else 0.0 for total, occupied in pairs]
+
+    def forecast_occupancy(self, horizons_minutes=DEFAULT_FORECAST_HORIZONS,
+                           at: Optional[datetime.datetime] = None) -> Dict:
+        """Forecast occupancy rates for the whole lot, each spot type and each level at several horizons"""
+        forecasts = self.forecaster.forecast(at or self.clock.now(), horizons_minutes) if self.forecaster else None
+        if forecasts is None:
+            # No history yet: assume occupancy stays where it is
+            forecasts = [self.series_rates() for _ in horizons_minutes]
+        types = list(ParkingSpotType)
+        levels = sorted(self.counters.by_level)
+        return {
+            "horizons_minutes": list(horizons_minutes),
+            "all": [row[0] for row in forecasts],
+            "by_type": {spot_type.value: [row[1 + index] for row in forecasts] for index, spot_type in enumerate(types)},
+            "by_level": {level: [row[1 + len(types) + index] for row in forecasts] for index, level in enumerate(levels)}
+        }
+
+    def track_occupancy(self, interval: datetime.timedelta = datetime.timedelta(minutes=1),
+                        **options) -> Subscription:
+        """Record occupancy from spot events, at most once per interval, instead of polling record_occupancy()"""
+        last_sample = None
+        
+        def on_spot_events(events: List[SpotEvent]):
+            nonlocal last_sample
+            when = events[-1].time
+            if last_sample is None or when - last_sample >= interval:
+                last_sample = when
+                self.record_occupancy(when)
+        
+        return self.events.subscribe(on_spot_events, kinds=(SpotEvent,), **options)
+
     def predict_occupancy(self, hours_ahead: int = 1) -> float:
         """Predict the occupancy rate in the future based on historical data"""
-        # Simple prediction based on average rate of change
-        if len(self.occupancy_history) < 2:
+        forecasts = None
+        if self.forecaster is not None:
+            forecasts = self.forecaster.forecast(self.clock.now(), [hours_ahead * 60], series=[0])
+        if forecasts is None:
             # Not enough data for prediction
-            current_occupancy = self.get_parking_status()["occupancy_rate"]
-            return current_occupancy
-        
-        # Calculate average rate of change per hour
-        changes = []
-        for i in range(1, len(self.occupancy_history)):
-            prev_time, prev_rate = self.occupancy_history[i-1]
-            curr_time, curr_rate = self.occupancy_history[i]
-            
-            time_diff = (curr_time - prev_time).total_seconds() / 3600  # hours
-            if time_diff > 0:
-                rate_change = (curr_rate - prev_rate) / time_diff
-                changes.append(rate_change)
-        
-        if not changes:
-            current_occupancy = self.get_parking_status()["occupancy_rate"]
-            return current_occupancy
-        
-        avg_hourly_change = sum(changes) / len(changes)
-        current_occupancy = self.get_parking_status()["occupancy_rate"]
-        
-        # Predict future occupancy
-        predicted_occupancy = current_occupancy + (avg_hourly_change * hours_ahead)
-        
-        # Clamp between 0 and 100 percent
-        return max(0, min(100, predicted_occupancy))
+            return self.current_occupancy_rate()
+        return forecasts[0][0]
 
     def recommend_spot(self, vehicle_type: VehicleType, preference: str = "closest") -> Optional[str]:
         """Recommend a parking spot based on vehicle type and preference"""
-        available_spots = []
-        
-        for spot_id, spot in self.spots.items():
-            if not spot.is_occupied and self.is_spot_suitable(spot.spot_type, vehicle_type):
-                available_spots.append(spot)
-        
-        if not available_spots:
-            return None
-        
-        if preference == "closest":
-            # Closest to entrance (assuming lower level and section A is closest)
-            available_spots.sort(key=lambda spot: (spot.level, spot.section))
-        elif preference == "level":
-            # Specific level preference (assuming preference is a string like "level-2")
-            try:
-                preferred_level = int(preference.split("-")[1])
-                # Filter spots on preferred level, or sort by closest level
-                level_spots = [spot for spot in available_spots if spot.level == preferred_level]
-                if level_spots:
-                    available_spots = level_spots
-            except:
-                pass
-        
-        if available_spots:
-            return available_spots[0].spot_id
-        
-        return None
+        spot_ids = self.recommender.recommend(vehicle_type, preference, k=1)
+        return spot_ids[0] if spot_ids else None
+
+    def recommend_spots(self, vehicle_type: VehicleType, preference: str = "closest", k: int = 5) -> List[str]:
+        """Top-k free spots for a vehicle type and preference, best first (e.g. for kiosk displays)"""
+        return self.recommender.recommend(vehicle_type, preference, k)
 
     def is_spot_suitable(self, spot_type: ParkingSpotType, vehicle_type: VehicleType) -> bool:
         """Check if a spot type is suitable for a vehicle type"""
@@ -419,26 +3140,23 @@ class ParkingAI:
 
     def get_busy_times(self) -> Dict[str, List[int]]:
         """Analyze historical data to determine busy times"""
-        # In a real system, this would analyze actual data
-        # Here we'll return a placeholder/simulated result
-        
-        days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        busy_times = {}
+        return self.busy_model.busy_times()
+
+    def simulate_activity(self, hours: int = 24, interval_minutes: int = 15, headless: bool = False,
+                          seed: Optional[int] = None):
+        """Simulate parking activity for a given period to generate data.
         
-        for day in days_of_week:
-            # Simulate busy hours based on typical patterns
-            if day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
-                busy_times[day] = [8, 9, 12, 13, 17, 18]  # Rush hours on weekdays
-            else:
-                busy_times[day] = [11, 12, 13, 14, 15, 16]  # Midday on weekends
+        With headless=True the discrete-event SimulationEngine runs instead, on a simulated
+        clock with no printing or sleeping, and its summary is returned.
+        """
+        if headless:
+            engine = SimulationEngine(self, rng=random.Random(seed), metric_interval_minutes=interval_minutes)
+            engine.run_until_end(hours)
+            return engine.summary()
         
-        return busy_times
-
-    def simulate_activity(self, hours: int = 24, interval_minutes: int = 15):
-        """Simulate parking activity for a given period to generate data"""
         print(f"Starting parking activity simulation for {hours} hours...")
         
-        start_time = datetime.datetime.now()
+        start_time = self.clock.now()
         end_time = start_time + datetime.timedelta(hours=hours)
         current_time = start_time
         
@@ -451,39 +3169,26 @@ class ParkingAI:
             numbers = ''.join(random.choices('0123456789', k=3))
             return f"{letters}-{numbers}"
         
-        # Active ticket tracking
-        active_tickets = []
-        
         # Simulate activity at each interval
         while current_time < end_time:
             print(f"\nTime: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Determine entry probability based on time of day
-            hour = current_time.hour
-            day_of_week = current_time.strftime("%A")
-            busy_times = self.get_busy_times()
-            
             # Higher entry probability during busy hours
-            is_busy_hour = hour in busy_times.get(day_of_week, [])
+            is_busy_hour = self.busy_model.is_busy(current_time)
             entry_probability = 0.4 if is_busy_hour else 0.2
             
             # Process some exits
-            for ticket_id in list(active_tickets):
+            for ticket in self.sessions.oldest():
                 # Probability of exit increases with time parked
-                ticket = self.tickets.get(ticket_id)
-                if ticket and not ticket.exit_time:
-                    vehicle = self.vehicles.get(ticket.vehicle_id)
-                    if vehicle:
-                        hours_parked = (current_time - ticket.entry_time).total_seconds() / 3600
-                        exit_probability = min(0.3, hours_parked * 0.05)
-                        
-                        if random.random() < exit_probability:
-                            # Pay ticket
-                            self.pay_ticket(ticket_id)
-                            # Exit vehicle
-                            if self.vehicle_exit(ticket_id):
-                                print(f"Vehicle with ticket {ticket_id} has exited")
-                                active_tickets.remove(ticket_id)
+                hours_parked = (current_time - ticket.entry_time).total_seconds() / 3600
+                exit_probability = min(0.3, hours_parked * 0.05)
+                
+                if random.random() < exit_probability:
+                    # Pay ticket
+                    self.pay_ticket(ticket.ticket_id)
+                    # Exit vehicle
+                    if self.vehicle_exit(ticket.ticket_id):
+                        print(f"Vehicle with ticket {ticket.ticket_id} has exited")
             
             # Process some entries
             status = self.get_parking_status()
@@ -494,13 +3199,13 @@ class ParkingAI:
                 result = self.vehicle_entry(license_plate, vehicle_type)
                 if result:
                     location, ticket_id = result
-                    active_tickets.append(ticket_id)
                     print(f"Vehicle {license_plate} ({vehicle_type.value}) entered and parked at {location}")
             
             # Display current status
             status = self.get_parking_status()
             print(f"Occupancy: {status['occupied_spots']}/{status['total_spots']} spots ({status['occupancy_rate']:.1f}%)")
             print(f"Revenue: ${status['total_revenue']:.2f}")
+            self.record_occupancy()
             
             # Predict future occupancy
             prediction = self.predict_occupancy(hours_ahead=1)
@@ -512,6 +3217,862 @@ class ParkingAI:
         
         print("\nSimulation completed.")
 
+class ParkingGate:
+    """One entry/exit lane. Any number of gates may drive a shared ParkingAI from their own threads."""
+    def __init__(self, parking_ai: ParkingAI, name: str):
+        self.parking_ai = parking_ai
+        self.name = name
+        self.entries = 0
+        self.rejections = 0
+        self.exits = 0
+
+    def enter(self, license_plate: str, vehicle_type: VehicleType) -> Optional[Tuple[str, str]]:
+        result = self.parking_ai.vehicle_entry(license_plate, vehicle_type)
+        if result:
+            self.entries += 1
+        else:
+            self.rejections += 1
+        return result
+
+    def pay(self, ticket_id: str) -> Tuple[bool, float]:
+        return self.parking_ai.pay_ticket(ticket_id)
+
+    def exit(self, ticket_id: str) -> bool:
+        """Pay the ticket if needed, then let the vehicle out"""
+        self.parking_ai.pay_ticket(ticket_id)
+        exited = self.parking_ai.vehicle_exit(ticket_id)
+        if exited:
+            self.exits += 1
+        return exited
+
+class SimulationEvent(NamedTuple):
+    time: datetime.datetime
+    kind: str  # "entry", "rejected" or "exit"
+    vehicle_type: VehicleType
+    ticket_id: Optional[str] = None
+    spot_id: Optional[str] = None
+    amount: float = 0.0
+
+class SimulationMetrics(NamedTuple):
+    time: datetime.datetime
+    occupied_spots: int
+    total_spots: int
+    occupancy_rate: float
+    total_revenue: float
+    entries: int
+    rejections: int
+    exits: int
+
+class SimulationEngine:
+    """Headless, discrete-event simulation of arrivals and departures against a ParkingAI.
+    
+    The lot is driven by a SimulatedClock that jumps from one event to the next, so
+    months of traffic run without sleeping or printing. run() yields SimulationEvent
+    records for every entry, rejection and exit, and a SimulationMetrics sample every
+    metric interval.
+    """
+    def __init__(self, parking_ai: ParkingAI, rng: Optional[random.Random] = None,
+                 start: Optional[datetime.datetime] = None, arrivals_per_hour: float = 0.8,
+                 busy_multiplier: float = 2.0, mean_stay_hours: float = 3.0,
+                 metric_interval_minutes: int = 15):
+        self.parking_ai = parking_ai
+        self.rng = rng or random.Random()
+        if not isinstance(parking_ai.clock, SimulatedClock):
+            parking_ai.clock = SimulatedClock(start)
+        elif start is not None:
+            parking_ai.clock.set(start)
+        self.clock = parking_ai.clock
+        self.arrivals_per_hour = arrivals_per_hour
+        self.busy_multiplier = busy_multiplier
+        self.mean_stay_hours = mean_stay_hours
+        self.metric_interval = datetime.timedelta(minutes=metric_interval_minutes)
+        self.vehicle_types = list(VehicleType)
+        self.entries = 0
+        self.rejections = 0
+        self.exits = 0
+        self.peak_occupancy_rate = 0.0
+        self._queue: List[Tuple[datetime.datetime, int, str, Optional[str]]] = []
+        self._sequence = 0
+        busy_times = parking_ai.get_busy_times()
+        self._busy_hours = [set(busy_times.get(day, ())) for day in DAYS_OF_WEEK]
+        self._started = False
+
+    def _schedule(self, when: datetime.datetime, kind: str, ticket_id: Optional[str] = None):
+        # The sequence number keeps ordering deterministic for events at the same instant
+        self._sequence += 1
+        heapq.heappush(self._queue, (when, self._sequence, kind, ticket_id))
+
+    def _next_arrival(self, after: datetime.datetime) -> datetime.datetime:
+        rate = self.arrivals_per_hour
+        if after.hour in self._busy_hours[after.weekday()]:
+            rate *= self.busy_multiplier
+        return after + datetime.timedelta(hours=self.rng.expovariate(rate))
+
+    def _license_plate(self) -> str:
+        letters = ''.join(self.rng.choices('ABCDEFGHJKLMNPQRSTUVWXYZ', k=3))
+        numbers = ''.join(self.rng.choices('0123456789', k=3))
+        return f"{letters}-{numbers}"
+
+    def _metrics(self) -> SimulationMetrics:
+        counters = self.parking_ai.counters
+        occupancy_rate = (counters.occupied / counters.total) * 100 if counters.total > 0 else 0
+        self.peak_occupancy_rate = max(self.peak_occupancy_rate, occupancy_rate)
+        return SimulationMetrics(self.clock.now(), counters.occupied, counters.total, occupancy_rate,
+                                 self.parking_ai.total_revenue, self.entries, self.rejections, self.exits)
+
+    def run(self, hours: float) -> Iterator[Union[SimulationEvent, SimulationMetrics]]:
+        """Advance the simulation by the given number of hours, yielding events and metrics"""
+        start = self.clock.now()
+        end = start + datetime.timedelta(hours=hours)
+        if not self._started:
+            self._started = True
+            if self.arrivals_per_hour > 0:
+                self._schedule(self._next_arrival(start), "arrival")
+            self._schedule(start, "sample")
+        
+        parking_ai = self.parking_ai
+        while self._queue and self._queue[0][0] <= end:
+            when, _, kind, ticket_id = heapq.heappop(self._queue)
+            self.clock.set(when)
+            
+            if kind == "arrival":
+                vehicle_type = self.rng.choice(self.vehicle_types)
+                result = parking_ai.vehicle_entry(self._license_plate(), vehicle_type)
+                if result:
+                    _, ticket_id = result
+                    self.entries += 1
+                    stay = datetime.timedelta(hours=self.rng.gammavariate(2.0, self.mean_stay_hours / 2))
+                    self._schedule(when + stay, "departure", ticket_id)
+                    vehicle = parking_ai.vehicles[parking_ai.tickets[ticket_id].vehicle_id]
+                    yield SimulationEvent(when, "entry", vehicle_type, ticket_id, vehicle.parked_spot_id)
+                else:
+                    self.rejections += 1
+                    yield SimulationEvent(when, "rejected", vehicle_type)
+                self._schedule(self._next_arrival(when), "arrival")
+            elif kind == "departure":
+                ticket = parking_ai.tickets[ticket_id]
+                vehicle = parking_ai.vehicles[ticket.vehicle_id]
+                parking_ai.pay_ticket(ticket_id)
+                if parking_ai.vehicle_exit(ticket_id):
+                    self.exits += 1
+                    yield SimulationEvent(when, "exit", vehicle.vehicle_type, ticket_id,
+                                          vehicle.parked_spot_id, ticket.amount_paid)
+            else:
+                parking_ai.record_occupancy()
+                yield self._metrics()
+                self._schedule(when + self.metric_interval, "sample")
+        
+        self.clock.set(end)
+
+    def run_until_end(self, hours: float):
+        """Run the simulation, discarding the event stream"""
+        for _ in self.run(hours):
+            pass
+
+    def summary(self) -> Dict:
+        counters = self.parking_ai.counters
+        return {
+            "entries": self.entries,
+            "rejections": self.rejections,
+            "exits": self.exits,
+            "occupied_spots": counters.occupied,
+            "total_spots": counters.total,
+            "peak_occupancy_rate": self.peak_occupancy_rate,
+            "total_revenue": self.parking_ai.total_revenue
+        }
+
+def backtest_forecaster(observations: List[Tuple[datetime.datetime, List[float]]], series: List[str],
+                        horizons_minutes=DEFAULT_FORECAST_HORIZONS, warmup_days: float = 7, **options) -> Dict:
+    """Replay recorded samples of every series through a fresh OccupancyForecaster and score it.
+    
+    After warmup_days, each sample triggers a forecast at every horizon, which is scored by
+    mean absolute error against the first sample recorded in its target slot. Persistence
+    (the latest sample) is scored alongside as a baseline.
+    """
+    forecaster = OccupancyForecaster(series, **options)
+    horizons = list(horizons_minutes)
+    count = len(series)
+    warmup_end = observations[0][0] + datetime.timedelta(days=warmup_days) if observations else None
+    pending: Dict[int, List[Tuple[int, List[float], List[float]]]] = defaultdict(list)
+    # Per horizon: [scored, lot error, all-series error, persistence lot error, persistence all-series error]
+    errors = [[0, 0.0, 0.0, 0.0, 0.0] for _ in horizons]
+    observe_seconds = forecast_seconds = 0.0
+    forecasts = 0
+    
+    for when, values in observations:
+        for horizon_index, predicted, persisted in pending.pop(forecaster.slot_of(when), ()):
+            totals = errors[horizon_index]
+            totals[0] += 1
+            totals[1] += abs(predicted[0] - values[0])
+            totals[2] += sum(abs(predicted[index] - values[index]) for index in range(count)) / count
+            totals[3] += abs(persisted[0] - values[0])
+            totals[4] += sum(abs(persisted[index] - values[index]) for index in range(count)) / count
+        
+        started = time.perf_counter()
+        forecaster.observe(when, values)
+        observe_seconds += time.perf_counter() - started
+        if when < warmup_end:
+            continue
+        started = time.perf_counter()
+        rows = forecaster.forecast(when, horizons)
+        forecast_seconds += time.perf_counter() - started
+        forecasts += 1
+        for horizon_index, minutes in enumerate(horizons):
+            target = forecaster.slot_of(when + datetime.timedelta(minutes=minutes))
+            pending[target].append((horizon_index, rows[horizon_index], values))
+    
+    return {
+        "observations": len(observations),
+        "series": count,
+        "forecasts": forecasts,
+        "observations_per_sec": len(observations) / observe_seconds if observe_seconds else 0.0,
+        "forecasts_per_sec": forecasts / forecast_seconds if forecast_seconds else 0.0,
+        "horizons": {
+            minutes: {
+                "scored": scored,
+                "mae": lot_error / scored if scored else None,
+                "mae_all_series": series_error / scored if scored else None,
+                "persistence_mae": persistence_lot / scored if scored else None,
+                "persistence_mae_all_series": persistence_series / scored if scored else None
+            }
+            for minutes, (scored, lot_error, series_error, persistence_lot, persistence_series) in zip(horizons, errors)
+        }
+    }
+
+class Scenario(NamedTuple):
+    """Lot configuration and traffic assumptions for one Monte Carlo scenario"""
+    name: str
+    levels: int
+    spots_per_level: int
+    arrivals_per_hour: float
+    hours: float = 24.0
+    mean_stay_hours: float = 3.0
+    busy_multiplier: float = 2.0
+
+# Fixed simulated start (a Monday) so a seed fully determines a run
+SCENARIO_START = datetime.datetime(2025, 1, 6)
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile (q in 0-100) of a sorted list"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def run_scenario(scenario: Scenario, seed: int) -> Dict:
+    """Simulate one scenario with its own seeded RNG and return its raw results"""
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    parking_ai.initialize_parking_lot(scenario.levels, scenario.spots_per_level, verbose=False)
+    engine = SimulationEngine(parking_ai, rng=random.Random(seed), arrivals_per_hour=scenario.arrivals_per_hour,
+                              busy_multiplier=scenario.busy_multiplier, mean_stay_hours=scenario.mean_stay_hours)
+    occupancy = [record.occupancy_rate for record in engine.run(scenario.hours)
+                 if isinstance(record, SimulationMetrics)]
+    summary = engine.summary()
+    return {
+        "seed": seed,
+        "occupancy": occupancy,
+        "rejections": summary["rejections"],
+        "entries": summary["entries"],
+        "revenue": summary["total_revenue"]
+    }
+
+def _run_scenario_task(task: Tuple[Scenario, int]) -> Dict:
+    return run_scenario(*task)
+
+class MonteCarloRunner:
+    """Runs many seeded simulations per scenario across a process pool and aggregates them.
+    
+    Every run's seed is drawn up front from the base seed in a fixed order and results are
+    collected in submission order, so the output depends only on the seed, not on the
+    number of workers.
+    """
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers
+
+    def run(self, scenarios: List[Scenario], runs: int = 20, seed: int = 0) -> Dict[str, Dict]:
+        seed_source = random.Random(seed)
+        tasks = [(scenario, seed_source.getrandbits(63)) for scenario in scenarios for _ in range(runs)]
+        
+        if self.workers == 1:
+            results = [_run_scenario_task(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(_run_scenario_task, tasks, chunksize=max(1, len(tasks) // 64)))
+        
+        report = {}
+        for index, scenario in enumerate(scenarios):
+            report[scenario.name] = self.aggregate(results[index * runs:(index + 1) * runs])
+        return report
+
+    @staticmethod
+    def aggregate(results: List[Dict]) -> Dict:
+        """Summarize occupancy percentiles and rejection/revenue distributions across runs"""
+        occupancy = sorted(rate for result in results for rate in result["occupancy"])
+        peaks = sorted(max(result["occupancy"], default=0.0) for result in results)
+        rejections = sorted(result["rejections"] for result in results)
+        revenue = sorted(result["revenue"] for result in results)
+        return {
+            "runs": len(results),
+            "occupancy": {f"p{q}": percentile(occupancy, q) for q in (50, 90, 99)},
+            "peak_occupancy": {f"p{q}": percentile(peaks, q) for q in (50, 90, 99)},
+            "rejections": {"mean": sum(rejections) / len(rejections) if rejections else 0.0,
+                           **{f"p{q}": percentile(rejections, q) for q in (50, 95)}},
+            "revenue": {"mean": sum(revenue) / len(revenue) if revenue else 0.0,
+                        **{f"p{q}": percentile(revenue, q) for q in (5, 50, 95)}}
+        }
+
+# Operations a facility shard will run on request
+SHARD_METHODS = ("vehicle_entry", "pay_ticket", "vehicle_exit", "get_parking_status",
+                 "recommend_spot", "recommend_spots", "predict_occupancy", "find_available_spot")
+
+def _execute_shard_commands(parking_ai: ParkingAI, commands: List[Tuple[str, tuple]]) -> Tuple[list, Dict]:
+    """Run a batch of commands against one shard and return the results plus a fresh availability summary"""
+    results = []
+    for method, args in commands:
+        if method not in SHARD_METHODS:
+            raise ValueError(f"Unsupported shard method: {method}")
+        results.append(getattr(parking_ai, method)(*args))
+    return results, parking_ai.availability_by_vehicle_type()
+
+class LocalShard:
+    """Facility shard running in the manager's own process"""
+    def __init__(self, levels: int, spots_per_level: int):
+        self.parking_ai = ParkingAI()
+        self.parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+        self.reply = None
+
+    def send(self, commands: List[Tuple[str, tuple]]):
+        # Errors are handed back by receive(), as a worker process would
+        try:
+            self.reply = _execute_shard_commands(self.parking_ai, commands)
+        except Exception as error:
+            self.reply = error
+
+    def receive(self) -> Tuple[list, Dict]:
+        reply, self.reply = self.reply, None
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        pass
+
+def _shard_worker(connection, levels: int, spots_per_level: int):
+    parking_ai = ParkingAI()
+    parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+    connection.send(([], parking_ai.availability_by_vehicle_type()))
+    while True:
+        commands = connection.recv()
+        if commands is None:
+            break
+        try:
+            connection.send(_execute_shard_commands(parking_ai, commands))
+        except Exception as error:
+            connection.send(error)
+    connection.close()
+
+class ProcessShard:
+    """Facility shard that owns its ParkingAI in a separate worker process, driven over a pipe"""
+    def __init__(self, levels: int, spots_per_level: int):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_shard_worker, args=(child_connection, levels, spots_per_level),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.initial_reply = self.receive()
+
+    def send(self, commands: List[Tuple[str, tuple]]):
+        self.connection.send(commands)
+
+    def receive(self) -> Tuple[list, Dict]:
+        reply = self.connection.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        self.connection.send(None)
+        self.process.join()
+        self.connection.close()
+
+class FacilityManager:
+    """Routes vehicles across many garages, each modelled by its own ParkingAI shard.
+    
+    Every reply from a shard carries its free-spot counts per vehicle type, which the
+    manager caches, so "nearest facility with space" never touches the lots themselves.
+    With use_processes=True each shard lives in its own worker process and batched
+    commands to different shards run in parallel.
+    """
+    def __init__(self, use_processes: bool = False):
+        self.use_processes = use_processes
+        self.locations: Dict[str, Tuple[float, float]] = {}
+        self.shards: Dict[str, Union[LocalShard, ProcessShard]] = {}
+        self.availability: Dict[str, Dict[VehicleType, int]] = {}
+
+    def add_facility(self, name: str, location: Tuple[float, float], levels: int, spots_per_level: int):
+        if name in self.shards:
+            raise ValueError(f"Facility {name} already exists")
+        if self.use_processes:
+            shard = ProcessShard(levels, spots_per_level)
+            self.availability[name] = shard.initial_reply[1]
+        else:
+            shard = LocalShard(levels, spots_per_level)
+            self.availability[name] = shard.parking_ai.availability_by_vehicle_type()
+        self.shards[name] = shard
+        self.locations[name] = location
+
+    def nearest_with_space(self, vehicle_type: VehicleType, origin: Tuple[float, float],
+                           exclude=(), availability: Optional[Dict[str, Dict[VehicleType, int]]] = None) -> Optional[str]:
+        """Closest facility whose cached summary shows a free spot for the vehicle type"""
+        availability = availability or self.availability
+        best_name, best_distance = None, None
+        for name, (x, y) in self.locations.items():
+            if availability[name][vehicle_type] <= 0 or name in exclude:
+                continue
+            distance = math.hypot(x - origin[0], y - origin[1])
+            if best_distance is None or distance < best_distance:
+                best_name, best_distance = name, distance
+        return best_name
+
+    def execute(self, commands_by_facility: Dict[str, List[Tuple[str, tuple]]]) -> Dict[str, list]:
+        """Send command batches to several shards at once and gather their results.
+        
+        Every shard that was sent a batch has its reply read, even when another shard
+        fails, so no pipe is left holding a reply meant for an earlier request. The
+        first error is raised once all replies are in.
+        """
+        error = None
+        sent = []
+        try:
+            for name, commands in commands_by_facility.items():
+                self.shards[name].send(commands)
+                sent.append(name)
+        except Exception as send_error:
+            error = send_error
+        results = {}
+        for name in sent:
+            try:
+                results[name], self.availability[name] = self.shards[name].receive()
+            except Exception as receive_error:
+                error = error or receive_error
+        if error is not None:
+            raise error
+        return results
+
+    def route_vehicles(self, arrivals: List[Tuple[str, VehicleType, Tuple[float, float]]]
+                       ) -> List[Optional[Tuple[str, str, str]]]:
+        """Park a batch of (license_plate, vehicle_type, origin) arrivals at their nearest facilities.
+        
+        Returns (facility, location, ticket_id) per arrival, or None when no facility has room.
+        Arrivals turned away by a facility whose summary was optimistic try the next nearest.
+        """
+        results: List[Optional[Tuple[str, str, str]]] = [None] * len(arrivals)
+        tried = [set() for _ in arrivals]
+        pending = list(range(len(arrivals)))
+        while pending:
+            # Plan against a private copy of the summaries, reserving capacity as we go
+            planned = {name: dict(counts) for name, counts in self.availability.items()}
+            batches: Dict[str, List[int]] = defaultdict(list)
+            for index in pending:
+                _, vehicle_type, origin = arrivals[index]
+                name = self.nearest_with_space(vehicle_type, origin, tried[index], planned)
+                if name is not None:
+                    planned[name][vehicle_type] -= 1
+                    tried[index].add(name)
+                    batches[name].append(index)
+            
+            replies = self.execute({name: [("vehicle_entry", arrivals[index][:2]) for index in indexes]
+                                    for name, indexes in batches.items()})
+            pending = []
+            for name, indexes in batches.items():
+                for index, result in zip(indexes, replies[name]):
+                    if result:
+                        results[index] = (name, *result)
+                    else:
+                        pending.append(index)
+        return results
+
+    def route_vehicle(self, license_plate: str, vehicle_type: VehicleType,
+                      origin: Tuple[float, float]) -> Optional[Tuple[str, str, str]]:
+        return self.route_vehicles([(license_plate, vehicle_type, origin)])[0]
+
+    def checkout(self, tickets: List[Tuple[str, str]]) -> List[bool]:
+        """Pay and exit a batch of (facility, ticket_id) pairs"""
+        batches: Dict[str, List[int]] = defaultdict(list)
+        for index, (name, _) in enumerate(tickets):
+            batches[name].append(index)
+        replies = self.execute({name: [command for index in indexes
+                                       for command in (("pay_ticket", (tickets[index][1],)),
+                                                       ("vehicle_exit", (tickets[index][1],)))]
+                                for name, indexes in batches.items()})
+        exited = [False] * len(tickets)
+        for name, indexes in batches.items():
+            for index, exit_result in zip(indexes, replies[name][1::2]):
+                exited[index] = exit_result
+        return exited
+
+    def status(self) -> Dict[str, Dict]:
+        return {name: results[0] for name, results in
+                self.execute({name: [("get_parking_status", ())] for name in self.shards}).items()}
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                409: "Conflict", 413: "Content Too Large", 500: "Internal Server Error"}
+
+class ParkingService:
+    """asyncio HTTP/JSON front end for a ParkingAI.
+    
+    Endpoints: POST /entry {license_plate, vehicle_type}, POST /pay {ticket_id},
+    POST /exit {ticket_id}, GET /status, GET /recommend?vehicle_type=&preference=&k=,
+    GET /predict?hours=, GET /forecast?horizons=15,60,..., GET /occupancy?resolution=&start=,
+    GET /rates,
+    GET /vehicle?license_plate= (find my car), GET /overstaying?max_hours=,
+    GET /availability?start=&end=, POST /reservations {license_plate, vehicle_type, start, end},
+    POST /reservations/cancel {reservation_id},
+    and GET /events, a server-sent event stream that starts with a full status and then
+    pushes one small delta per occupancy change or payment, whichever lane caused it.
+    GET / serves the parking-ui.html dashboard.
+    
+    Handlers run on the loop's default thread pool, so lock waits and journal fsyncs in
+    ParkingAI never stall the event loop.
+    """
+    def __init__(self, parking_ai: ParkingAI, host: str = "127.0.0.1", port: int = 8080,
+                 ui_path: Optional[str] = None, max_queued_deltas: int = 1000, max_body: int = 1 << 20):
+        self.parking_ai = parking_ai
+        self.host = host
+        self.port = port
+        self.ui_path = ui_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "parking-ui.html")
+        self.max_queued_deltas = max_queued_deltas
+        self.max_body = max_body  # Larger request bodies are refused with 413
+        self.subscribers: List[asyncio.Queue] = []
+        self.streams = set()  # Tasks serving GET /events
+        self.server = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscription: Optional[Subscription] = None
+        self.routes = {
+            ("POST", "/entry"): self.handle_entry,
+            ("POST", "/pay"): self.handle_pay,
+            ("POST", "/exit"): self.handle_exit,
+            ("GET", "/status"): self.handle_status,
+            ("GET", "/recommend"): self.handle_recommend,
+            ("GET", "/predict"): self.handle_predict,
+            ("GET", "/forecast"): self.handle_forecast,
+            ("GET", "/occupancy"): self.handle_occupancy,
+            ("GET", "/rates"): self.handle_rates,
+            ("GET", "/availability"): self.handle_availability,
+            ("POST", "/reservations"): self.handle_book,
+            ("POST", "/reservations/cancel"): self.handle_cancel_reservation,
+            ("GET", "/vehicle"): self.handle_find_vehicle,
+            ("GET", "/overstaying"): self.handle_overstaying,
+        }
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolve port 0 to the bound port
+        self.loop = asyncio.get_running_loop()
+        self.subscription = self.parking_ai.events.subscribe(self._on_events)
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        """Stop accepting connections and end every event stream cleanly"""
+        self.parking_ai.events.unsubscribe(self.subscription)
+        for queue in self.subscribers:
+            while not queue.empty():
+                queue.get_nowait()  # Make room; the stream is ending anyway
+            queue.put_nowait(None)
+        self.server.close()
+        if self.streams:
+            await asyncio.wait(set(self.streams), timeout=5)
+        await self.server.wait_closed()
+
+    # Request handling
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": f"Request body exceeds {self.max_body} bytes"},
+                                        keep_alive=False)
+                    break
+                body = await reader.readexactly(length)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                
+                url = urlsplit(target)
+                if method == "GET" and url.path == "/events":
+                    await self._stream_events(writer)
+                    break
+                if method == "GET" and url.path in ("/", "/index.html"):
+                    await self._send_ui(writer, keep_alive)
+                else:
+                    status, payload = await asyncio.get_running_loop().run_in_executor(
+                        None, self._dispatch, method, url.path, parse_qs(url.query), body)
+                    await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _dispatch(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Dict]:
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return 405, {"error": f"{method} not allowed on {path}"}
+            return 404, {"error": f"No route for {path}"}
+        try:
+            params = {name: values[-1] for name, values in query.items()}
+            if body:
+                params.update(json.loads(body))
+            return 200, handler(params)
+        except HTTPError as error:
+            return error.status, {"error": error.message}
+        except (ValueError, TypeError) as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool = True):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _send_ui(self, writer: asyncio.StreamWriter, keep_alive: bool):
+        try:
+            with open(self.ui_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            await self._respond(writer, 404, {"error": "Dashboard not found"}, keep_alive)
+            return
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    def _vehicle_type(params: Dict) -> VehicleType:
+        try:
+            return VehicleType(str(params.get("vehicle_type", "")).lower())
+        except ValueError:
+            raise HTTPError(400, f"vehicle_type must be one of {[t.value for t in VehicleType]}")
+
+    @staticmethod
+    def _ticket_id(params: Dict) -> str:
+        ticket_id = params.get("ticket_id")
+        if not ticket_id:
+            raise HTTPError(400, "ticket_id is required")
+        return str(ticket_id)
+
+    def handle_entry(self, params: Dict) -> Dict:
+        license_plate = params.get("license_plate")
+        if not license_plate:
+            raise HTTPError(400, "license_plate is required")
+        result = self.parking_ai.vehicle_entry(str(license_plate), self._vehicle_type(params))
+        if result is None:
+            raise HTTPError(409, "No suitable spot available")
+        location, ticket_id = result
+        ticket = self.parking_ai.tickets[ticket_id]
+        spot_id = self.parking_ai.vehicles[ticket.vehicle_id].parked_spot_id
+        return {"ticket_id": ticket_id, "spot_id": spot_id, "location": location}
+
+    def handle_pay(self, params: Dict) -> Dict:
+        ticket_id = self._ticket_id(params)
+        paid, amount = self.parking_ai.pay_ticket(ticket_id)
+        return {"paid": paid, "amount": amount}
+
+    def handle_exit(self, params: Dict) -> Dict:
+        ticket_id = self._ticket_id(params)
+        if ticket_id not in self.parking_ai.tickets:
+            raise HTTPError(404, f"Unknown ticket {ticket_id}")
+        return {"exited": self.parking_ai.vehicle_exit(ticket_id)}
+
+    def handle_status(self, params: Dict) -> Dict:
+        return self.parking_ai.get_parking_status()
+
+    def handle_recommend(self, params: Dict) -> Dict:
+        preference = str(params.get("preference", "closest"))
+        spot_ids = self.parking_ai.recommend_spots(self._vehicle_type(params), preference, int(params.get("k", 1)))
+        return {"spot_id": spot_ids[0] if spot_ids else None, "spot_ids": spot_ids}
+
+    def handle_predict(self, params: Dict) -> Dict:
+        hours = int(params.get("hours", 1))
+        return {"hours_ahead": hours, "occupancy_rate": self.parking_ai.predict_occupancy(hours)}
+
+    @staticmethod
+    def _window(params: Dict) -> Tuple[datetime.datetime, datetime.datetime]:
+        try:
+            start = datetime.datetime.fromisoformat(str(params["start"]))
+            end = datetime.datetime.fromisoformat(str(params["end"]))
+        except KeyError:
+            raise HTTPError(400, "start and end are required (ISO 8601)")
+        # The lot's clock is naive local time, which an offset cannot be reliably converted to
+        if start.tzinfo is not None or end.tzinfo is not None:
+            raise HTTPError(400, "start and end must be local times without a UTC offset")
+        return start, end
+
+    def handle_availability(self, params: Dict) -> Dict:
+        start, end = self._window(params)
+        return {"start": start.isoformat(), "end": end.isoformat(),
+                "available": self.parking_ai.spot_availability(start, end)}
+
+    def handle_book(self, params: Dict) -> Dict:
+        license_plate = params.get("license_plate")
+        if not license_plate:
+            raise HTTPError(400, "license_plate is required")
+        start, end = self._window(params)
+        reservation = self.parking_ai.book_spot(str(license_plate), self._vehicle_type(params), start, end)
+        if reservation is None:
+            raise HTTPError(409, "No suitable spot is free for that window")
+        return {"reservation_id": reservation.reservation_id, "spot_id": reservation.spot_id,
+                "start": reservation.start.isoformat(), "end": reservation.end.isoformat()}
+
+    def handle_cancel_reservation(self, params: Dict) -> Dict:
+        reservation_id = params.get("reservation_id")
+        if not reservation_id:
+            raise HTTPError(400, "reservation_id is required")
+        if not self.parking_ai.cancel_reservation(str(reservation_id)):
+            raise HTTPError(404, f"No open reservation {reservation_id}")
+        return {"cancelled": True}
+
+    def handle_rates(self, params: Dict) -> Dict:
+        return self.parking_ai.current_rates()
+
+    def handle_forecast(self, params: Dict) -> Dict:
+        horizons = params.get("horizons")
+        if horizons is None:
+            return self.parking_ai.forecast_occupancy()
+        return self.parking_ai.forecast_occupancy([int(minutes) for minutes in str(horizons).split(",")])
+
+    def handle_occupancy(self, params: Dict) -> Dict:
+        resolution = str(params.get("resolution", "hour"))
+        start = params.get("start")
+        start = datetime.datetime.fromisoformat(str(start)) if start is not None else None
+        return {"resolution": resolution, "series": self.parking_ai.occupancy_series(resolution, start)}
+
+    def handle_find_vehicle(self, params: Dict) -> Dict:
+        license_plate = params.get("license_plate")
+        if not license_plate:
+            raise HTTPError(400, "license_plate is required")
+        session = self.parking_ai.find_vehicle(str(license_plate))
+        if session is None:
+            raise HTTPError(404, f"No parked vehicle with plate {license_plate}")
+        return session
+
+    def handle_overstaying(self, params: Dict) -> Dict:
+        max_hours = float(params.get("max_hours", 24))
+        return {"max_hours": max_hours, "vehicles": self.parking_ai.overstaying_vehicles(max_hours)}
+
+    # Server-sent occupancy deltas
+
+    def _on_events(self, events: List):
+        # Called on whichever thread changed the lot: snapshot the counters now, publish on the event loop
+        if not self.subscribers:
+            return
+        counters = self.parking_ai.counters
+        deltas = []
+        for event in events:
+            if isinstance(event, SpotEvent):
+                type_total, type_occupied = counters.by_type[event.spot_type]
+                deltas.append({
+                    "event": event.kind,
+                    "vehicle_id": event.vehicle_id,
+                    "spot_id": event.spot_id,
+                    "spot_type": event.spot_type.value,
+                    "level": event.level,
+                    "type_occupied": type_occupied,
+                    "type_available": type_total - type_occupied,
+                    "occupied_spots": counters.occupied,
+                    "available_spots": counters.total - counters.occupied,
+                })
+            elif event.kind == "paid":
+                deltas.append({"event": "paid", "ticket_id": event.ticket_id, "amount": event.amount})
+        self.loop.call_soon_threadsafe(self._publish_deltas, deltas)
+
+    def _publish_deltas(self, deltas: List[Dict]):
+        for delta in deltas:
+            if delta["event"] == "paid":
+                delta["total_revenue"] = self.parking_ai.total_revenue
+            self._publish(delta)
+
+    def _publish(self, delta: Dict):
+        if not self.subscribers:
+            return
+        message = f"event: delta\ndata: {json.dumps(delta)}\n\n".encode()
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # The client fell too far behind; drop it so it reconnects and resyncs from a full status
+                self.subscribers.remove(queue)
+
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        queue: asyncio.Queue = asyncio.Queue(self.max_queued_deltas)
+        self.subscribers.append(queue)
+        task = asyncio.current_task()
+        self.streams.add(task)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Connection: keep-alive\r\n\r\n")
+            status = json.dumps(self.parking_ai.get_parking_status())
+            writer.write(f"event: status\ndata: {status}\n\n".encode())
+            await writer.drain()
+            while queue in self.subscribers:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    message = b": keep-alive\n\n"
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.streams.discard(task)
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+
 # Example usage
 def demo():
     # Initialize parking system
@@ -534,5 +4095,672 @@ def demo():
     print(f"Occupancy: {status['occupied_spots']}/{status['total_spots']} spots ({status['occupancy_rate']:.1f}%)")
     print(f"Total revenue: ${status['total_revenue']:.2f}")
 
+BENCHMARK_OPERATIONS = ("entry", "exit", "status", "recommend", "fee", "prediction")
+
+def _benchmark_lot(spots: int, operations: int, seed: int) -> Dict:
+    spots_per_level = min(spots, 1000)
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    started = time.perf_counter()
+    parking_ai.initialize_parking_lot(levels=max(1, spots // spots_per_level), spots_per_level=spots_per_level,
+                                      verbose=False)
+    build_seconds = time.perf_counter() - started
+    
+    # Fill the lot halfway and give the predictor some history before timing anything
+    rng = random.Random(seed)
+    vehicle_types = list(VehicleType)
+    open_tickets = []
+    for number in range(len(parking_ai.spots) // 2):
+        result = parking_ai.vehicle_entry(f"FILL-{number}", rng.choice(vehicle_types))
+        if result:
+            open_tickets.append(result[1])
+        if number % 100 == 0:
+            parking_ai.clock.advance(datetime.timedelta(minutes=1))
+            parking_ai.record_occupancy()
+    
+    gate = ParkingGate(parking_ai, "bench")
+    preferences = ["closest", "exit", "elevator", "level-1", "section-B"]
+    latencies = {operation: [] for operation in BENCHMARK_OPERATIONS}
+    clock = time.perf_counter_ns
+    for number in range(operations):
+        parking_ai.clock.advance(datetime.timedelta(seconds=30))
+        vehicle_type = rng.choice(vehicle_types)
+        
+        started = clock()
+        result = parking_ai.vehicle_entry(f"BEN-{number}", vehicle_type)
+        latencies["entry"].append(clock() - started)
+        if result:
+            open_tickets.append(result[1])
+        
+        if open_tickets:
+            # Swap-remove a random open ticket so the lot stays about half full
+            index = rng.randrange(len(open_tickets))
+            open_tickets[index], open_tickets[-1] = open_tickets[-1], open_tickets[index]
+            ticket_id = rng.choice(open_tickets)
+            started = clock()
+            parking_ai.calculate_parking_fee(ticket_id)
+            latencies["fee"].append(clock() - started)
+            
+            ticket_id = open_tickets.pop()
+            started = clock()
+            gate.exit(ticket_id)
+            latencies["exit"].append(clock() - started)
+        
+        started = clock()
+        parking_ai.get_parking_status()
+        latencies["status"].append(clock() - started)
+        
+        started = clock()
+        parking_ai.recommend_spot(vehicle_type, rng.choice(preferences))
+        latencies["recommend"].append(clock() - started)
+        
+        started = clock()
+        parking_ai.predict_occupancy(hours_ahead=1)
+        latencies["prediction"].append(clock() - started)
+    
+    results = {}
+    for operation, samples in latencies.items():
+        samples.sort()
+        total_ns = sum(samples)
+        results[operation] = {
+            "count": len(samples),
+            "mean_us": total_ns / len(samples) / 1000 if samples else 0.0,
+            "p50_us": percentile(samples, 50) / 1000,
+            "p99_us": percentile(samples, 99) / 1000,
+            "ops_per_sec": len(samples) / (total_ns / 1e9) if total_ns else 0.0
+        }
+    return {"spots": len(parking_ai.spots), "build_seconds": build_seconds, "operations": results}
+
+def run_benchmarks(sizes: Tuple[int, ...] = (100, 1_000, 10_000, 100_000, 1_000_000),
+                   operations: int = 2000, seed: int = 1) -> Dict:
+    """Time every hot operation on synthetic half-full lots of each size; the result is JSON-serializable"""
+    runs = []
+    for size in sizes:
+        runs.append(_benchmark_lot(size, operations, seed))
+        gc.collect()
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "operations_per_size": operations,
+        "runs": runs
+    }
+
+def compare_benchmarks(baseline: Dict, current: Dict) -> List[str]:
+    """Per-operation p50 change between two run_benchmarks() results, for sizes present in both"""
+    baseline_runs = {run["spots"]: run for run in baseline["runs"]}
+    lines = []
+    for run in current["runs"]:
+        before = baseline_runs.get(run["spots"])
+        if before is None:
+            continue
+        for operation, result in run["operations"].items():
+            old = before["operations"].get(operation)
+            if old and old["p50_us"] > 0:
+                change = (result["p50_us"] / old["p50_us"] - 1) * 100
+                lines.append(f"{run['spots']:>9} {operation:>10}: p50 {old['p50_us']:9.1f} -> "
+                             f"{result['p50_us']:9.1f} us ({change:+.0f}%)")
+    return lines
+
+def benchmark_suite(output: str = "benchmark-results.json", baseline: Optional[str] = None):
+    """Run the benchmark suite, write the results as JSON and optionally compare with an earlier file.
+    
+    Usage: parking-ai-agent.py bench [output.json] [baseline.json]
+    """
+    results = run_benchmarks()
+    print(f"{'spots':>9} {'build s':>8} " + " ".join(f"{operation + ' p50':>15}" for operation in BENCHMARK_OPERATIONS))
+    for run in results["runs"]:
+        cells = " ".join(f"{run['operations'][operation]['p50_us']:>12.1f} us" for operation in BENCHMARK_OPERATIONS)
+        print(f"{run['spots']:>9} {run['build_seconds']:>8.2f} {cells}")
+    with open(output, "w") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"Results written to {output}")
+    if baseline is not None:
+        with open(baseline) as handle:
+            print("\n".join(compare_benchmarks(json.load(handle), results)))
+
+def profile_operations(spots: int = 100_000, operations: int = 20_000):
+    """Print instrumented call counts and latencies plus cProfile/tracemalloc captures for a mixed workload"""
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    parking_ai.initialize_parking_lot(levels=spots // 1000, spots_per_level=1000, verbose=False)
+    stats = parking_ai.instrument()
+    engine = SimulationEngine(parking_ai, rng=random.Random(1), arrivals_per_hour=operations / 24)
+    with ProfileCapture(cpu=True, memory=True, limit=12) as capture:
+        engine.run_until_end(24)
+        for vehicle_type in VehicleType:
+            parking_ai.recommend_spots(vehicle_type, "closest", k=5)
+        parking_ai.get_parking_status()
+    parking_ai.uninstrument()
+    
+    print(f"{'method':>22} {'calls':>8} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+    for name, summary in sorted(stats.report().items(), key=lambda item: -item[1]["calls"]):
+        print(f"{name:>22} {summary['calls']:>8} {summary['mean_us']:>9.1f} {summary['p50_us']:>9.1f} "
+              f"{summary['p99_us']:>9.1f}")
+    print(capture.report())
+
+def backtest_forecasts(weeks: int = 6, levels: int = 4, spots_per_level: int = 200, arrivals_per_hour: float = 80):
+    """Record weeks of simulated occupancy for every series, then backtest the forecaster against persistence"""
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+    engine = SimulationEngine(parking_ai, rng=random.Random(7), arrivals_per_hour=arrivals_per_hour)
+    observations = [(item.time, parking_ai.series_rates())
+                    for item in engine.run(weeks * 7 * 24) if isinstance(item, SimulationMetrics)]
+    
+    result = backtest_forecaster(observations, parking_ai.forecast_series())
+    print(f"{result['observations']} samples of {result['series']} series: "
+          f"{result['observations_per_sec']:,.0f} samples/s observed, {result['forecasts_per_sec']:,.0f} forecasts/s "
+          f"({len(DEFAULT_FORECAST_HORIZONS)} horizons each)")
+    print(f"{'horizon':>8} {'scored':>7} {'MAE lot':>8} {'naive':>7} {'MAE all':>8} {'naive':>7}")
+    for minutes, scores in result["horizons"].items():
+        print(f"{minutes:>6} m {scores['scored']:>7} {scores['mae']:>8.2f} {scores['persistence_mae']:>7.2f} "
+              f"{scores['mae_all_series']:>8.2f} {scores['persistence_mae_all_series']:>7.2f}")
+
+def benchmark_pricing(tickets: int = 100_000, days: int = 30):
+    """Time single and bulk pricing under flat and peak-hour policies, then bulk what-if repricing"""
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    parking_ai.initialize_parking_lot(levels=max(1, tickets // 500), spots_per_level=1000, verbose=False)
+    rng = random.Random(11)
+    vehicle_types = list(VehicleType)
+    step = datetime.timedelta(seconds=days * 86400 / tickets)
+    ticket_ids = []
+    for number in range(tickets):
+        parking_ai.clock.advance(step)
+        result = parking_ai.vehicle_entry(f"PRICE-{number}", rng.choice(vehicle_types))
+        if result:
+            ticket_ids.append(result[1])
+    sample = rng.sample(ticket_ids, min(10_000, len(ticket_ids)))
+    
+    rates = parking_ai.parking_rates
+    policies = [("flat", PricingPolicy(rates)), ("peak+demand", PricingPolicy.peak_hours(rates))]
+    print(f"{len(ticket_ids):,} open tickets, entered over {days} days")
+    for name, policy in policies:
+        parking_ai.set_pricing(policy)
+        started = time.perf_counter()
+        for ticket_id in sample:
+            parking_ai.calculate_parking_fee(ticket_id)
+        single_us = (time.perf_counter() - started) / len(sample) * 10**6
+        started = time.perf_counter()
+        fees = parking_ai.calculate_fees()
+        bulk_seconds = time.perf_counter() - started
+        print(f"{name:>12}: {single_us:.2f} us per fee, {len(fees):,} fees in bulk in {bulk_seconds:.3f} s "
+              f"(${sum(fees.values()):,.2f})")
+    
+    # Segment lookups make a month-long stay as cheap to price as an hour
+    pricing = parking_ai.pricing
+    for hours in (1, 24, 24 * 30):
+        started = time.perf_counter()
+        for _ in range(100_000):
+            pricing.fee(VehicleType.CAR, SCENARIO_START, hours)
+        print(f"{hours:>5} h stay: {(time.perf_counter() - started) * 10:.2f} us per fee")
+    
+    parking_ai.set_pricing(policies[0][1])
+    parking_ai.settle_all()
+    started = time.perf_counter()
+    result = parking_ai.what_if_revenue(policies[1][1], occupancy=0.9)
+    seconds = time.perf_counter() - started
+    print(f"What-if at 90% occupancy: {result['paid_sessions']:,} sessions repriced in {seconds:.3f} s, "
+          f"${result['actual_revenue']:,.2f} -> ${result['projected_revenue']:,.2f}")
+
+def benchmark_reservations(bookings: int = 50_000, levels: int = 10, spots_per_level: int = 1000, days: int = 30):
+    """Book tens of thousands of stays ahead, then time availability queries and walk-in entries around the holds"""
+    parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+    parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+    rng = random.Random(5)
+    vehicle_types = list(VehicleType)
+    
+    started = time.perf_counter()
+    booked = 0
+    for number in range(bookings):
+        start = SCENARIO_START + datetime.timedelta(minutes=rng.randrange(0, days * 24 * 60, 15))
+        end = start + datetime.timedelta(minutes=rng.choice((60, 120, 240, 480, 1440)))
+        if parking_ai.book_spot(f"BOOK-{number}", rng.choice(vehicle_types), start, end) is not None:
+            booked += 1
+    seconds = time.perf_counter() - started
+    print(f"{booked:,} of {bookings:,} bookings placed in {seconds:.2f} s ({bookings / seconds:,.0f}/s) "
+          f"on {len(parking_ai.spots):,} spots over {days} days")
+    
+    for label, hours in (("4 h", 4), ("1 day", 24), ("7 days", 24 * 7)):
+        windows = [SCENARIO_START + datetime.timedelta(minutes=rng.randrange(0, days * 24 * 60)) for _ in range(200)]
+        started = time.perf_counter()
+        for start in windows:
+            parking_ai.spot_availability(start, start + datetime.timedelta(hours=hours))
+        print(f"Availability over {label:>6}: {(time.perf_counter() - started) / len(windows) * 10**6:,.0f} us "
+              f"for all {len(ParkingSpotType)} spot types")
+    
+    # Walk-ins through the first day: holds start, are claimed or expire as the clock moves
+    started = time.perf_counter()
+    entries = 0
+    for number in range(20_000):
+        parking_ai.clock.advance(datetime.timedelta(seconds=4))
+        if parking_ai.vehicle_entry(f"WALK-{number}", rng.choice(vehicle_types)) is not None:
+            entries += 1
+    seconds = time.perf_counter() - started
+    print(f"{entries:,} walk-in entries in {seconds:.2f} s ({seconds / 20_000 * 10**6:.1f} us each), "
+          f"{len(parking_ai.reservations.holding):,} holds in force")
+
+def benchmark_spot_store_memory(sizes: Tuple[int, ...] = (10_000, 100_000, 1_000_000)):
+    """Compare memory use and GC pause of the object and columnar spot stores"""
+    spots_per_level = 1000
+    print(f"{'spots':>10} {'store':>9} {'MB':>9} {'bytes/spot':>11} {'build s':>8} {'gc ms':>8}")
+    for size in sizes:
+        for columnar in (False, True):
+            gc.collect()
+            tracemalloc.start()
+            started = time.perf_counter()
+            parking_ai = ParkingAI(columnar_spots=columnar)
+            parking_ai.initialize_parking_lot(levels=max(1, size // spots_per_level),
+                                              spots_per_level=min(size, spots_per_level), verbose=False)
+            build_seconds = time.perf_counter() - started
+            used, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            started = time.perf_counter()
+            gc.collect()
+            gc_ms = (time.perf_counter() - started) * 1000
+            
+            spot_count = len(parking_ai.spots)
+            store = "columnar" if columnar else "objects"
+            print(f"{spot_count:>10} {store:>9} {used / 2**20:>9.1f} {used / spot_count:>11.1f} "
+                  f"{build_seconds:>8.2f} {gc_ms:>8.1f}")
+            del parking_ai
+
+def benchmark_layout_loading(levels: int = 500, spots_per_level: int = 1000):
+    """Time building a large lot from a CSV layout file against creating its spots one at a time"""
+    layout = LotLayout.uniform(levels, spots_per_level)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "layout.csv")
+        layout.to_csv(path)
+        started = time.perf_counter()
+        layout = LotLayout.load(path)
+        print(f"Parsed {len(layout.sections)} sections ({os.path.getsize(path) / 1024:.0f} KiB) "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    for columnar in (False, True):
+        store = "columnar" if columnar else "objects"
+        parking_ai = ParkingAI(columnar_spots=columnar)
+        started = time.perf_counter()
+        parking_ai.load_layout(layout)
+        bulk_seconds = time.perf_counter() - started
+        
+        one_by_one = ParkingAI(columnar_spots=columnar)
+        started = time.perf_counter()
+        for spot in parking_ai.spots.values():
+            one_by_one.create_spot(spot.spot_id, spot.spot_type, spot.level, spot.section)
+        single_seconds = time.perf_counter() - started
+        print(f"{store:>9}: {len(parking_ai.spots)} spots in {bulk_seconds:.2f}s bulk, "
+              f"{single_seconds:.2f}s one spot at a time")
+        del parking_ai, one_by_one
+
+def demo_monte_carlo():
+    """Compare two garage sizes under the same arrival intensity"""
+    scenarios = [
+        Scenario("small", levels=2, spots_per_level=40, arrivals_per_hour=20, hours=24 * 7),
+        Scenario("large", levels=3, spots_per_level=60, arrivals_per_hour=20, hours=24 * 7)
+    ]
+    for name, result in MonteCarloRunner().run(scenarios, runs=16, seed=42).items():
+        print(f"{name}: occupancy p50/p90/p99 = "
+              f"{result['occupancy']['p50']:.1f}/{result['occupancy']['p90']:.1f}/{result['occupancy']['p99']:.1f}%, "
+              f"rejections mean {result['rejections']['mean']:.1f}, "
+              f"revenue p5/p50/p95 = ${result['revenue']['p5']:.2f}/${result['revenue']['p50']:.2f}/${result['revenue']['p95']:.2f}")
+
+def benchmark_journal(tickets: int = 1_000_000, levels: int = 100, spots_per_level: int = 1000,
+                      gates: int = 16, gate_tickets: int = 500):
+    """Measure sustained journaled events/sec and recovery time for a lot with many tickets,
+    then durable group commit from concurrent gates"""
+    with tempfile.TemporaryDirectory() as directory:
+        clock = SimulatedClock(SCENARIO_START)
+        # One lane cannot share fsyncs with anyone, so the bulk run commits asynchronously
+        parking_ai = ParkingAI.recover(directory, clock=clock,
+                                       journal_options={"snapshot_every": 10 * tickets, "durable": False})
+        parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+        parking_ai.write_snapshot()
+        
+        # Keep roughly half the lot occupied: each entry is followed by the exit of an older car
+        rng = random.Random(1)
+        vehicle_types = [VehicleType.CAR, VehicleType.MOTORCYCLE]
+        parked = deque()
+        started = time.perf_counter()
+        for number in range(tickets):
+            clock.advance(datetime.timedelta(seconds=5))
+            result = parking_ai.vehicle_entry(f"BEN-{number}", rng.choice(vehicle_types))
+            if result:
+                parked.append(result[1])
+            if parked and (len(parked) > len(parking_ai.spots) // 2 or not result):
+                ticket_id = parked.popleft()
+                parking_ai.pay_ticket(ticket_id)
+                parking_ai.vehicle_exit(ticket_id)
+            if number == int(tickets * 0.9):
+                parking_ai.write_snapshot()  # Leave the last 10% of traffic in the log tail
+        parking_ai.journal.flush()
+        elapsed = time.perf_counter() - started
+        events = parking_ai.journal.sequence
+        print(f"Logged {events} events for {tickets} tickets in {elapsed:.1f}s ({events / elapsed:,.0f} events/sec, "
+              f"asynchronous commit)")
+        parking_ai.journal.close()
+        
+        started = time.perf_counter()
+        recovered = ParkingAI.recover(directory)
+        elapsed = time.perf_counter() - started
+        print(f"Recovered {len(recovered.tickets)} tickets and {recovered.counters.occupied} parked vehicles "
+              f"in {elapsed:.1f}s")
+        if recovered.snapshot_state() != parking_ai.snapshot_state():
+            print("WARNING: recovered state differs from the original")
+        recovered.journal.close()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        parking_ai = ParkingAI.recover(directory)
+        parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+        parking_ai.write_snapshot()
+        
+        def run_gate(gate: ParkingGate):
+            for number in range(gate_tickets):
+                result = gate.enter(f"{gate.name}-{number}", VehicleType.CAR)
+                if result:
+                    gate.exit(result[1])
+        
+        workers = [threading.Thread(target=run_gate, args=(ParkingGate(parking_ai, f"G{index}"),))
+                   for index in range(gates)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        journal = parking_ai.journal
+        print(f"Durable commit from {gates} gates: {journal.sequence} events in {elapsed:.1f}s "
+              f"({journal.sequence / elapsed:,.0f} events/sec, {journal.sequence / max(journal.commits, 1):.1f} "
+              f"events per fsync)")
+        journal.close()
+
+def benchmark_archive(days: int = 7, levels: int = 10, spots_per_level: int = 200, arrivals_per_hour: float = 300):
+    """Simulate a week of continuous traffic with and without a TicketArchive, sampling traced memory daily"""
+    with tempfile.TemporaryDirectory() as directory:
+        for label, archive in (("in memory", None), ("archived", TicketArchive(os.path.join(directory, "archive.db")))):
+            parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START), archive=archive)
+            parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+            engine = SimulationEngine(parking_ai, rng=random.Random(1), arrivals_per_hour=arrivals_per_hour)
+            print(f"{label}:")
+            tracemalloc.start()
+            for day in range(1, days + 1):
+                engine.run_until_end(24)
+                gc.collect()
+                current, _ = tracemalloc.get_traced_memory()
+                archived = archive.count() if archive is not None else 0
+                print(f"  day {day}: {engine.entries:>7} entries, {len(parking_ai.tickets):>7} tickets in memory, "
+                      f"{archived:>7} archived, {current / 2**20:7.1f} MiB traced")
+            tracemalloc.stop()
+            report = parking_ai.revenue_report()
+            print(f"  revenue ${report['revenue']:,.2f} over {report['paid_sessions']} paid sessions "
+                  f"(running total ${parking_ai.total_revenue:,.2f})")
+            if archive is not None:
+                archive.close()
+
+def benchmark_events(hours: float = 24 * 7, levels: int = 10, spots_per_level: int = 200,
+                     arrivals_per_hour: float = 300):
+    """Measure what event subscribers cost a simulated week of traffic, by delivery mode"""
+    modes = [
+        ("no subscribers", None),
+        ("sync, batch 1", {}),
+        ("sync, batch 256", {"batch_size": 256}),
+        ("async, batch 256", {"asynchronous": True, "batch_size": 256}),
+        ("async, drop over 64", {"asynchronous": True, "batch_size": 16, "max_pending": 64}),
+    ]
+    print(f"{'mode':>20} {'seconds':>8} {'delivered':>10} {'dropped':>8} {'revenue view':>13}")
+    for label, options in modes:
+        parking_ai = ParkingAI(clock=SimulatedClock(SCENARIO_START))
+        parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+        revenue = RevenueView()
+        subscriptions = []
+        if options is not None:
+            subscriptions.append(revenue.attach(parking_ai.events, **options))
+            subscriptions.append(parking_ai.events.subscribe(lambda events: None, kinds=(SpotEvent,), **options))
+        engine = SimulationEngine(parking_ai, rng=random.Random(1), arrivals_per_hour=arrivals_per_hour)
+        started = time.perf_counter()
+        engine.run_until_end(hours)
+        parking_ai.events.flush()
+        elapsed = time.perf_counter() - started
+        for subscription in subscriptions:
+            parking_ai.events.unsubscribe(subscription)
+        
+        delivered = sum(subscription.delivered for subscription in subscriptions)
+        dropped = sum(subscription.dropped for subscription in subscriptions)
+        if options is None:
+            matches = "-"
+        else:
+            matches = "matches" if math.isclose(revenue.total, parking_ai.total_revenue) else "differs"
+        print(f"{label:>20} {elapsed:8.2f} {delivered:>10} {dropped:>8} {matches:>13}")
+
+def stress_test_gates(threads: int = 16, operations: int = 5000, levels: int = 2, spots_per_level: int = 100):
+    """Hammer one small lot from many gate threads and fail if any spot is ever double-booked"""
+    parking_ai = ParkingAI()
+    parking_ai.initialize_parking_lot(levels, spots_per_level, verbose=False)
+    holders: Dict[str, str] = {}  # spot ID -> ticket currently parked there, as seen by the gates
+    double_bookings = []
+    start_barrier = threading.Barrier(threads)
+    
+    def run_gate(gate: ParkingGate, seed: int):
+        rng = random.Random(seed)
+        parked = []
+        start_barrier.wait()
+        for number in range(operations):
+            if parked and (rng.random() < 0.45 or len(parked) > 20):
+                ticket_id, spot_id = parked.pop(rng.randrange(len(parked)))
+                holders.pop(spot_id, None)  # Release before exiting so the next holder is legitimate
+                gate.exit(ticket_id)
+                continue
+            result = gate.enter(f"{gate.name}-{number}", rng.choice(list(VehicleType)))
+            if result:
+                ticket_id = result[1]
+                spot_id = parking_ai.vehicles[parking_ai.tickets[ticket_id].vehicle_id].parked_spot_id
+                holder = holders.setdefault(spot_id, ticket_id)
+                if holder != ticket_id:
+                    double_bookings.append((spot_id, holder, ticket_id))
+                parked.append((ticket_id, spot_id))
+    
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to provoke races
+    try:
+        gates = [ParkingGate(parking_ai, f"G{index}") for index in range(threads)]
+        workers = [threading.Thread(target=run_gate, args=(gate, index)) for index, gate in enumerate(gates)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        sys.setswitchinterval(previous_interval)
+    
+    entries = sum(gate.entries for gate in gates)
+    exits = sum(gate.exits for gate in gates)
+    parking_ai.verify_counters()
+    parked_now = sum(1 for ticket in parking_ai.tickets.values() if ticket.exit_time is None)
+    problems = []
+    if double_bookings:
+        problems.append(f"{len(double_bookings)} double bookings, e.g. {double_bookings[0]}")
+    if len(parking_ai.tickets) != entries:
+        problems.append(f"{entries} entries produced {len(parking_ai.tickets)} tickets (ID collision)")
+    if parked_now != parking_ai.counters.occupied or entries - exits != parked_now:
+        problems.append(f"{parked_now} open tickets but {parking_ai.counters.occupied} occupied spots")
+    print(f"{threads} gates, {entries} entries, {exits} exits in {elapsed:.1f}s")
+    if problems:
+        raise RuntimeError("Gate stress test failed: " + "; ".join(problems))
+    print("No spot was double-booked")
+
+def serve(port: int = 8080):
+    """Serve a demo lot over HTTP until interrupted"""
+    parking_ai = ParkingAI()
+    parking_ai.initialize_parking_lot(levels=3, spots_per_level=40)
+    parking_ai.track_occupancy()  # Keep /predict current without a sampling loop
+    service = ParkingService(parking_ai, host="0.0.0.0", port=port)
+    print(f"Serving on http://localhost:{port}/ (Ctrl+C to stop)")
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+def _run_service_process(port: int, ready):
+    parking_ai = ParkingAI()
+    parking_ai.initialize_parking_lot(levels=20, spots_per_level=500, verbose=False)
+    service = ParkingService(parking_ai, port=port)
+    
+    async def main():
+        await service.start()
+        ready.set()
+        await service.serve_forever()
+    
+    asyncio.run(main())
+
+async def _load_test_client(port: int, requests: int, latencies: List[float], seed: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random(seed)
+    vehicle_types = [vehicle_type.value for vehicle_type in VehicleType]
+    open_tickets = []
+    
+    async def call(method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        started = time.perf_counter()
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        response = await reader.readexactly(length)
+        latencies.append(time.perf_counter() - started)
+        return json.loads(response)
+    
+    for number in range(requests):
+        choice = rng.random()
+        if choice < 0.3 or not open_tickets:
+            result = await call("POST", "/entry", {"license_plate": f"LT-{seed}-{number}",
+                                                   "vehicle_type": rng.choice(vehicle_types)})
+            if "ticket_id" in result:
+                open_tickets.append(result["ticket_id"])
+        elif choice < 0.55:
+            ticket_id = open_tickets.pop(rng.randrange(len(open_tickets)))
+            await call("POST", "/pay", {"ticket_id": ticket_id})
+            await call("POST", "/exit", {"ticket_id": ticket_id})
+        elif choice < 0.8:
+            await call("GET", "/status")
+        elif choice < 0.9:
+            await call("GET", f"/recommend?vehicle_type={rng.choice(vehicle_types)}")
+        else:
+            await call("GET", "/predict?hours=1")
+    writer.close()
+
+def load_test_service(requests: int = 20000, connections: int = 32):
+    """Start a local service in a separate process and report request latency and throughput"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_run_service_process, args=(port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(timeout=30):
+            raise RuntimeError("Service did not start")
+        latencies: List[float] = []
+        
+        async def run_clients():
+            per_connection = requests // connections
+            await asyncio.gather(*(_load_test_client(port, per_connection, latencies, seed)
+                                   for seed in range(connections)))
+        
+        started = time.perf_counter()
+        asyncio.run(run_clients())
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.join()
+    
+    latencies.sort()
+    print(f"{len(latencies)} requests over {connections} connections in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:,.0f} req/s)")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+
+def benchmark_facilities(facilities: int = 8, arrivals: int = 200_000, batch_size: int = 2000):
+    """Compare routing throughput with in-process shards and one worker process per shard"""
+    for use_processes in (False, True):
+        manager = FacilityManager(use_processes=use_processes)
+        rng = random.Random(7)
+        for index in range(facilities):
+            manager.add_facility(f"garage-{index}", (rng.uniform(0, 10), rng.uniform(0, 10)),
+                                 levels=10, spots_per_level=1000)
+        parked: deque = deque()
+        routed = rejected = 0
+        started = time.perf_counter()
+        for batch_start in range(0, arrivals, batch_size):
+            batch = [(f"FM-{number}", rng.choice(list(VehicleType)), (rng.uniform(0, 10), rng.uniform(0, 10)))
+                     for number in range(batch_start, min(arrivals, batch_start + batch_size))]
+            for result in manager.route_vehicles(batch):
+                if result:
+                    routed += 1
+                    parked.append((result[0], result[2]))
+                else:
+                    rejected += 1
+            # Keep garages around half full by checking out the oldest vehicles
+            leaving = [parked.popleft() for _ in range(max(0, len(parked) - facilities * 5000))]
+            if leaving:
+                manager.checkout(leaving)
+        elapsed = time.perf_counter() - started
+        manager.close()
+        mode = "processes" if use_processes else "in-process"
+        print(f"{mode:>10}: {routed} routed, {rejected} rejected in {elapsed:.1f}s ({arrivals / elapsed:,.0f} arrivals/s)")
+
+COMMANDS = {
+    "demo": demo,
+    "bench": benchmark_suite,
+    "profile": profile_operations,
+    "bench-memory": benchmark_spot_store_memory,
+    "bench-layout": benchmark_layout_loading,
+    "backtest": backtest_forecasts,
+    "bench-pricing": benchmark_pricing,
+    "bench-reservations": benchmark_reservations,
+    "monte-carlo": demo_monte_carlo,
+    "bench-journal": benchmark_journal,
+    "bench-archive": benchmark_archive,
+    "bench-events": benchmark_events,
+    "stress-gates": stress_test_gates,
+    "serve": serve,
+    "load-test": load_test_service,
+    "bench-facilities": benchmark_facilities,
+}
+
+def command_arguments(command, values: List[str]) -> list:
+    """Convert command-line strings to the types of a command's annotated parameters.
+    
+    A trailing Tuple[int, ...] parameter takes all remaining values.
+    """
+    parameters = list(inspect.signature(command).parameters.values())
+    arguments = []
+    for index, value in enumerate(values):
+        if index >= len(parameters):
+            raise ValueError(f"expected at most {len(parameters)} arguments, got {len(values)}")
+        annotation = parameters[index].annotation
+        if annotation == Tuple[int, ...]:
+            arguments.append(tuple(int(item) for item in values[index:]))
+            break
+        if annotation in (int, float):
+            arguments.append(annotation(value))
+        else:
+            arguments.append(value)  # str and Optional[str]
+    return arguments
+
+def main(argv: List[str]):
+    name = argv[1] if len(argv) > 1 else "demo"
+    if name not in COMMANDS:
+        sys.exit(f"Unknown command {name!r}; use one of: {', '.join(COMMANDS)}")
+    command = COMMANDS[name]
+    try:
+        arguments = command_arguments(command, argv[2:])
+    except ValueError as error:
+        parameters = " ".join(f"[{parameter}]" for parameter in inspect.signature(command).parameters)
+        sys.exit(f"{name}: {error}\nusage: {name} {parameters}")
+    command(*arguments)
+
 if __name__ == "__main__":
-    demo()
+    main(sys.argv)
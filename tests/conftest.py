@@ -0,0 +1,35 @@
+import datetime
+import importlib.util
+import pathlib
+import sys
+
+import pytest
+
+MODULE_PATH = pathlib.Path(__file__).resolve().parent.parent / "parking-ai-agent.py"
+
+
+def _load_module():
+    # The module file name has dashes, so it cannot be imported by name
+    spec = importlib.util.spec_from_file_location("parking_ai_agent", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+parking = _load_module()
+
+START = datetime.datetime(2025, 1, 6, 8)  # A Monday morning
+
+
+@pytest.fixture
+def pa():
+    return parking
+
+
+@pytest.fixture(params=[False, True], ids=["objects", "columnar"])
+def lot(request):
+    """A 3x100 lot on a simulated clock, in both spot stores"""
+    parking_ai = parking.ParkingAI(columnar_spots=request.param, clock=parking.SimulatedClock(START))
+    parking_ai.initialize_parking_lot(3, 100, verbose=False)
+    return parking_ai
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from conftest import START
+
+MINUTE = datetime.timedelta(minutes=1)
+
+
+def _traffic(pa, parking_ai, count):
+    """Park count cars one minute apart, each leaving (paid) 30 minutes after it arrived"""
+    parked = []
+    for number in range(count):
+        parking_ai.clock.advance(MINUTE)
+        parked.append(parking_ai.vehicle_entry(f"ARC-{number}", pa.VehicleType.CAR)[1])
+        if number >= 30:
+            ticket_id = parked.pop(0)
+            assert parking_ai.pay_ticket(ticket_id)[0] and parking_ai.vehicle_exit(ticket_id)
+    return parked
+
+
+def _archive(pa, tmp_path):
+    return pa.TicketArchive(str(tmp_path / "archive.db"), batch_size=20, retain_for=datetime.timedelta(minutes=10))
+
+
+def test_revenue_report_spans_memory_and_the_archive(pa, tmp_path):
+    archive = _archive(pa, tmp_path)
+    parking_ai = pa.ParkingAI(clock=pa.SimulatedClock(START), archive=archive)
+    parking_ai.initialize_parking_lot(2, 50, verbose=False)
+    open_tickets = _traffic(pa, parking_ai, 200)
+    parking_ai.archive_completed()
+    
+    assert archive.count() > 0
+    assert archive.count() + len(parking_ai.tickets) == 200
+    report = parking_ai.revenue_report()
+    assert report["paid_sessions"] == 200 - len(open_tickets)
+    assert report["revenue"] == pytest.approx(parking_ai.total_revenue)
+    archive.close()
+
+
+def test_recovery_does_not_resurrect_archived_sessions(pa, tmp_path):
+    directory = str(tmp_path / "journal")
+    parking_ai = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(START), archive=_archive(pa, tmp_path))
+    parking_ai.initialize_parking_lot(2, 50, verbose=False)
+    parking_ai.write_snapshot()
+    _traffic(pa, parking_ai, 200)
+    parking_ai.archive_completed()  # The journal tail still holds these sessions
+    archived = parking_ai.archive.count()
+    assert archived > 0
+    expected_tickets = set(parking_ai.tickets)
+    expected_report = parking_ai.revenue_report()
+    parking_ai.journal.close()
+    parking_ai.archive.close()
+    
+    archive = _archive(pa, tmp_path)
+    recovered = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(parking_ai.clock.now()), archive=archive)
+    assert set(recovered.tickets) == expected_tickets
+    assert archive.count() == archived
+    assert not archive.archived(recovered.tickets)
+    report = recovered.revenue_report()
+    assert report["paid_sessions"] == expected_report["paid_sessions"]
+    assert report["revenue"] == pytest.approx(expected_report["revenue"])
+    recovered.journal.close()
+    archive.close()
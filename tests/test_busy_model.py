@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+from conftest import START
+
+
+def _model(pa):
+    model = pa.BusyTimeModel(min_arrivals=10)
+    for day in range(7):
+        for hour in range(24):
+            when = START + datetime.timedelta(days=day, hours=hour - START.hour)
+            for _ in range(12 if hour in (8, 9, 17) else 2):
+                model.record_arrival(when)
+            model.record_departure(when + datetime.timedelta(hours=1))
+    return model
+
+
+def test_save_and_load_round_trip(pa, tmp_path):
+    model = _model(pa)
+    path = str(tmp_path / "busy.bin")
+    model.save(path)
+    loaded = pa.BusyTimeModel.load(path, min_arrivals=10)
+    
+    assert loaded.arrivals == model.arrivals
+    assert loaded.departures == model.departures
+    assert loaded.daily_arrivals == model.daily_arrivals
+    assert loaded.busy_times() == model.busy_times()
+    assert model.busy_times()["Monday"] == [8, 9, 17]
+
+
+def test_incremental_counts_match_a_rebuild(pa, lot):
+    for number in range(120):
+        lot.clock.advance(datetime.timedelta(minutes=37))
+        ticket_id = lot.vehicle_entry(f"BUSY-{number}", pa.VehicleType.CAR)[1]
+        if number % 3 == 0:
+            assert lot.pay_ticket(ticket_id)[0] and lot.vehicle_exit(ticket_id)
+    rebuilt = pa.BusyTimeModel()
+    rebuilt.rebuild(lot.tickets.values())
+    assert lot.busy_model.arrivals == rebuilt.arrivals
+    assert lot.busy_model.departures == rebuilt.departures
+    assert lot.busy_model.daily_arrivals == rebuilt.daily_arrivals
+    assert sum(rebuilt.arrivals) == 120 and sum(rebuilt.departures) == 40
+
+
+@pytest.mark.parametrize("damage", ["magic", "header", "body"])
+def test_damaged_files_are_rejected(pa, tmp_path, damage):
+    path = tmp_path / "busy.bin"
+    _model(pa).save(str(path))
+    data = path.read_bytes()
+    if damage == "magic":
+        data = b"XXXX" + data[4:]
+    elif damage == "header":
+        data = data[:5]
+    else:
+        data = data[:-12]
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        pa.BusyTimeModel.load(str(path))
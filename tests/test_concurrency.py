@@ -0,0 +1,96 @@
+import random
+import sys
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def fast_switching():
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to provoke races
+    yield
+    sys.setswitchinterval(previous_interval)
+
+
+def _drive_gates(pa, parking_ai, threads=8, operations=1500):
+    holders = {}  # spot ID -> ticket parked there, as seen by the gates
+    double_bookings = []
+    barrier = threading.Barrier(threads)
+    
+    def run_gate(gate, seed):
+        rng = random.Random(seed)
+        parked = []
+        barrier.wait()
+        for number in range(operations):
+            if parked and (rng.random() < 0.45 or len(parked) > 10):
+                ticket_id, spot_id = parked.pop(rng.randrange(len(parked)))
+                holders.pop(spot_id, None)
+                assert gate.exit(ticket_id)
+                continue
+            result = gate.enter(f"{gate.name}-{number}", rng.choice(list(pa.VehicleType)))
+            if result:
+                ticket_id = result[1]
+                spot_id = parking_ai.vehicles[parking_ai.tickets[ticket_id].vehicle_id].parked_spot_id
+                holder = holders.setdefault(spot_id, ticket_id)
+                if holder != ticket_id:
+                    double_bookings.append((spot_id, holder, ticket_id))
+                parked.append((ticket_id, spot_id))
+    
+    gates = [pa.ParkingGate(parking_ai, f"G{index}") for index in range(threads)]
+    workers = [threading.Thread(target=run_gate, args=(gate, index)) for index, gate in enumerate(gates)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return gates, double_bookings
+
+
+def _parked(parking_ai):
+    return {spot.spot_id: spot.vehicle_id for spot in parking_ai.spots.values() if spot.is_occupied}
+
+
+def test_concurrent_gates_never_double_book(pa, fast_switching):
+    parking_ai = pa.ParkingAI()
+    parking_ai.initialize_parking_lot(1, 60, verbose=False)  # Small lot: spots are reused constantly
+    gates, double_bookings = _drive_gates(pa, parking_ai)
+    
+    assert double_bookings == []
+    parking_ai.verify_counters()
+    entries = sum(gate.entries for gate in gates)
+    exits = sum(gate.exits for gate in gates)
+    open_tickets = [ticket for ticket in parking_ai.tickets.values() if ticket.exit_time is None]
+    assert len(parking_ai.tickets) == entries
+    assert len(open_tickets) == entries - exits == parking_ai.counters.occupied
+    
+    # Every occupied spot holds exactly the vehicle of one open ticket
+    parked = _parked(parking_ai)
+    assert sorted(parked.values()) == sorted(ticket.vehicle_id for ticket in open_tickets)
+    assert len(set(parked.values())) == len(parked)
+
+
+def test_concurrent_journal_replays_to_the_live_lot(pa, tmp_path, fast_switching):
+    parking_ai = pa.ParkingAI.recover(str(tmp_path), journal_options={"fsync": False})
+    parking_ai.initialize_parking_lot(1, 12, verbose=False)
+    parking_ai.write_snapshot()
+    
+    # Widen the window between vacating a spot and logging the exit, where another gate
+    # could reuse the spot and get its entry logged first
+    log = parking_ai._log
+    
+    def slow_exit_log(kind, *fields):
+        if kind == "exit":
+            time.sleep(0.0002)
+        log(kind, *fields)
+    parking_ai._log = slow_exit_log
+    _drive_gates(pa, parking_ai, operations=600)
+    parking_ai.journal.close()
+    
+    recovered = pa.ParkingAI.recover(str(tmp_path), journal_options={"fsync": False})
+    recovered.verify_counters()
+    assert _parked(recovered) == _parked(parking_ai)
+    assert recovered.total_revenue == pytest.approx(parking_ai.total_revenue)
+    assert {ticket_id: (ticket.is_paid, ticket.exit_time) for ticket_id, ticket in recovered.tickets.items()} == \
+        {ticket_id: (ticket.is_paid, ticket.exit_time) for ticket_id, ticket in parking_ai.tickets.items()}
+    recovered.journal.close()
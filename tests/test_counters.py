@@ -0,0 +1,68 @@
+import datetime
+import random
+
+import pytest
+
+from conftest import START
+
+
+def test_status_matches_full_scan_through_entries_and_exits(pa, lot):
+    rng = random.Random(2)
+    open_tickets = []
+    for number in range(600):
+        lot.clock.advance(datetime.timedelta(minutes=1))
+        if open_tickets and rng.random() < 0.45:
+            ticket_id = open_tickets.pop(rng.randrange(len(open_tickets)))
+            assert lot.pay_ticket(ticket_id)[0]
+            assert lot.vehicle_exit(ticket_id)
+        else:
+            result = lot.vehicle_entry(f"CNT-{number}", rng.choice(list(pa.VehicleType)))
+            if result is not None:
+                open_tickets.append(result[1])
+        if number % 50 == 0:
+            lot.verify_counters()
+    
+    lot.verify_counters()
+    status = lot.get_parking_status()
+    assert status["occupied_spots"] == sum(1 for spot in lot.spots.values() if spot.is_occupied)
+    assert status["occupied_spots"] == len(open_tickets)
+
+
+def test_settle_all_leaves_counters_consistent(pa, lot):
+    for number in range(120):
+        lot.vehicle_entry(f"SET-{number}", pa.VehicleType.CAR)
+    lot.clock.advance(datetime.timedelta(hours=3))
+    lot.settle_all()
+    lot.verify_counters()
+    assert lot.counters.occupied == 0
+
+
+def test_check_consistency_mode_verifies_on_every_status_call(pa):
+    parking_ai = pa.ParkingAI(check_consistency=True, clock=pa.SimulatedClock(START))
+    parking_ai.initialize_parking_lot(2, 40, verbose=False)
+    parking_ai.vehicle_entry("CHK-1", pa.VehicleType.TRUCK)
+    parking_ai.get_parking_status()
+    
+    parking_ai.counters.occupied += 1  # Simulate drift
+    with pytest.raises(RuntimeError, match="out of sync"):
+        parking_ai.get_parking_status()
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_layout_loading_counts_every_section(pa, tmp_path, columnar):
+    path = tmp_path / "layout.csv"
+    path.write_text("level,section,regular,compact,large,handicapped,motorcycle\n"
+                    "1,A,10,4,2,1,3\n"
+                    "1,B,0,0,5,0,0\n"
+                    "2,A,7,0,0,2,0\n")
+    parking_ai = pa.ParkingAI(columnar_spots=columnar, clock=pa.SimulatedClock(START))
+    parking_ai.load_layout(pa.LotLayout.load(str(path)))
+    parking_ai.verify_counters()
+    assert parking_ai.counters.total == 34
+    assert parking_ai.counters.by_section[(1, "B")] == [5, 0]
+    
+    parking_ai.vehicle_entry("LAY-1", pa.VehicleType.TRUCK)
+    parking_ai.vehicle_entry("LAY-2", pa.VehicleType.HANDICAPPED)
+    parking_ai.verify_counters()
+    assert parking_ai.counters.by_type[pa.ParkingSpotType.LARGE] == [7, 1]
+    assert parking_ai.counters.by_type[pa.ParkingSpotType.HANDICAPPED] == [3, 1]
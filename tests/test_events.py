@@ -0,0 +1,20 @@
+import threading
+
+
+def test_full_async_queue_drops_instead_of_blocking_the_publisher(pa, lot):
+    release = threading.Event()
+    seen = []
+    
+    def slow_handler(events):
+        release.wait()
+        seen.extend(events)
+    
+    subscription = lot.events.subscribe(slow_handler, kinds=(pa.SpotEvent,), max_pending=4, asynchronous=True)
+    # Each entry publishes while the spot's type lock is held; none of them may wait for the worker
+    tickets = [lot.vehicle_entry(f"EVT-{number}", pa.VehicleType.CAR)[1] for number in range(20)]
+    assert len(tickets) == 20
+    assert subscription.dropped > 0
+    
+    release.set()
+    lot.events.unsubscribe(subscription)
+    assert len(seen) == subscription.delivered == 20 - subscription.dropped
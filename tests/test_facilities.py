@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("use_processes", [False, True], ids=["local", "processes"])
+def test_failed_shard_batch_does_not_desynchronize_other_shards(pa, use_processes):
+    manager = pa.FacilityManager(use_processes=use_processes)
+    try:
+        for index, name in enumerate(("north", "south", "east")):
+            manager.add_facility(name, (index, 0), 1, 40)
+        
+        with pytest.raises(TypeError):
+            manager.execute({"north": [("get_parking_status", ())],
+                             "south": [("vehicle_exit", ())],  # Missing ticket ID
+                             "east": [("vehicle_entry", ("FAC-1", pa.VehicleType.CAR))]})
+        
+        # The next request must see its own replies, not the leftovers of the failed one
+        results = manager.execute({name: [("vehicle_entry", (f"FAC-{name}", pa.VehicleType.CAR))]
+                                   for name in ("north", "south", "east")})
+        for name, (result,) in results.items():
+            location, ticket_id = result
+            assert ticket_id.startswith("T-")
+        status = manager.status()
+        assert status["north"]["occupied_spots"] == 1
+        assert status["east"]["occupied_spots"] == 2
+    finally:
+        manager.close()
@@ -0,0 +1,64 @@
+import datetime
+import random
+
+import pytest
+
+from conftest import START
+
+
+def _policy(pa, lot, name):
+    if name == "flat":
+        return pa.PricingPolicy(lot.parking_rates)
+    return pa.PricingPolicy.peak_hours(lot.parking_rates, peak_multiplier=1.5)
+
+
+def _park_over_days(pa, lot, count, days):
+    rng = random.Random(4)
+    tickets = []
+    step = datetime.timedelta(days=days) / count
+    for number in range(count):
+        lot.clock.advance(step * rng.uniform(0.5, 1.5))
+        result = lot.vehicle_entry(f"FEE-{number}", rng.choice(list(pa.VehicleType)))
+        if result is not None:
+            tickets.append(result[1])
+    return tickets
+
+
+@pytest.mark.parametrize("policy", ["flat", "peak"])
+def test_bulk_fees_match_the_per_ticket_path(pa, lot, policy):
+    lot.set_pricing(_policy(pa, lot, policy))
+    tickets = _park_over_days(pa, lot, 250, days=3)  # Busy enough to reach the higher demand tiers
+    at = lot.clock.now() + datetime.timedelta(days=1, hours=3, minutes=17, microseconds=3)
+    
+    fees = lot.calculate_fees(at=at)
+    assert set(fees) == set(tickets)
+    assert fees == {ticket_id: lot.calculate_parking_fee(ticket_id, at=at) for ticket_id in tickets}
+    # Multi-day stays are in the mix, and the daily maximum clamps the fees
+    elapsed = {ticket_id: (at - lot.tickets[ticket_id].entry_time).total_seconds() / 3600 for ticket_id in tickets}
+    assert max(elapsed.values()) > 72
+    for ticket_id, fee in fees.items():
+        ticket = lot.tickets[ticket_id]
+        vehicle = lot.vehicles[ticket.vehicle_id]
+        hourly_rate, daily_max = lot.pricing.rates[vehicle.vehicle_type][lot._ticket_tier(vehicle)]
+        billable = lot.pricing.billable_hours(ticket.entry_time, elapsed[ticket_id])
+        assert fee < billable * hourly_rate
+        assert fee == pytest.approx(billable / 24 * daily_max)
+
+
+@pytest.mark.parametrize("policy", ["flat", "peak"])
+def test_settle_all_books_the_fees_once(pa, lot, policy):
+    lot.set_pricing(_policy(pa, lot, policy))
+    tickets = _park_over_days(pa, lot, 120, days=2)
+    for ticket_id in tickets[:10]:
+        assert lot.pay_ticket(ticket_id)[0]
+    revenue_before = lot.total_revenue
+    at = lot.clock.now() + datetime.timedelta(hours=30)
+    
+    expected = lot.calculate_fees([ticket_id for ticket_id in tickets[10:]], at=at)
+    fees = lot.settle_all(at=at)
+    assert fees == expected
+    assert lot.total_revenue == pytest.approx(revenue_before + sum(fees.values()), rel=1e-12)
+    assert not lot.sessions
+    
+    assert lot.settle_all(at=at) == {}
+    assert lot.total_revenue == pytest.approx(revenue_before + sum(fees.values()), rel=1e-12)
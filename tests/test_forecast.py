@@ -0,0 +1,55 @@
+import datetime
+import math
+import random
+
+import pytest
+
+from conftest import START
+
+
+def _daily_pattern(days, series, step_minutes=5, seed=7):
+    """Samples of a repeating daily curve per series, with a little noise"""
+    rng = random.Random(seed)
+    observations = []
+    for step in range(days * 24 * 60 // step_minutes):
+        when = START + datetime.timedelta(minutes=step * step_minutes)
+        hours = when.hour + when.minute / 60
+        values = []
+        for index in range(series):
+            peak = 40 + 15 * index  # Each series peaks at its own height and hour
+            shape = math.sin(math.pi * max(0.0, hours - 6 - index) / 12) if 6 + index < hours < 18 + index else 0.0
+            values.append(max(0.0, min(100.0, 10 + peak * shape + rng.gauss(0, 2))))
+        observations.append((when, values))
+    return observations
+
+
+def test_forecaster_beats_persistence_on_a_daily_pattern(pa):
+    series = ["all", "car", "level_1"]
+    horizons = (15, 60, 240, 720)
+    report = pa.backtest_forecaster(_daily_pattern(14, len(series)), series, horizons_minutes=horizons)
+    
+    assert report["series"] == len(series)
+    for minutes in horizons:
+        scores = report["horizons"][minutes]
+        assert scores["scored"] > 0
+        assert scores["mae"] < scores["persistence_mae"]
+        assert scores["mae_all_series"] < scores["persistence_mae_all_series"]
+
+
+def test_forecast_occupancy_covers_every_series_and_horizon(pa, lot):
+    for step in range(48):
+        if step % 3 == 0:
+            lot.vehicle_entry(f"FC-{step}", pa.VehicleType.CAR)
+        lot.record_occupancy()
+        lot.clock.advance(datetime.timedelta(minutes=15))
+    
+    horizons = (15, 60, 240)
+    forecast = lot.forecast_occupancy(horizons)
+    assert forecast["horizons_minutes"] == list(horizons)
+    assert len(forecast["all"]) == len(horizons)
+    assert set(forecast["by_type"]) == {spot_type.value for spot_type in pa.ParkingSpotType}
+    assert sorted(forecast["by_level"]) == sorted(lot.counters.by_level)
+    assert len(forecast["by_level"]) == 3
+    for rates in [*forecast["by_type"].values(), *forecast["by_level"].values()]:
+        assert len(rates) == len(horizons)
+        assert all(0 <= rate <= 100 for rate in rates)
@@ -0,0 +1,30 @@
+import pytest
+
+
+def test_reset_keeps_counting_into_the_same_histograms(pa, lot):
+    stats = lot.instrument()
+    lot.vehicle_entry("STAT-1", pa.VehicleType.CAR)
+    assert stats.calls("vehicle_entry") == 1
+    
+    stats.reset()
+    assert stats.report() == {}
+    lot.vehicle_entry("STAT-2", pa.VehicleType.CAR)
+    lot.vehicle_entry("STAT-3", pa.VehicleType.CAR)
+    assert stats.calls("vehicle_entry") == 2
+    assert stats.report()["vehicle_entry"]["calls"] == 2
+
+
+def test_command_arguments_follow_parameter_annotations(pa):
+    assert pa.command_arguments(pa.stress_test_gates, ["2", "50"]) == [2, 50]
+    assert pa.command_arguments(pa.benchmark_events, ["1.5"]) == [1.5]
+    assert pa.command_arguments(pa.benchmark_spot_store_memory, ["1000", "2000"]) == [(1000, 2000)]
+    assert pa.command_arguments(pa.benchmark_suite, ["out.json", "old.json"]) == ["out.json", "old.json"]
+    with pytest.raises(ValueError):
+        pa.command_arguments(pa.stress_test_gates, ["two"])
+    with pytest.raises(ValueError):
+        pa.command_arguments(pa.serve, ["8080", "extra"])
+
+
+def test_main_runs_a_command_with_converted_arguments(pa, capsys):
+    pa.main(["parking-ai-agent.py", "stress-gates", "2", "50"])
+    assert "No spot was double-booked" in capsys.readouterr().out
@@ -0,0 +1,91 @@
+import glob
+import os
+import threading
+import time
+
+
+def _log_records(directory):
+    lines = []
+    for path in sorted(glob.glob(os.path.join(directory, "log-*.jsonl"))):
+        with open(path, "rb") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_record_missing_its_newline_is_torn(pa, tmp_path):
+    journal = pa.StateJournal(str(tmp_path), fsync=False)
+    journal.load()
+    journal.append("pay", "T-1", 2.0, None)
+    journal.append("pay", "T-2", 3.0, None)
+    journal.close()
+    log_path = glob.glob(os.path.join(tmp_path, "log-*.jsonl"))[0]
+    with open(log_path, "rb+") as f:
+        f.truncate(os.path.getsize(log_path) - 1)  # Crash between the record and its newline
+    
+    journal = pa.StateJournal(str(tmp_path), fsync=False)
+    _, records = journal.load()
+    assert [record[2] for record in records] == ["T-1"]
+    journal.append("pay", "T-3", 4.0, None)
+    journal.close()
+    
+    _, records = pa.StateJournal(str(tmp_path), fsync=False).load()
+    assert [record[2] for record in records] == ["T-1", "T-3"]
+
+
+def test_quiet_batches_are_flushed_in_the_background(pa, tmp_path):
+    journal = pa.StateJournal(str(tmp_path), batch_size=1000, flush_interval=0.02, fsync=False)
+    journal.load()
+    journal.append("pay", "T-1", 2.0, None)
+    deadline = time.monotonic() + 2
+    while not _log_records(str(tmp_path)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(_log_records(str(tmp_path))) == 1
+    journal.close()
+
+
+def _journaled_lot(pa, directory, **journal_options):
+    journal_options = {"batch_size": 1000, "flush_interval": 60, "fsync": False, **journal_options}
+    parking_ai = pa.ParkingAI.recover(directory, journal_options=journal_options)
+    parking_ai.initialize_parking_lot(1, 20, verbose=False)
+    parking_ai.write_snapshot()
+    return parking_ai
+
+
+def test_operations_return_only_once_their_records_are_on_disk(pa, tmp_path):
+    parking_ai = _journaled_lot(pa, str(tmp_path))
+    ticket_id = parking_ai.vehicle_entry("DUR-1", pa.VehicleType.CAR)[1]
+    assert len(_log_records(str(tmp_path))) == 1
+    assert parking_ai.pay_ticket(ticket_id)[0]
+    assert len(_log_records(str(tmp_path))) == 2
+    assert parking_ai.journal.committed == parking_ai.journal.sequence
+    parking_ai.journal.close()
+
+
+def test_asynchronous_commit_acknowledges_before_writing(pa, tmp_path):
+    parking_ai = _journaled_lot(pa, str(tmp_path), durable=False)
+    ticket_id = parking_ai.vehicle_entry("ASY-1", pa.VehicleType.CAR)[1]
+    assert parking_ai.pay_ticket(ticket_id)[0]
+    assert _log_records(str(tmp_path)) == []  # Lost if the process died now
+    parking_ai.journal.close()
+    assert len(_log_records(str(tmp_path))) == 2
+
+
+def test_concurrent_lanes_share_commits(pa, tmp_path):
+    parking_ai = _journaled_lot(pa, str(tmp_path))
+    
+    def lane(name):
+        for number in range(50):
+            result = parking_ai.vehicle_entry(f"{name}-{number}", pa.VehicleType.MOTORCYCLE)
+            if result:
+                parking_ai.pay_ticket(result[1])
+                parking_ai.vehicle_exit(result[1])
+    
+    workers = [threading.Thread(target=lane, args=(f"L{index}",)) for index in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    journal = parking_ai.journal
+    assert journal.committed == journal.sequence == len(_log_records(str(tmp_path)))
+    assert journal.commits <= journal.sequence
+    journal.close()
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("missing", ["level", "section"])
+def test_csv_without_a_location_column_names_it(pa, tmp_path, missing):
+    columns = [name for name in ("level", "section", "regular") if name != missing]
+    path = tmp_path / "layout.csv"
+    path.write_text(",".join(columns) + "\n" + ",".join("1" if name != "section" else "A" for name in columns) + "\n")
+    with pytest.raises(ValueError, match=repr(missing)):
+        pa.LotLayout.load(str(path))
+
+
+def test_rankings_are_built_when_the_layout_loads(pa, lot):
+    recommender = lot.recommender
+    assert set(recommender.rankings) == set(recommender.MODES)
+    assert recommender.spot_count == len(lot.spots)
+    rankings = dict(recommender.rankings)
+    
+    for preference in ("closest", "exit", "elevator", "level-2", "section-B"):
+        assert lot.recommend_spot(pa.VehicleType.CAR, preference) is not None
+    # Queries reuse the rankings from load time instead of building their own
+    assert all(recommender.rankings[mode] is rankings[mode] for mode in recommender.MODES)
+    
+    lot.load_layout(pa.LotLayout([pa.SectionLayout(4, "A", {pa.ParkingSpotType.REGULAR: 10})]))
+    assert recommender.spot_count == len(lot.spots) == 310
+    assert all(lot.spots[spot_id].level == 4 for spot_id in lot.recommend_spots(pa.VehicleType.CAR, "level-4", 10))
@@ -0,0 +1,7 @@
+def test_results_do_not_depend_on_the_worker_count(pa):
+    scenarios = [pa.Scenario("small", levels=1, spots_per_level=20, arrivals_per_hour=10, hours=12),
+                 pa.Scenario("busy", levels=1, spots_per_level=20, arrivals_per_hour=30, hours=12)]
+    serial = pa.MonteCarloRunner(workers=1).run(scenarios, runs=4, seed=7)
+    assert serial == pa.MonteCarloRunner(workers=2).run(scenarios, runs=4, seed=7)
+    assert serial["small"]["runs"] == serial["busy"]["runs"] == 4
+    assert serial != pa.MonteCarloRunner(workers=1).run(scenarios, runs=4, seed=8)
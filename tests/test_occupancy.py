@@ -0,0 +1,28 @@
+import datetime
+
+import pytest
+
+from conftest import START
+
+
+def test_occupancy_series_reads_back_the_rollups(pa, lot):
+    rates = []
+    for step in range(18):  # Three hours, every ten minutes
+        if step % 2 == 0:
+            lot.vehicle_entry(f"OCC-{step}", pa.VehicleType.CAR)
+        rates.append(lot.record_occupancy())
+        lot.clock.advance(datetime.timedelta(minutes=10))
+    
+    hours = lot.occupancy_series("hour")
+    assert [bucket["start"] for bucket in hours] == [(START + datetime.timedelta(hours=hour)).isoformat()
+                                                     for hour in range(3)]
+    for hour, bucket in enumerate(hours):
+        samples = rates[hour * 6:(hour + 1) * 6]
+        assert bucket["mean"] == pytest.approx(sum(samples) / len(samples))
+        assert (bucket["min"], bucket["max"]) == (min(samples), max(samples))
+    
+    assert len(lot.occupancy_series("minute")) == 18
+    assert len(lot.occupancy_series("day")) == 1
+    assert len(lot.occupancy_series("hour", start=START + datetime.timedelta(hours=1))) == 2
+    with pytest.raises(ValueError):
+        lot.occupancy_series("week")
@@ -0,0 +1,37 @@
+import datetime
+
+from conftest import START
+
+
+def test_current_rates_scale_hourly_rate_and_daily_max_together(pa, lot):
+    lot.set_pricing(pa.PricingPolicy.peak_hours(lot.parking_rates, peak_multiplier=1.5))
+    base = lot.parking_rates[pa.VehicleType.CAR]
+    
+    peak = lot.current_rates(at=START)["car"]  # Monday 08:00 is a busy hour
+    assert peak["hourly_rate"] == base.hourly_rate * 1.5
+    assert peak["daily_max"] == base.daily_max * 1.5
+    
+    quiet = lot.current_rates(at=START + datetime.timedelta(hours=2))["car"]
+    assert (quiet["hourly_rate"], quiet["daily_max"]) == (base.hourly_rate, base.daily_max)
+
+
+
+def test_edits_to_parking_rates_reach_the_fees(pa, lot):
+    ticket_id = lot.vehicle_entry("RATE-1", pa.VehicleType.CAR)[1]
+    later = START + datetime.timedelta(hours=2)
+    assert lot.calculate_parking_fee(ticket_id, at=later) == 2.0  # Capped at 2/24 of the 24.0 daily max
+    
+    lot.parking_rates[pa.VehicleType.CAR].daily_max = 240
+    assert lot.calculate_parking_fee(ticket_id, at=later) == 4.0
+    assert lot.calculate_fees([ticket_id], at=later) == {ticket_id: 4.0}
+    
+    lot.parking_rates[pa.VehicleType.CAR] = pa.ParkingRate(pa.VehicleType.CAR, 3.0, 240)
+    assert lot.calculate_parking_fee(ticket_id, at=later) == 6.0
+
+
+def test_rate_edits_keep_the_time_multipliers(pa, lot):
+    lot.set_pricing(pa.PricingPolicy.peak_hours(lot.parking_rates, peak_multiplier=1.5))
+    lot.parking_rates[pa.VehicleType.CAR].hourly_rate = 4.0
+    peak = lot.current_rates(at=START)["car"]
+    assert peak["hourly_rate"] == 6.0
+    assert peak["daily_max"] == lot.parking_rates[pa.VehicleType.CAR].daily_max * 1.5
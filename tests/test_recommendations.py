@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+
+def _closest_free(pa, lot, vehicle_type, k):
+    free = [spot for spot in lot.spots.values()
+            if not spot.is_occupied and lot.is_spot_suitable(spot.spot_type, vehicle_type)]
+    free.sort(key=lambda spot: (spot.level, spot.section, spot.seq))
+    return [spot.spot_id for spot in free[:k]]
+
+
+@pytest.mark.parametrize("preference", ["level", "level-", "level-two", "section", "nearest", ""])
+def test_legacy_and_unknown_preferences_fall_back_to_closest(pa, lot, preference):
+    lot.vehicle_entry("REC-1", pa.VehicleType.CAR)
+    assert lot.recommend_spot(pa.VehicleType.CAR, preference) == lot.recommend_spot(pa.VehicleType.CAR, "closest")
+    assert lot.recommend_spots(pa.VehicleType.CAR, preference, 5) == _closest_free(pa, lot, pa.VehicleType.CAR, 5)
+
+
+def test_pools_track_entries_and_exits(pa, lot):
+    rng = random.Random(13)
+    open_tickets = []
+    for number in range(400):
+        if open_tickets and rng.random() < 0.4:
+            ticket_id = open_tickets.pop(rng.randrange(len(open_tickets)))
+            assert lot.pay_ticket(ticket_id)[0]
+            assert lot.vehicle_exit(ticket_id)
+        else:
+            result = lot.vehicle_entry(f"REC-{number}", pa.VehicleType.CAR)
+            if result is not None:
+                open_tickets.append(result[1])
+        if number % 40 == 0:
+            assert lot.recommend_spots(pa.VehicleType.CAR, "closest", 3) == _closest_free(pa, lot, pa.VehicleType.CAR, 3)
@@ -0,0 +1,121 @@
+import datetime
+
+import pytest
+
+from conftest import START
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def test_windows_must_end_after_they_start_and_after_now(pa, lot):
+    with pytest.raises(ValueError):
+        lot.book_spot("RES-1", pa.VehicleType.CAR, START + HOUR, START + HOUR)
+    with pytest.raises(ValueError):
+        lot.book_spot("RES-1", pa.VehicleType.CAR, START - 3 * HOUR, START - HOUR)
+    with pytest.raises(ValueError):
+        lot.spot_availability(START + 2 * HOUR, START + HOUR)
+
+
+def test_holds_and_claims_keep_counters_in_step(pa, lot):
+    reservations = [lot.book_spot(f"RES-{number}", pa.VehicleType.CAR, START + HOUR, START + 3 * HOUR)
+                    for number in range(5)]
+    held_spot = reservations[0].spot_id
+    lot.verify_counters()
+    assert lot.recommend_spot(pa.VehicleType.CAR) != held_spot  # Held two hours ahead
+    
+    lot.clock.advance(HOUR)
+    location, ticket_id = lot.vehicle_entry("RES-0", pa.VehicleType.CAR)
+    assert lot.vehicles[lot.tickets[ticket_id].vehicle_id].parked_spot_id == held_spot
+    assert lot.cancel_reservation(reservations[1].reservation_id)
+    lot.verify_counters()
+    
+    # No-shows release their holds when the window ends
+    lot.clock.advance(3 * HOUR)
+    lot.vehicle_entry("WALK-IN", pa.VehicleType.CAR)
+    assert not any(lot.reservations.is_held(lot.spots[reservation.spot_id].seq) for reservation in reservations)
+    lot.verify_counters()
+
+
+def test_booked_spot_is_only_claimed_by_a_suitable_vehicle(pa, lot):
+    reservation = lot.book_spot("RES-T", pa.VehicleType.CAR, START, START + HOUR)
+    booked = lot.spots[reservation.spot_id]
+    assert booked.spot_type not in pa.SUITABLE_SPOT_TYPES[pa.VehicleType.HANDICAPPED]
+    
+    location, ticket_id = lot.vehicle_entry("RES-T", pa.VehicleType.HANDICAPPED)
+    spot = lot.spots[lot.vehicles[lot.tickets[ticket_id].vehicle_id].parked_spot_id]
+    assert spot.spot_type in pa.SUITABLE_SPOT_TYPES[pa.VehicleType.HANDICAPPED]
+    assert not booked.is_occupied
+    assert not lot.reservations.active
+    # The booked spot went back to walk-ins instead of staying held
+    assert lot.recommend_spot(pa.VehicleType.CAR) == booked.spot_id
+    lot.verify_counters()
+
+
+def test_bookings_are_journaled_before_they_can_be_claimed(pa, tmp_path):
+    directory = str(tmp_path)
+    parking_ai = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(START))
+    parking_ai.initialize_parking_lot(1, 40, verbose=False)
+    parking_ai.write_snapshot()
+    
+    claimed = []
+    original_book = parking_ai.reservations.book
+    
+    def book_then_race(*args, **kwargs):
+        # An arrival racing the booking: it can only claim once the book's lock is free
+        reservation = original_book(*args, **kwargs)
+        claimed.append(parking_ai.vehicle_entry("RACE-1", pa.VehicleType.CAR))
+        return reservation
+    
+    parking_ai.reservations.book = book_then_race
+    reservation = parking_ai.book_spot("RACE-1", pa.VehicleType.CAR, START, START + HOUR)
+    assert claimed[0] is not None
+    parking_ai.journal.close()
+    
+    recovered = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(START))
+    assert not recovered.reservations.active
+    assert recovered.spots[reservation.spot_id].is_occupied
+    recovered.verify_counters()
+    recovered.journal.close()
+
+
+def _journaled_lot(pa, directory):
+    parking_ai = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(START))
+    parking_ai.initialize_parking_lot(1, 40, verbose=False)
+    parking_ai.write_snapshot()
+    return parking_ai
+
+
+def _fill(pa, parking_ai):
+    tickets = []
+    while True:
+        result = parking_ai.vehicle_entry(f"FILL-{len(tickets)}", pa.VehicleType.CAR)
+        if result is None:
+            return tickets
+        tickets.append(result[1])
+
+
+@pytest.mark.parametrize("space_frees_up", [False, True])
+def test_booking_survives_an_arrival_that_finds_no_spot(pa, tmp_path, space_frees_up):
+    directory = str(tmp_path)
+    parking_ai = _journaled_lot(pa, directory)
+    reservation = parking_ai.book_spot("LATE-1", pa.VehicleType.CAR, START + 3 * HOUR, START + 4 * HOUR)
+    tickets = _fill(pa, parking_ai)  # Before the hold starts, so a walk-in takes the booked spot too
+    assert parking_ai.spots[reservation.spot_id].is_occupied
+    
+    parking_ai.clock.advance(3 * HOUR)
+    assert parking_ai.vehicle_entry("LATE-1", pa.VehicleType.CAR) is None
+    assert list(parking_ai.reservations.active) == [reservation.reservation_id]
+    
+    if space_frees_up:
+        blocker = parking_ai.ticket_for_spot(reservation.spot_id)
+        other = next(ticket_id for ticket_id in tickets if ticket_id != blocker)
+        assert parking_ai.pay_ticket(other)[0] and parking_ai.vehicle_exit(other)
+        assert parking_ai.vehicle_entry("LATE-1", pa.VehicleType.CAR) is not None
+        assert not parking_ai.reservations.active
+    expected = list(parking_ai.reservations.active)
+    parking_ai.journal.close()
+    
+    recovered = pa.ParkingAI.recover(directory, clock=pa.SimulatedClock(START + 3 * HOUR))
+    assert list(recovered.reservations.active) == expected
+    recovered.verify_counters()
+    recovered.journal.close()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+
+async def _request(reader, writer, raw):
+    writer.write(raw)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    return status, json.loads(body)
+
+
+def _with_service(pa, scenario):
+    parking_ai = pa.ParkingAI()
+    parking_ai.initialize_parking_lot(1, 20, verbose=False)
+    
+    async def run():
+        service = pa.ParkingService(parking_ai, port=0)
+        await service.start()
+        reader, writer = await asyncio.open_connection(service.host, service.port)
+        try:
+            await scenario(parking_ai, reader, writer)
+        finally:
+            writer.close()
+            await service.stop()
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_is_a_bad_request(pa, length):
+    async def scenario(parking_ai, reader, writer):
+        status, payload = await _request(reader, writer, b"POST /entry HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+        assert status == 400
+        assert "Content-Length" in payload["error"]
+    _with_service(pa, scenario)
+
+
+def test_unexpected_handler_error_is_a_server_error_and_keeps_the_connection(pa):
+    async def scenario(parking_ai, reader, writer):
+        def broken_status():
+            raise KeyError("boom")
+        parking_ai.get_parking_status = broken_status
+        status, payload = await _request(reader, writer, b"GET /status HTTP/1.1\r\n\r\n")
+        assert status == 500
+        assert "KeyError" in payload["error"]
+        
+        body = json.dumps({"license_plate": "SRV-1", "vehicle_type": "car"}).encode()
+        status, payload = await _request(
+            reader, writer, b"POST /entry HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+        assert status == 200
+        assert payload["ticket_id"] in parking_ai.tickets
+    _with_service(pa, scenario)
+
+
+def test_windows_with_a_utc_offset_are_rejected(pa):
+    async def scenario(parking_ai, reader, writer):
+        status, payload = await _request(
+            reader, writer, b"GET /availability?start=2030-01-01T10:00%2B01:00&end=2030-01-01T12:00 HTTP/1.1\r\n\r\n")
+        assert status == 400
+        assert "UTC offset" in payload["error"]
+        
+        status, payload = await _request(
+            reader, writer, b"GET /availability?start=2030-01-01T12:00&end=2030-01-01T10:00 HTTP/1.1\r\n\r\n")
+        assert status == 400
+    _with_service(pa, scenario)
+
+
+def test_occupancy_series_endpoint(pa):
+    async def scenario(parking_ai, reader, writer):
+        parking_ai.record_occupancy()
+        status, payload = await _request(reader, writer, b"GET /occupancy?resolution=minute HTTP/1.1\r\n\r\n")
+        assert status == 200
+        assert len(payload["series"]) == 1
+        status, _ = await _request(reader, writer, b"GET /occupancy?resolution=week HTTP/1.1\r\n\r\n")
+        assert status == 400
+    _with_service(pa, scenario)
+
+
+def test_oversized_body_is_refused_without_reading_it(pa):
+    async def scenario(parking_ai, reader, writer):
+        status, payload = await _request(reader, writer, b"POST /entry HTTP/1.1\r\nContent-Length: 1099511627776\r\n\r\n")
+        assert status == 413
+        assert await reader.read() == b""
+    _with_service(pa, scenario)
+
+
+def test_stop_ends_event_streams_cleanly(pa):
+    parking_ai = pa.ParkingAI()
+    parking_ai.initialize_parking_lot(1, 20, verbose=False)
+    errors = []
+    
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        service = pa.ParkingService(parking_ai, port=0)
+        await service.start()
+        reader, writer = await asyncio.open_connection(service.host, service.port)
+        writer.write(b"GET /events HTTP/1.1\r\n\r\n")
+        await writer.drain()
+        assert (await reader.readline()).startswith(b"HTTP/1.1 200")
+        await reader.readuntil(b"event: status\n")
+        await service.stop()
+        await asyncio.wait_for(reader.read(), timeout=5)  # EOF once the stream ends
+        writer.close()
+    asyncio.run(run())
+    assert errors == []
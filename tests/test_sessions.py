@@ -0,0 +1,33 @@
+import datetime
+
+
+def test_plate_parked_twice_keeps_both_sessions(pa, lot):
+    first = lot.vehicle_entry("DUP-1", pa.VehicleType.CAR)[1]
+    lot.clock.advance(datetime.timedelta(minutes=5))
+    second = lot.vehicle_entry("DUP-1", pa.VehicleType.CAR)[1]
+    
+    assert lot.find_vehicle("DUP-1")["ticket_id"] == second
+    assert lot.pay_ticket(second)[0] and lot.vehicle_exit(second)
+    assert lot.find_vehicle("DUP-1")["ticket_id"] == first
+    assert lot.pay_ticket(first)[0] and lot.vehicle_exit(first)
+    assert lot.find_vehicle("DUP-1") is None
+
+
+def test_oldest_tolerates_exits_while_iterating(pa, lot):
+    tickets = []
+    for number in range(200):
+        lot.clock.advance(datetime.timedelta(minutes=1))
+        tickets.append(lot.vehicle_entry(f"OLD-{number}", pa.VehicleType.CAR)[1])
+    
+    seen = []
+    for ticket in lot.sessions.oldest():
+        seen.append(ticket.ticket_id)
+        if len(seen) % 4:
+            assert lot.pay_ticket(ticket.ticket_id)[0] and lot.vehicle_exit(ticket.ticket_id)
+    assert seen == tickets
+    
+    # Enough sessions ended to compact the arrival order; what is left keeps its order
+    assert [ticket.ticket_id for ticket in lot.sessions.oldest()] == tickets[3::4]
+    assert len(lot.sessions.arrived) < 150
+    overstaying = lot.overstaying_vehicles(max_hours=2)
+    assert [info["ticket_id"] for info in overstaying] == tickets[3:79:4]
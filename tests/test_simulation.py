@@ -0,0 +1,19 @@
+import datetime
+import random
+
+from conftest import START
+
+
+def test_tickets_follow_the_lot_clock_after_a_simulation_takes_over(pa):
+    parking_ai = pa.ParkingAI()  # Wall clock
+    parking_ai.initialize_parking_lot(1, 40, verbose=False)
+    _, ticket_id = parking_ai.vehicle_entry("SIM-1", pa.VehicleType.CAR)
+    
+    pa.SimulationEngine(parking_ai, rng=random.Random(1), start=START)
+    parking_ai.clock.advance(datetime.timedelta(hours=2))
+    assert parking_ai.pay_ticket(ticket_id)[0]
+    assert parking_ai.vehicle_exit(ticket_id)
+    
+    ticket = parking_ai.tickets[ticket_id]
+    assert ticket.payment_time == START + datetime.timedelta(hours=2)
+    assert ticket.exit_time == START + datetime.timedelta(hours=2)
@@ -0,0 +1,33 @@
+import datetime
+import time
+
+import pytest
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset is not available")
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize("entry", [datetime.datetime(2025, 3, 9, 2, 30),  # Inside the spring-forward gap
+                                   datetime.datetime(2025, 11, 2, 1, 30),  # Repeated at fall-back
+                                   datetime.datetime(2025, 6, 1, 12, 0, 0, 123456)])
+@pytest.mark.parametrize("columnar", [False, True], ids=["objects", "columnar"])
+def test_occupied_since_round_trips_naive_times(pa, new_york, columnar, entry):
+    parking_ai = pa.ParkingAI(columnar_spots=columnar, clock=pa.SimulatedClock(entry))
+    parking_ai.initialize_parking_lot(1, 20, verbose=False)
+    events = []
+    parking_ai.events.subscribe(events.extend, kinds=(pa.SpotEvent,))
+    
+    ticket_id = parking_ai.vehicle_entry("DST-1", pa.VehicleType.CAR)[1]
+    spot = parking_ai.spots[parking_ai.vehicles[parking_ai.tickets[ticket_id].vehicle_id].parked_spot_id]
+    assert spot.occupied_since == entry
+    assert events[0].time == entry
+    occupied = parking_ai.snapshot_state()["occupied"]
+    assert occupied[0][2] == pa._encode_time(entry)